@@ -3,11 +3,13 @@ from .change_book_router import changes_router
 from .user_router import users_router
 from .crawling_router import crawler_router
 from .report_generate_router import report_router
+from .metrics_router import metrics_router
 
 __all__ = (
     'books_router',
     'changes_router',
     'users_router',
     'crawler_router',
-    'report_router'
+    'report_router',
+    'metrics_router'
 )
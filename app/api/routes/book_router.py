@@ -1,15 +1,17 @@
-from fastapi import APIRouter, Depends, status, Query, HTTPException
+from fastapi import APIRouter, Depends, status, Query, HTTPException, Response
 from fastapi_limiter.depends import RateLimiter
-from app.utils import verify_user_api_key, BookSortEnum
+from app.utils import verify_user_api_key, BookSortEnum, PaginationEnum, PaginationTotalEnum
 from app.services import BookService
 from app.api.deps import get_book_service
 from app.utils import user_rate_limit_identifier
+from app.utils.timing import TimedRoute
 
 
 
 books_router = APIRouter(dependencies=[Depends(verify_user_api_key),
                                        Depends(RateLimiter(times=100, seconds=3600,
-                                                           identifier=user_rate_limit_identifier))])
+                                                           identifier=user_rate_limit_identifier))],
+                         route_class=TimedRoute)
 
 
 @books_router.get("/")
@@ -20,15 +22,56 @@ async def get_books(
         max_price: float = 9999,
         skip: int = 0,
         limit: int = 10,
-        sort_by: BookSortEnum | None = Query(None, description="Sort by: rating, price, reviews")
+        sort_by: BookSortEnum | None = Query(None, description="Sort by: rating, price, reviews"),
+        include: str | None = Query(None, description="Set to raw_html to include the crawled page HTML"),
+        pagination: PaginationEnum = Query(PaginationEnum.offset, description="offset (skip/limit) or cursor"),
+        cursor: str | None = Query(None, description="next_cursor from the previous page"),
+        total: PaginationTotalEnum = Query(
+            PaginationTotalEnum.exact, description="Total in cursor mode: exact, estimated, cached, none"
+        )
 ):
     sort_field = sort_by.value if sort_by else None
-    return await service.get_books(category, min_price, max_price, skip, limit, sort_field)
+    try:
+        books = await service.get_books(
+            category, min_price, max_price, skip, limit, sort_field, include_raw_html=include == "raw_html",
+            pagination=pagination, cursor=cursor, total_mode=total, raw=True,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    # cached pages are already JSON; send them without re-serializing
+    if isinstance(books, bytes):
+        return Response(content=books, media_type="application/json")
+    return books
+
+
+@books_router.get("/search")
+async def search_books(
+        q: str = Query(..., min_length=1, max_length=200, description="Words to find in book names and descriptions"),
+        service: BookService = Depends(get_book_service),
+        category: str = None,
+        min_price: float = 0,
+        max_price: float = 9999,
+        skip: int = 0,
+        limit: int = 10,
+        sort_by: BookSortEnum | None = Query(None, description="Sort by: rating, price, reviews; default relevance"),
+):
+    sort_field = sort_by.value if sort_by else None
+    try:
+        books = await service.search_books(q, category, min_price, max_price, skip, limit, sort_field, raw=True)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if isinstance(books, bytes):
+        return Response(content=books, media_type="application/json")
+    return books
 
 
 @books_router.get("/{book_id}")
-async def get_book(book_id: str, service: BookService = Depends(get_book_service)):
-    book = await service.get_book_by_id(book_id)
+async def get_book(
+        book_id: str,
+        service: BookService = Depends(get_book_service),
+        include: str | None = Query(None, description="Set to raw_html to include the crawled page HTML")
+):
+    book = await service.get_book_by_id(book_id, include_raw_html=include == "raw_html")
     if not book:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Book not found")
     return book
@@ -1,12 +1,16 @@
-from fastapi import APIRouter, Depends, Query, HTTPException, status
+from fastapi import APIRouter, Depends, Query, HTTPException, Response, status
 from fastapi_limiter.depends import RateLimiter
 
 from app.services import ChangeBookService
-from app.utils import BookSortEnum, user_rate_limit_identifier, verify_user_api_key
+from app.utils import (
+    BookSortEnum, PaginationEnum, PaginationTotalEnum, user_rate_limit_identifier, verify_user_api_key
+)
 from app.api.deps import get_change_book_service
 from app.serializers import serialize_book
+from app.utils.timing import TimedRoute
 
 changes_router = APIRouter(
+    route_class=TimedRoute,
     dependencies=[Depends(verify_user_api_key),
                   Depends(RateLimiter(times=100, seconds=3600, identifier=user_rate_limit_identifier))])
 
@@ -19,10 +23,25 @@ async def get_changes(
         max_price: float = 9999,
         skip: int = 0,
         limit: int = 10,
-        sort_by: BookSortEnum | None = Query(None, description="Sort by: rating, price, reviews")
+        sort_by: BookSortEnum | None = Query(None, description="Sort by: rating, price, reviews"),
+        pagination: PaginationEnum = Query(PaginationEnum.offset, description="offset (skip/limit) or cursor"),
+        cursor: str | None = Query(None, description="next_cursor from the previous page"),
+        total: PaginationTotalEnum = Query(
+            PaginationTotalEnum.exact, description="Total in cursor mode: exact, estimated, cached, none"
+        )
 ):
     sort_field = sort_by.value if sort_by else None
-    return await service.get_changes(category, min_price, max_price, skip, limit, sort_field)
+    try:
+        changes = await service.get_changes(
+            category, min_price, max_price, skip, limit, sort_field,
+            pagination=pagination, cursor=cursor, total_mode=total, raw=True,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    # cached pages are already JSON; send them without re-serializing
+    if isinstance(changes, bytes):
+        return Response(content=changes, media_type="application/json")
+    return changes
 
 
 @changes_router.get("/{book_id}")
@@ -1,15 +1,31 @@
-from fastapi import APIRouter, Depends, BackgroundTasks
+from fastapi import APIRouter, Depends, BackgroundTasks, Query
 from fastapi_limiter.depends import RateLimiter
 from app.crawler import main
 
 from app.utils import user_rate_limit_identifier, logger, verify_user_api_key
+from app.utils.metrics import metrics_publisher
+from app.utils.timing import TimedRoute
 
-crawler_router = APIRouter(dependencies=[Depends(verify_user_api_key),
-                                       Depends(RateLimiter(times=100, seconds=3600,
-                                                           identifier=user_rate_limit_identifier))])
+crawler_router = APIRouter(route_class=TimedRoute, dependencies=[Depends(verify_user_api_key)])
 
-@crawler_router.post("/")
-async def get_crawling_status(background_tasks: BackgroundTasks):
+@crawler_router.post("/", dependencies=[Depends(RateLimiter(times=100, seconds=3600,
+                                                            identifier=user_rate_limit_identifier))])
+async def get_crawling_status(
+        background_tasks: BackgroundTasks,
+        categories: list[str] | None = Query(None, description="Only crawl these categories (slug or name)"),
+):
     logger.info("Crawling status requested")
-    background_tasks.add_task(main)
+    background_tasks.add_task(main, categories)
     return {"message": "Crawling started in background"}
+
+
+@crawler_router.get("/status")
+async def get_crawl_progress():
+    """Current or last crawl of every process (this API worker, the scheduler, standalone crawlers)."""
+    snapshots = await metrics_publisher.snapshots()
+    crawls = [
+        {"process": process, **snapshot["status"]["crawl"]}
+        for process, snapshot in snapshots.items()
+        if "crawl" in snapshot.get("status", {})
+    ]
+    return {"crawls": sorted(crawls, key=lambda crawl: crawl["started_at"], reverse=True)}
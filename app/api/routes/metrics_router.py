@@ -0,0 +1,16 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+
+from app.utils import verify_user_api_key
+from app.utils.metrics import metrics_publisher
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# host names, PIDs and queue depths of every process; scrape with a user API key
+metrics_router = APIRouter(dependencies=[Depends(verify_user_api_key)])
+
+
+@metrics_router.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Prometheus metrics of this worker and of every process that published to Redis recently."""
+    return PlainTextResponse(await metrics_publisher.render(), media_type=PROMETHEUS_CONTENT_TYPE)
@@ -1,17 +1,30 @@
-from fastapi import APIRouter, Query, Depends
+from fastapi import APIRouter, Query, Depends, Header
 from fastapi_limiter.depends import RateLimiter
 
-from app.services import generate_report_service
+from app.services import generate_report_service, get_report_summary
 from app.utils import user_rate_limit_identifier, verify_user_api_key
+from app.utils.timing import TimedRoute
 
 report_router = APIRouter(dependencies=[Depends(verify_user_api_key),
                                        Depends(RateLimiter(times=100, seconds=3600,
-                                                           identifier=user_rate_limit_identifier))])
+                                                           identifier=user_rate_limit_identifier))],
+                          route_class=TimedRoute)
 
 
-@report_router.get("/", summary="Generate daily change report (JSON or CSV)")
+@report_router.get("/", summary="Generate change report (JSON, NDJSON or CSV) for a day or a date range")
 async def generate_change_report(
-    format: str = Query("json", description="Output format: json or csv"),
+    format: str = Query("json", description="Output format: json, ndjson or csv"),
+    date: str = Query(None, description="Date (YYYY-MM-DD). Defaults to today (UTC)."),
+    from_date: str = Query(None, alias="from", description="First day of a range (YYYY-MM-DD)"),
+    to_date: str = Query(None, alias="to", description="Last day of a range, inclusive (YYYY-MM-DD)"),
+    if_none_match: str = Header(None),
+    accept_encoding: str = Header(None)
+):
+    return await generate_report_service(format, date, from_date, to_date, if_none_match, accept_encoding)
+
+
+@report_router.get("/summary", summary="Change counts per category and per field for a completed day")
+async def get_change_report_summary(
     date: str = Query(None, description="Date (YYYY-MM-DD). Defaults to today (UTC).")
 ):
-    return await generate_report_service(format, date)
\ No newline at end of file
+    return await get_report_summary(date)
\ No newline at end of file
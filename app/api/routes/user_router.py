@@ -6,8 +6,9 @@ from app.utils import verify_admin_api_key, generate_api_key
 from app.schemas import User, UserUpdate
 from app.api.deps import get_user_service
 from app.services import UserService
+from app.utils.timing import TimedRoute
 
-users_router = APIRouter(dependencies=[Depends(verify_admin_api_key)])
+users_router = APIRouter(route_class=TimedRoute, dependencies=[Depends(verify_admin_api_key)])
 
 
 def serialize_user(user: dict) -> dict:
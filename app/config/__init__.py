@@ -1,7 +1,12 @@
 from .config import settings
 from .redis_caching import RedisCache
+from .local_cache import LocalCache, CacheStats
+from .codecs import CacheCodec
 
 __all__ = (
     'settings',
-    'RedisCache'
+    'RedisCache',
+    'LocalCache',
+    'CacheStats',
+    'CacheCodec'
 )
\ No newline at end of file
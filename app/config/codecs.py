@@ -0,0 +1,122 @@
+import json
+import struct
+import zlib
+from datetime import date, datetime
+from typing import Any, Optional
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Payload layout: <format tag><compression tag><body>. Entries written before the
+# codec layer are plain JSON text, which never starts with one of these tags.
+FORMAT_JSON, FORMAT_MSGPACK = b"J", b"M"
+COMPRESSION_NONE, COMPRESSION_ZLIB, COMPRESSION_ZSTD = b"-", b"z", b"Z"
+# get_or_load entries: <ENVELOPE><fresh_until as a big-endian double><payload>
+ENVELOPE = b"E"
+_FRESH_UNTIL = struct.Struct(">d")
+
+
+def _default(obj: Any):
+    # same outcome as json.dumps(default=str) for ObjectId, Decimal, ...; dates as ISO strings
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    return str(obj)
+
+
+def dumps_json(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default)
+    return json.dumps(obj, default=_default, separators=(",", ":")).encode()
+
+
+def loads_json(data: bytes | str) -> Any:
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+class CacheCodec:
+    """Serializes cache payloads as JSON (``json``/``orjson``) or ``msgpack``.
+
+    Bodies of at least ``compress_min_bytes`` are compressed with ``zlib`` or,
+    if installed, ``zstd``. Every payload is tagged with its format and
+    compression, so entries written with another codec setting (or by the old
+    plain-JSON cache) still decode. Unavailable optional libraries fall back
+    to ``json``/``zlib``.
+    """
+
+    def __init__(self, name: str = "orjson", compression: str = "zlib", compress_min_bytes: int = 4096):
+        if name == "msgpack" and msgpack is None:
+            print("msgpack is not installed, caching with JSON instead")
+            name = "orjson"
+        if compression == "zstd" and zstandard is None:
+            print("zstandard is not installed, compressing cache entries with zlib instead")
+            compression = "zlib"
+        self.name = name
+        self.compression = compression
+        self.compress_min_bytes = compress_min_bytes
+        self._zstd_compressor = zstandard.ZstdCompressor(level=3) if compression == "zstd" else None
+
+    def _serialize(self, obj: Any) -> tuple[bytes, bytes]:
+        if self.name == "msgpack":
+            return FORMAT_MSGPACK, msgpack.packb(obj, default=_default)
+        if self.name == "json":
+            return FORMAT_JSON, json.dumps(obj, default=_default, separators=(",", ":")).encode()
+        return FORMAT_JSON, dumps_json(obj)
+
+    def encode(self, obj: Any) -> bytes:
+        fmt, body = self._serialize(obj)
+        if self.compression == "none" or len(body) < self.compress_min_bytes:
+            return fmt + COMPRESSION_NONE + body
+        if self._zstd_compressor is not None:
+            return fmt + COMPRESSION_ZSTD + self._zstd_compressor.compress(body)
+        return fmt + COMPRESSION_ZLIB + zlib.compress(body, 1)
+
+    @staticmethod
+    def _body(data: bytes) -> tuple[bytes, bytes]:
+        fmt, compression, body = data[:1], data[1:2], data[2:]
+        if compression == COMPRESSION_ZLIB:
+            body = zlib.decompress(body)
+        elif compression == COMPRESSION_ZSTD:
+            if zstandard is None:
+                raise ValueError("cache entry is zstd-compressed but zstandard is not installed")
+            body = zstandard.ZstdDecompressor().decompress(body)
+        return fmt, body
+
+    def decode(self, data: bytes | str) -> Any:
+        if isinstance(data, str):
+            return json.loads(data)
+        if data[:1] == ENVELOPE:
+            fresh_until, payload = self.unpack_entry(data)
+            return {"value": self.decode(payload), "fresh_until": fresh_until}
+        if data[:1] not in (FORMAT_JSON, FORMAT_MSGPACK):
+            return loads_json(data)
+        fmt, body = self._body(data)
+        if fmt == FORMAT_MSGPACK:
+            if msgpack is None:
+                raise ValueError("cache entry is msgpack-encoded but msgpack is not installed")
+            return msgpack.unpackb(body)
+        return loads_json(body)
+
+    def to_json(self, payload: bytes) -> bytes:
+        """JSON bytes of an encoded payload, without a decode/encode round trip when it is JSON already."""
+        if payload[:1] == FORMAT_JSON:
+            return self._body(payload)[1]
+        return dumps_json(self.decode(payload))
+
+    def pack_entry(self, value: Any, fresh_until: float) -> bytes:
+        return ENVELOPE + _FRESH_UNTIL.pack(fresh_until) + self.encode(value)
+
+    @staticmethod
+    def unpack_entry(data: bytes) -> tuple[float, Optional[bytes]]:
+        return _FRESH_UNTIL.unpack_from(data, 1)[0], data[1 + _FRESH_UNTIL.size:]
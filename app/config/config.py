@@ -10,6 +10,75 @@ class Settings(BaseSettings):
     REDIS_URL: str
     HOST: str
 
+    CRAWL_CONCURRENCY: int = 8
+    CRAWL_LIMIT_PER_HOST: int = 8
+    CRAWL_PREFETCH_PAGES: int = 2
+    CRAWL_MODE: str = "concurrent"
+    CRAWL_PARTITIONS: int = 4
+
+    CRAWL_TIMEOUT: float = 10.0
+    CRAWL_FETCH_BYTES: bool = False
+    CRAWL_MAX_BODY_BYTES: int = 5 * 1024 * 1024
+    CRAWL_RETRIES: int = 3
+    CRAWL_BACKOFF_BASE: float = 0.5
+    CRAWL_BACKOFF_CAP: float = 30.0
+    CRAWL_RETRY_AFTER_CAP: float = 120.0
+    CRAWL_ADAPTIVE: bool = True
+    CRAWL_ADAPTIVE_INITIAL: int = 4
+    CRAWL_ADAPTIVE_MIN: int = 1
+    CRAWL_LATENCY_TOLERANCE: float = 2.0
+    CRAWL_BREAKER_FAILURES: int = 5
+    CRAWL_BREAKER_COOLDOWN: float = 30.0
+
+    CRAWL_QUEUE_VISIBILITY_TIMEOUT: float = 60.0
+    CRAWL_QUEUE_MAX_ATTEMPTS: int = 5
+    CRAWL_QUEUE_POLL_INTERVAL: float = 1.0
+
+    PIPELINE_LISTING_WORKERS: int = 2
+    PIPELINE_FETCHERS: int = 16
+    PIPELINE_PARSERS: int = 2
+    PIPELINE_QUEUE_SIZE: int = 100
+
+    WRITER_BATCH_SIZE: int = 100
+    WRITER_FLUSH_INTERVAL: float = 2.0
+
+    PARSE_EXECUTOR: str = "none"
+    PARSE_WORKERS: int = 0
+
+    DEDUP_MAX_AGE_DAYS: float = 0.5
+    DEDUP_BLOOM_THRESHOLD: int = 1_000_000
+    DEDUP_BLOOM_ERROR_RATE: float = 0.001
+
+    METRICS_PUBLISH_INTERVAL: float = 5.0
+    METRICS_STALE_AFTER: float = 60.0
+    SLOW_REQUEST_MS: float = 1000.0
+    SERVER_TIMING: bool = True
+
+    HTTP_REVALIDATE: bool = True
+    BODY_STORE_DIR: str = ""
+
+    PAGINATION_COUNT_CAP: int = 10_000
+    PAGINATION_COUNT_TTL: int = 60
+
+    LOCAL_CACHE_MAX_ENTRIES: int = 1024
+    LOCAL_CACHE_MAX_BYTES: int = 32 * 1024 * 1024
+    LOCAL_CACHE_TTL: float = 30.0
+    CACHE_GENERATION_TTL: float = 5.0
+    CACHE_STALE_TTL: int = 60
+    CACHE_LOCK_ENABLED: bool = False
+    CACHE_LOCK_TIMEOUT: float = 5.0
+    CACHE_CODEC: str = "orjson"
+    CACHE_COMPRESSION: str = "zlib"
+    CACHE_COMPRESS_MIN_BYTES: int = 4096
+
+    API_KEY_CACHE_TTL: int = 60
+    API_KEY_LOCAL_TTL: float = 10.0
+    API_KEY_LOCAL_MAX_ENTRIES: int = 10_000
+    API_KEY_LOCAL_MAX_BYTES: int = 4 * 1024 * 1024
+    LAST_USED_FLUSH_INTERVAL: float = 30.0
+
+    REPORT_ROLLUP_LOOKBACK_DAYS: int = 7
+
     model_config = SettingsConfigDict(
         env_file=Path(__file__).resolve().parent.parent.parent /".env"
     )
@@ -0,0 +1,98 @@
+import json
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Callable, Optional
+
+
+def key_prefix(key: str) -> str:
+    return key.split(":", 1)[0]
+
+
+class CacheStats:
+    """Hit/miss/eviction counters per cache tier and key prefix (plus loader events)."""
+
+    def __init__(self):
+        self._counters: dict[tuple[str, str], dict[str, int]] = defaultdict(
+            lambda: {"hits": 0, "misses": 0, "evictions": 0}
+        )
+
+    def record(self, tier: str, key: str, event: str, count: int = 1):
+        counters = self._counters[(tier, key_prefix(key))]
+        counters[event] = counters.get(event, 0) + count
+
+    def snapshot(self) -> dict[str, dict[str, dict[str, int]]]:
+        result: dict = {}
+        for (tier, prefix), counters in self._counters.items():
+            result.setdefault(tier, {})[prefix] = dict(counters)
+        return result
+
+
+class LocalCache:
+    """Per-process LRU in front of Redis, bounded by entry count and payload bytes.
+
+    Entries hold the serialized payload and decode it once on first read, so a
+    hot key pays neither the network hop nor the parse after that; ``get_raw``
+    hands out the payload itself. Values returned from here are shared between
+    callers and must not be mutated.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 32 * 1024 * 1024, ttl: float = 30.0,
+                 stats: Optional[CacheStats] = None, decode: Callable[[Any], Any] = json.loads):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.stats = stats or CacheStats()
+        self.decode = decode
+        self.bytes = 0
+        # key -> [expires_at, size, serialized, decoded]
+        self._entries: "OrderedDict[str, list]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _lookup(self, key: str) -> Optional[list]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                self._drop(key)
+            self.stats.record("local", key, "misses")
+            return None
+        self._entries.move_to_end(key)
+        self.stats.record("local", key, "hits")
+        return entry
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._lookup(key)
+        if entry is None:
+            return None
+        if entry[3] is None:
+            entry[3] = self.decode(entry[2])
+        return entry[3]
+
+    def get_raw(self, key: str) -> Optional[bytes | str]:
+        entry = self._lookup(key)
+        return entry[2] if entry is not None else None
+
+    def set(self, key: str, serialized: bytes | str, ttl: Optional[float] = None, decoded: Any = None):
+        size = len(serialized)
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = [time.monotonic() + min(ttl or self.ttl, self.ttl), size, serialized, decoded]
+        self.bytes += size
+        while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self.stats.record("local", oldest, "evictions")
+
+    def delete(self, key: str):
+        if key in self._entries:
+            self._drop(key)
+
+    def clear(self):
+        self._entries.clear()
+        self.bytes = 0
+
+    def _drop(self, key: str):
+        self.bytes -= self._entries.pop(key)[1]
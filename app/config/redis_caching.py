@@ -1,25 +1,97 @@
 import asyncio
 import json
 import hashlib
-from typing import Any, Optional
+import time
+import secrets
+from typing import Any, Awaitable, Callable, Optional
 from redis import asyncio as aioredis
+from redis.asyncio.client import Pipeline
 from .config import settings
+from .local_cache import LocalCache, CacheStats
+from .codecs import CacheCodec, ENVELOPE, dumps_json
+
+# workers publish here so every process drops the same keys from its local tier
+INVALIDATION_CHANNEL = "cache:invalidate"
+GENERATION_KEY = "cache:generation:{}"
+LOCK_KEY = "cache:lock:{}"
+# delete the lock only if this worker still holds it
+RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+# called with (command, seconds) after every command on clients made by RedisCache;
+# app.utils.timing registers one, the way pymongo takes a CommandListener
+command_listeners: list[Callable[[str, float], None]] = []
+
+
+def _notify(command: str, started: float):
+    elapsed = time.perf_counter() - started
+    for listener in command_listeners:
+        listener(command, elapsed)
+
+
+class InstrumentedRedis(aioredis.Redis):
+    """Redis client that reports each command (and each pipeline round trip) to ``command_listeners``."""
+
+    async def execute_command(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        finally:
+            _notify(str(args[0]).upper(), started)
+
+    def pipeline(self, transaction: bool = True, shard_hint: Optional[str] = None) -> Pipeline:
+        return InstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+class InstrumentedPipeline(Pipeline):
+    async def execute(self, raise_on_error: bool = True):
+        started = time.perf_counter()
+        try:
+            return await super().execute(raise_on_error)
+        finally:
+            _notify("PIPELINE", started)
 
 
 class RedisCache:
     _client: Optional[aioredis.Redis] = None
 
-    def __init__(self, redis_url: str = settings.REDIS_URL, default_ttl: int = 300):
+    def __init__(self, redis_url: str = settings.REDIS_URL, default_ttl: int = 300,
+                 local_cache: Optional[LocalCache] = None, generation_ttl: float = settings.CACHE_GENERATION_TTL,
+                 stale_ttl: int = settings.CACHE_STALE_TTL, use_lock: bool = settings.CACHE_LOCK_ENABLED,
+                 lock_timeout: float = settings.CACHE_LOCK_TIMEOUT, codec: Optional[CacheCodec] = None,
+                 decode_responses: bool = False):
         self.redis_url = redis_url
         self.default_ttl = default_ttl
+        self.decode_responses = decode_responses
+        self.codec = codec or CacheCodec(
+            settings.CACHE_CODEC, settings.CACHE_COMPRESSION, settings.CACHE_COMPRESS_MIN_BYTES
+        )
+        self.stale_ttl = stale_ttl
+        self.use_lock = use_lock
+        self.lock_timeout = lock_timeout
+        # one loader per key per process; concurrent misses await the same future
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._loads: set[asyncio.Task] = set()
+        self.local = local_cache
+        if local_cache is not None:
+            local_cache.decode = self.codec.decode
+        self.cache_stats = local_cache.stats if local_cache is not None else CacheStats()
+        self.generation_ttl = generation_ttl
+        # namespace -> (expires_at, generation); refreshed from Redis and pushed over pub/sub
+        self._generations: dict[str, tuple[float, int]] = {}
 
     async def get_client(self) -> aioredis.Redis:
         await asyncio.sleep(0)
         if not self._client:
-            self._client = aioredis.from_url(
+            self._client = InstrumentedRedis.from_url(
                 self.redis_url,
                 encoding="utf-8",
-                decode_responses=True
+                # cache payloads are binary (see CacheCodec)
+                decode_responses=self.decode_responses
             )
         return self._client
 
@@ -29,40 +101,252 @@ class RedisCache:
             self._client = None
 
     @staticmethod
-    def generate_cache_key(prefix: str, **kwargs) -> str:
+    def generate_cache_key(prefix: str, generation: Optional[int] = None, **kwargs) -> str:
         sorted_params = sorted(kwargs.items())
         params_str = json.dumps(sorted_params, sort_keys=True)
         hash_suffix = hashlib.md5(params_str.encode()).hexdigest()
+        if generation is not None:
+            return f"{prefix}:v{generation}:{hash_suffix}"
         return f"{prefix}:{hash_suffix}"
 
-    async def get(self, key: str) -> Optional[Any]:
+    async def generation(self, namespace: str) -> int:
+        known = self._generations.get(namespace)
+        if known and known[0] > time.monotonic():
+            return known[1]
+        try:
+            client = await self.get_client()
+            value = int(await client.get(GENERATION_KEY.format(namespace)) or 0)
+        except Exception as e:
+            print(f"Cache generation error: {e}")
+            return known[1] if known else 0
+        self._remember_generations({namespace: value})
+        return value
+
+    async def versioned_key(self, prefix: str, namespace: str, **kwargs) -> str:
+        """Cache key that includes the namespace generation, so ``bump_generation`` retires it."""
+        return self.generate_cache_key(prefix, generation=await self.generation(namespace), **kwargs)
+
+    async def bump_generation(self, *namespaces: str):
+        """Invalidate every versioned key of the namespaces in O(1); old entries just age out."""
+        try:
+            client = await self.get_client()
+            async with client.pipeline(transaction=False) as pipe:
+                for namespace in namespaces:
+                    pipe.incr(GENERATION_KEY.format(namespace))
+                values = dict(zip(namespaces, await pipe.execute()))
+            self._remember_generations(values)
+            await client.publish(INVALIDATION_CHANNEL, json.dumps({"generations": values}))
+        except Exception as e:
+            print(f"Cache generation bump error: {e}")
+
+    def _remember_generations(self, values: dict[str, int]):
+        expires_at = time.monotonic() + self.generation_ttl
+        for namespace, value in values.items():
+            known = self._generations.get(namespace)
+            # a late pub/sub message must not roll a generation back
+            self._generations[namespace] = (expires_at, max(int(value), known[1] if known else 0))
+
+    async def _fetch(self, key: str) -> Optional[bytes]:
         try:
             client = await self.get_client()
             cached = await client.get(key)
-            if cached:
-                return json.loads(cached)
+            self.cache_stats.record("redis", key, "hits" if cached else "misses")
+            return cached or None
         except Exception as e:
             print(f"Cache get error: {e}")
-        return None
+            return None
+
+    async def get(self, key: str) -> Optional[Any]:
+        if self.local is not None:
+            value = self.local.get(key)
+            if value is not None:
+                return value
+        cached = await self._fetch(key)
+        if cached is None:
+            return None
+        value = self.codec.decode(cached)
+        if self.local is not None:
+            self.local.set(key, cached, decoded=value)
+        return value
+
+    async def get_raw(self, key: str) -> Optional[bytes]:
+        """The stored payload, without decoding it."""
+        if self.local is not None:
+            cached = self.local.get_raw(key)
+            if cached is not None:
+                return cached
+        cached = await self._fetch(key)
+        if cached is not None and self.local is not None:
+            self.local.set(key, cached)
+        return cached
 
     async def set(self, key: str, data: Any, ttl: Optional[int] = None) -> bool:
+        return await self._store(key, self.codec.encode(data), ttl)
+
+    async def _store(self, key: str, payload: bytes, ttl: Optional[int] = None) -> bool:
         try:
             client = await self.get_client()
-            serialized = json.dumps(data, default=str)
-            await client.setex(key, ttl or self.default_ttl, serialized)
+            await client.setex(key, ttl or self.default_ttl, payload)
+            if self.local is not None:
+                self.local.set(key, payload, ttl or self.default_ttl)
             return True
         except Exception as e:
             print(f"Cache set error: {e}")
             return False
 
-    async def invalidate(self, pattern: str = None, key: str = None):
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Any]], ttl: Optional[int] = None,
+                          raw: bool = False) -> Any:
+        """Cached value for ``key``, calling ``loader`` at most once per process on a miss.
+
+        Entries stay in Redis for ``stale_ttl`` seconds past their ``ttl``; a
+        stale entry is returned immediately while a single background task
+        reloads it. With ``use_lock`` the reload is also serialized across
+        processes through a short Redis lock. ``None`` results are not cached.
+        With ``raw`` the value comes back as JSON bytes, ready to send as-is.
+        """
+        ttl = ttl or self.default_ttl
+        fresh_until, value = await self._cached_entry(key, raw)
+        if fresh_until is not None:
+            if fresh_until < time.time() and key not in self._inflight:
+                self.cache_stats.record("loader", key, "stale")
+                self._start_load(key, loader, ttl).add_done_callback(self._log_refresh_error)
+            return value
+
+        if key in self._inflight:
+            self.cache_stats.record("loader", key, "coalesced")
+        # shielded: a cancelled request must not cancel the load other requests are waiting on
+        value = await asyncio.shield(self._start_load(key, loader, ttl))
+        return dumps_json(value) if raw and value is not None else value
+
+    async def _cached_entry(self, key: str, raw: bool) -> tuple[Optional[float], Any]:
+        if raw:
+            cached = await self.get_raw(key)
+            if isinstance(cached, bytes) and cached[:1] == ENVELOPE:
+                fresh_until, payload = self.codec.unpack_entry(cached)
+                return fresh_until, self.codec.to_json(payload)
+            return None, None
+        entry = await self.get(key)
+        if isinstance(entry, dict) and "fresh_until" in entry:
+            return entry["fresh_until"], entry["value"]
+        return None, None
+
+    def _start_load(self, key: str, loader: Callable[[], Awaitable[Any]], ttl: int) -> asyncio.Future:
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._inflight[key] = future
+            task = asyncio.create_task(self._run_load(key, loader, ttl, future))
+            self._loads.add(task)
+            task.add_done_callback(self._loads.discard)
+        return future
+
+    async def _run_load(self, key: str, loader: Callable[[], Awaitable[Any]], ttl: int, future: asyncio.Future):
+        try:
+            future.set_result(await self._load(key, loader, ttl))
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            self._inflight.pop(key, None)
+
+    @staticmethod
+    def _log_refresh_error(future: asyncio.Future):
+        if not future.cancelled() and future.exception():
+            print(f"Cache refresh error: {future.exception()}")
+
+    async def _load(self, key: str, loader: Callable[[], Awaitable[Any]], ttl: int) -> Any:
+        token = await self._acquire_lock(key) if self.use_lock else None
+        if self.use_lock and token is None:
+            # another process is loading this key; wait for its result, then give up and load
+            deadline = time.monotonic() + self.lock_timeout
+            while time.monotonic() < deadline:
+                await asyncio.sleep(0.05)
+                entry = await self.get(key)
+                if isinstance(entry, dict) and entry.get("fresh_until", 0) >= time.time():
+                    self.cache_stats.record("loader", key, "coalesced")
+                    return entry["value"]
+        try:
+            self.cache_stats.record("loader", key, "loads")
+            value = await loader()
+            if value is not None:
+                await self._store(key, self.codec.pack_entry(value, time.time() + ttl), ttl + self.stale_ttl)
+            return value
+        finally:
+            if token is not None:
+                await self._release_lock(key, token)
+
+    async def _acquire_lock(self, key: str) -> Optional[str]:
+        token = secrets.token_hex(8)
         try:
             client = await self.get_client()
-            if key:
-                await client.delete(key)
-            elif pattern:
-                keys = await client.keys(pattern)
-                if keys:
-                    await client.delete(*keys)
+            if await client.set(LOCK_KEY.format(key), token, nx=True, px=int(self.lock_timeout * 1000)):
+                return token
+            return None
+        except Exception as e:
+            print(f"Cache lock error: {e}")
+            # without Redis there is nothing to coordinate with; load locally
+            return ""
+
+    async def _release_lock(self, key: str, token: str):
+        if not token:
+            return
+        try:
+            client = await self.get_client()
+            await client.eval(RELEASE_LOCK_SCRIPT, 1, LOCK_KEY.format(key), token)
+        except Exception as e:
+            print(f"Cache unlock error: {e}")
+
+    async def invalidate(self, key: str = None, keys: Optional[list[str]] = None):
+        """Delete specific keys in one round trip; use ``bump_generation`` for whole namespaces."""
+        keys = [*(keys or []), *([key] if key else [])]
+        if not keys:
+            return
+        self._invalidate_local(keys)
+        try:
+            client = await self.get_client()
+            await client.delete(*keys)
+            await client.publish(INVALIDATION_CHANNEL, json.dumps({"keys": keys}))
         except Exception as e:
             print(f"Cache invalidation error: {e}")
+
+    def _invalidate_local(self, keys: list[str]):
+        if self.local is not None:
+            for key in keys:
+                self.local.delete(key)
+
+    def _apply_message(self, message: dict):
+        if "keys" in message:
+            self._invalidate_local(message["keys"])
+        if "generations" in message:
+            self._remember_generations(message["generations"])
+
+    async def listen_for_invalidations(self, retry_delay: float = 1.0):
+        """Apply other processes' invalidations and generation bumps; runs for the app's lifetime."""
+        while True:
+            try:
+                client = await self.get_client()
+                pubsub = client.pubsub()
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                try:
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            self._apply_message(json.loads(message["data"]))
+                finally:
+                    await pubsub.close()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Cache invalidation listener error: {e}")
+                # messages may have been missed while disconnected
+                if self.local is not None:
+                    self.local.clear()
+                self._generations.clear()
+                await asyncio.sleep(retry_delay)
+
+    def stats(self) -> dict:
+        stats = {"tiers": self.cache_stats.snapshot()}
+        if self.local is not None:
+            stats["local"] = {"entries": len(self.local), "bytes": self.local.bytes}
+        return stats
@@ -1,6 +1,8 @@
-from .crawler import BookCrawler, main
+from .crawler import BookCrawler, create_session, run_crawl, main
 
 __all__ = (
     'BookCrawler',
+    'create_session',
+    'run_crawl',
     'main'
 )
\ No newline at end of file
@@ -0,0 +1,50 @@
+import hashlib
+import json
+from datetime import datetime, timezone
+
+# Business fields whose changes are tracked; everything else (crawl time, raw
+# HTML, ids) is ignored so the hash only moves when the book itself changes.
+TRACKED_FIELDS = (
+    "price_incl_tax",
+    "price_excl_tax",
+    "availability",
+    "rating",
+    "num_reviews",
+    "description",
+)
+TRACKED_PROJECTION = {
+    "_id": 1, "source_url": 1, "name": 1, "category": 1, "content_hash": 1, "snapshot_id": 1,
+    **{field: 1 for field in TRACKED_FIELDS},
+}
+
+
+def content_hash(doc: dict) -> str:
+    canonical = json.dumps([doc.get(field) for field in TRACKED_FIELDS], separators=(",", ":"), default=str)
+    return hashlib.md5(canonical.encode()).hexdigest()
+
+
+def diff_fields(old: dict, new: dict) -> list[dict]:
+    return [
+        {"field": field, "old": old.get(field), "new": new.get(field)}
+        for field in TRACKED_FIELDS
+        if old.get(field) != new.get(field)
+    ]
+
+
+def change_record(old: dict, new: dict, changes: list[dict] | None = None) -> dict:
+    """Change log entry for ``old`` becoming ``new``.
+
+    Carries the book's current category, price, rating and reviews so the
+    ``/api/changes`` filters and sorts work on the change log directly.
+    """
+    return {
+        "book_id": old["_id"],
+        "source_url": new.get("source_url"),
+        "name": new.get("name"),
+        "category": new.get("category"),
+        "price_incl_tax": new.get("price_incl_tax"),
+        "rating": new.get("rating"),
+        "num_reviews": new.get("num_reviews"),
+        "timestamp": datetime.now(timezone.utc),
+        "changes": diff_fields(old, new) if changes is None else changes,
+    }
@@ -1,111 +1,430 @@
 import aiohttp
 import asyncio
+import time
+from collections import deque
 from datetime import datetime
+from typing import Iterable
 from fastapi import status
-from selectolax.parser import HTMLParser
 from urllib.parse import urljoin
 
-from app.crawler.parser import BookParser
+from app.crawler.dedup import UrlIndex, recently_crawled
+from app.crawler.distributed import DistributedCrawl
+from app.crawler.executor import ParseExecutor
+from app.crawler.metrics import crawl_metrics
+from app.crawler.parser import (
+    BookParser, Category, ListingPage, extract_book_links, next_page_url, parse_listing, select_categories
+)
+from app.crawler.pipeline import CrawlPipeline
+from app.crawler.revalidation import NOT_MODIFIED, BodyStore, Revalidator
+from app.crawler.throttle import THROTTLE_STATUSES, FetchController, classify, parse_retry_after
+from app.crawler.writer import BookWriter
 from app.db import books_collection
 from app.config import settings
-from app.utils import logger
+from app.utils import logger, CrawlModeEnum
+from app.utils.metrics import metrics_publisher
+
+
+def create_session(limit_per_host: int = settings.CRAWL_LIMIT_PER_HOST) -> aiohttp.ClientSession:
+    connector = aiohttp.TCPConnector(limit_per_host=limit_per_host)
+    return aiohttp.ClientSession(connector=connector)
 
 
 class BookCrawler:
-    def __init__(self, base_url=settings.BASE_URL, session=None, book_parser=None):
+    def __init__(
+            self,
+            base_url=settings.BASE_URL,
+            session=None,
+            book_parser=None,
+            concurrency: int = settings.CRAWL_CONCURRENCY,
+            prefetch_pages: int = settings.CRAWL_PREFETCH_PAGES,
+            parse_executor: ParseExecutor | None = None,
+            revalidator: Revalidator | None = None,
+            writer: BookWriter | None = None,
+            url_index: UrlIndex | None = None,
+            partitions: int = settings.CRAWL_PARTITIONS,
+            controller: FetchController | None = None,
+            timeout: float = settings.CRAWL_TIMEOUT,
+            fetch_bytes: bool = settings.CRAWL_FETCH_BYTES,
+            max_body_bytes: int = settings.CRAWL_MAX_BODY_BYTES,
+    ):
         self.base_url = base_url
         self.session = session
         self.logger = logger
         self.parser = book_parser
+        self.parse_executor = parse_executor
+        self.revalidator = revalidator
+        self.writer = writer or BookWriter()
+        if revalidator:
+            self.writer.on_written.append(revalidator.commit)
+        self.url_index = url_index
+        self.controller = controller or FetchController()
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        # raw bytes straight to the parser, skipping charset detection and the str copy
+        self.fetch_bytes = fetch_bytes
+        self.max_body_bytes = max_body_bytes
+        self.concurrency = max(1, concurrency)
+        # listing pages fetched ahead of the one whose books are still in flight
+        self.prefetch_pages = max(0, prefetch_pages)
+        # categories crawled at the same time; they share the book semaphore
+        self.partitions = max(1, partitions)
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+
+    async def fetch(self, url: str, allow_not_modified: bool = False):
+        """Fetch a page's HTML, or None on failure.
 
-    async def fetch(self, url: str):
-        for _ in range(3):
+        The body is read up to ``max_body_bytes`` (a larger page is dropped, not
+        retried) and comes back decoded to a str, or with ``fetch_bytes`` as the
+        raw bytes.
+        Requests go through the controller's per-host limiter. Failures are
+        retried with jittered exponential backoff; a permanent 4xx is not.
+        With a revalidator the request is conditional. ``allow_not_modified``
+        callers get ``NOT_MODIFIED`` back for an unchanged page; the others get
+        the body, served from the body store on a 304.
+        """
+        need_body = not allow_not_modified
+        headers = self.revalidator.conditional_headers(url, need_body) if self.revalidator else {}
+        limiter = self.controller.limiter(url)
+        for attempt in range(self.controller.retries):
+            outcome, retry_after = "error", None
+            # waits while the host is at its adaptive limit, paused by Retry-After or behind an open breaker
+            started = await limiter.acquire()
             try:
-                async with self.session.get(url, timeout=10) as resp:
+                async with self.session.get(url, timeout=self.timeout, headers=headers or None) as resp:
+                    if resp.status == status.HTTP_304_NOT_MODIFIED and headers:
+                        outcome = "ok"
+                        crawl_metrics.fetch_seconds.observe(time.monotonic() - started)
+                        crawl_metrics.pages_not_modified.inc()
+                        html = await self.revalidator.not_modified(url, need_body, self.fetch_bytes)
+                        if html is not None:
+                            return html
+                        # stored body went missing; ask again without validators
+                        headers = {}
+                        continue
                     if resp.status == status.HTTP_200_OK:
-                        return await resp.text()
+                        body = await self._read_body(resp, url)
+                        outcome = "ok"
+                        crawl_metrics.fetch_seconds.observe(time.monotonic() - started)
+                        if body is None:
+                            crawl_metrics.pages_failed.inc()
+                            return None
+                        crawl_metrics.pages_ok.inc()
+                        crawl_metrics.bytes.inc(len(body))
+                        html = body if self.fetch_bytes else self._decode(resp, body)
+                        # a book page's validators only count once the book is stored
+                        if self.revalidator and await self.revalidator.record(
+                                url, resp.headers, html, defer=allow_not_modified
+                        ):
+                            return NOT_MODIFIED if allow_not_modified else html
+                        return html
+                    if resp.status in THROTTLE_STATUSES:
+                        retry_after = parse_retry_after(resp.headers.get("Retry-After"))
+                    outcome = classify(resp.status, retry_after)
+                    crawl_metrics.fetch_seconds.observe(time.monotonic() - started)
+                    if outcome == "permanent":
+                        self.logger.error(f"Failed to fetch {url}: HTTP {resp.status}, not retrying")
+                        crawl_metrics.pages_failed.inc()
+                        return None
+                    self.logger.warning(f"Retry {url}: HTTP {resp.status}")
             except Exception as e:
                 self.logger.warning(f"Retry due to: {e}")
-            await asyncio.sleep(2)
+            finally:
+                await limiter.release(started, outcome, retry_after)
+            if attempt + 1 < self.controller.retries:
+                (crawl_metrics.retries_throttled if outcome == "throttled" else crawl_metrics.retries_error).inc()
+                await asyncio.sleep(self.controller.backoff(attempt))
         self.logger.error(f"Failed to fetch {url}")
+        crawl_metrics.pages_failed.inc()
         return None
 
     @staticmethod
-    async def get_last_page():
-        state = await books_collection.find_one({"_id": "book_crawler"})
-        return state.get("last_page") if state else None
+    def _decode(resp: aiohttp.ClientResponse, body: bytes) -> str:
+        # as resp.text() does: the Content-Type charset, else UTF-8
+        try:
+            return body.decode(resp.charset or "utf-8", errors="replace")
+        except LookupError:
+            return body.decode("utf-8", errors="replace")
+
+    async def _read_body(self, resp: aiohttp.ClientResponse, url: str) -> bytes | None:
+        """The raw body, or None when it is larger than ``max_body_bytes``."""
+        if (resp.content_length or 0) > self.max_body_bytes:
+            self.logger.error(f"Skipping {url}: {resp.content_length} bytes is over the {self.max_body_bytes} byte cap")
+            return None
+        chunks, size = [], 0
+        # chunked or lying about its length: stop reading as soon as the cap is crossed
+        async for chunk in resp.content.iter_chunked(64 * 1024):
+            size += len(chunk)
+            if size > self.max_body_bytes:
+                self.logger.error(f"Skipping {url}: body is over the {self.max_body_bytes} byte cap")
+                return None
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+    async def _begin_run(self):
+        crawl_metrics.crawl_started(self)
+        await self.writer.start()
+        if self.url_index:
+            await self.url_index.load()
+        if self.revalidator:
+            await self.revalidator.load()
+
+    async def _end_run(self):
+        try:
+            await self.writer.close()
+        finally:
+            if self.revalidator:
+                await self.revalidator.save()
+            summary = self.summary()
+            crawl_metrics.crawl_finished(summary)
+            self.logger.info(f"Crawl summary: {summary}")
+
+    def summary(self) -> dict:
+        summary = {"writer": self.writer.summary(), "fetch": self.controller.summary()}
+        if self.url_index:
+            summary["dedup"] = self.url_index.summary()
+        if self.revalidator:
+            summary["revalidation"] = self.revalidator.summary()
+        return summary
+
+    @staticmethod
+    def checkpoint_id(partition: str | None = None) -> str:
+        return f"book_crawler:{partition}" if partition else "book_crawler"
 
     @staticmethod
-    async def save_last_page(next_page):
+    async def get_last_page(partition: str | None = None, run: list[str] | None = None):
+        """The partition's checkpoint; with ``run``, only if it was saved by a run over those categories."""
+        state = await books_collection.find_one({"_id": BookCrawler.checkpoint_id(partition)})
+        if not state or (run is not None and state.get("run") != run):
+            return None
+        return state.get("last_page")
+
+    @staticmethod
+    async def save_last_page(next_page, partition: str | None = None, run: list[str] | None = None):
+        fields = {"last_page": next_page, "last_updated": datetime.now()}
+        if run is not None:
+            fields["run"] = run
         await books_collection.update_one(
-            {"_id": "book_crawler"},
-            {"$set": {"last_page": next_page, "last_updated": datetime.now()}},
+            {"_id": BookCrawler.checkpoint_id(partition)},
+            {"$set": fields},
             upsert=True,
         )
 
-    async def crawl(self):
-        next_page = await self.get_last_page() or self.base_url
-        while next_page:
-            self.logger.info(f"Crawling page {next_page}...")
-            html = await self.fetch(next_page)
+    async def crawl(self, categories: Iterable[str] | None = None):
+        """Crawl the catalogue one category at a time, ``partitions`` categories in parallel.
+
+        Categories come from the sidebar of the first listing page. Each one
+        walks its own listing pages and keeps its own checkpoint, so a restart
+        resumes only the unfinished categories. Book fetches share one
+        semaphore, so ``concurrency`` holds however many categories run.
+        ``categories`` (slugs like ``travel_2`` or names) limits the run to
+        those. A site without a sidebar is crawled as a single partition.
+        """
+        await self._begin_run()
+        try:
+            html = await self.fetch(self.base_url)
             if not html:
-                break
+                self.logger.error(f"Failed to fetch first listing page {self.base_url}")
+                return
+            listing = await self._parse_listing(html, self.base_url)
+            if not listing.categories:
+                last_page = await self.get_last_page()
+                await self._crawl_partition(None, last_page or self.base_url, None if last_page else html)
+                return
+
+            selected = select_categories(listing.categories, categories)
+            if not selected:
+                self.logger.warning(f"No categories match {sorted(categories)}")
+                return
+            plan = await self._plan_partitions(selected)
+            limit = asyncio.Semaphore(self.partitions)
+
+            async def crawl_partition(category: Category, start: str):
+                async with limit:
+                    try:
+                        await self._crawl_partition(category, start)
+                    except Exception as e:
+                        # only this category stops; it resumes from its checkpoint next run
+                        self.logger.error(f"Crawling category {category.name} failed: {e}")
+
+            async with asyncio.TaskGroup() as group:
+                for category, start in plan:
+                    group.create_task(crawl_partition(category, start))
+        finally:
+            await self._end_run()
+
+    async def _plan_partitions(self, categories: list[Category]) -> list[tuple[Category, str]]:
+        """(category, first page to crawl) for every partition this run still has to do.
 
-            tree = HTMLParser(html)
-            book_links = self._extract_book_links(tree)
+        Checkpoints record the categories of the run that saved them, so only
+        an interrupted run over the same categories is resumed; checkpoints left
+        by a run over other categories are ignored.
+        """
+        run = sorted(category.key for category in categories)
+        pages = await asyncio.gather(*(self.get_last_page(category.key, run) for category in categories))
+        if any(pages):
+            # an interrupted run: finished partitions saved None as their checkpoint
+            plan = [(category, page) for category, page in zip(categories, pages) if page]
+            self.logger.info(f"Resuming {len(plan)} of {len(categories)} categories")
+            return plan
+        # a fresh run: mark every partition as not started, so a restart knows what is left
+        await asyncio.gather(*(self.save_last_page(category.url, category.key, run) for category in categories))
+        self.logger.info(f"Crawling {len(categories)} categories, {self.partitions} at a time")
+        return [(category, category.url) for category in categories]
 
-            for url in book_links:
-                await self._process_book(url)
+    async def _crawl_partition(self, category: Category | None, next_page: str, html=None):
+        partition = category.key if category else None
+        name = category.name if category else None
+        # (books task, checkpoint) per listing page, oldest first; checkpoints
+        # are saved in page order so a restart never skips unfinished books
+        in_flight = deque()
+        try:
+            while next_page:
+                self.logger.info(f"Crawling page {next_page}...")
+                page_url = next_page
+                if html is None:
+                    html = await self.fetch(page_url)
+                if not html:
+                    break
 
-            next_page = self._next_page(tree)
+                listing = await self._parse_listing(html, page_url)
+                html = None
+                next_page = listing.next_page
 
-            await self.save_last_page(next_page)
+                in_flight.append((asyncio.create_task(self._process_books(listing.links, name)), next_page))
+                while len(in_flight) > self.prefetch_pages:
+                    await self._checkpoint(*in_flight.popleft(), partition)
 
-            if not next_page:
-                self.logger.info("No more pages to crawl.")
-                break
+            while in_flight:
+                await self._checkpoint(*in_flight.popleft(), partition)
+        finally:
+            for task, _ in in_flight:
+                task.cancel()
+
+        if not next_page:
+            self.logger.info(f"No more pages to crawl{f' in {name}' if name else ''}.")
+
+    async def _checkpoint(self, books_task: asyncio.Task, next_page, partition: str | None = None):
+        await books_task
+        # never let the checkpoint run ahead of what is persisted
+        await self.writer.flush()
+        await self.save_last_page(next_page, partition)
+
+    async def _process_books(self, urls, category: str | None = None):
+        await asyncio.gather(*(self._process_book_bounded(url, category) for url in urls))
+        if category and urls:
+            await self.writer.assign_category(urls, category)
+
+    async def _process_book_bounded(self, url, category: str | None = None):
+        frontier = crawl_metrics.queues["frontier"]
+        frontier.inc()
+        try:
+            async with self._semaphore:
+                await self._process_book(url, category)
+        finally:
+            frontier.dec()
+
+    async def _parse_listing(self, html, page_url: str | None = None) -> ListingPage:
+        started = time.perf_counter()
+        if self.parse_executor:
+            listing = await self.parse_executor.parse_listing(html, self.base_url, page_url)
+        else:
+            listing = parse_listing(html, self.base_url, page_url)
+        crawl_metrics.parse_listing_seconds.observe(time.perf_counter() - started)
+        return listing
+
+    async def _parse_book(self, html, url, category):
+        started = time.perf_counter()
+        if self.parse_executor:
+            book = await self.parse_executor.parse_book(html, url, category)
+        else:
+            book = self.parser(html, url, category).parse_book()
+        crawl_metrics.parse_book_seconds.observe(time.perf_counter() - started)
+        return book
 
     def _extract_book_links(self, tree):
-        links = []
-        for node in tree.css("article.product_pod h3 a"):
-            href = node.attributes.get("href", "")
-            if "catalogue/" not in href:
-                href = f"catalogue/{href.lstrip('./')}"
-            links.append(urljoin(self.base_url, href))
-        return links
-
-    async def _process_book(self, url):
-        exists = await books_collection.find_one({"url": url})
-        if exists:
-            self.logger.info(f"Skipping {url} as it already exists")
+        return extract_book_links(tree, self.base_url)
+
+    async def _is_known(self, url) -> bool:
+        if self.url_index:
+            return self.url_index.seen(url)
+        recent = recently_crawled(settings.DEDUP_MAX_AGE_DAYS)
+        if recent is None:
+            return False
+        return await books_collection.find_one({"source_url": url, **recent}, {"_id": 1}) is not None
+
+    async def _process_book(self, url, category: str | None = None):
+        if await self._is_known(url):
+            self.logger.info(f"Skipping {url} as it was crawled recently")
+            return
+        book_html = await self.fetch(url, allow_not_modified=True)
+        if book_html is NOT_MODIFIED:
+            self.logger.info(f"Skipping {url} as it is unchanged")
+            await self._mark_unchanged(url)
             return
-        book_html = await self.fetch(url)
         if not book_html:
             self.logger.error(f"Failed to fetch {url}")
             return
-        book_data = self.parser(book_html, url, "Unknown").parse_book()
+        # without a category (no sidebar) the parser reads it off the breadcrumb
+        book_data = await self._parse_book(book_html, url, category)
+        await self.writer.add(book_data)
+        if self.url_index:
+            self.url_index.add(url)
+
+    async def _mark_unchanged(self, url: str):
+        """A 304 means the stored book is current: move its crawl timestamp so it counts as fresh."""
         await books_collection.update_one(
-            {"name": book_data.name},
-            {"$set": book_data.model_dump(mode="json")},
-            upsert=True,
+            {"source_url": url}, {"$set": {"crawl_timestamp": datetime.now().isoformat()}}
         )
-        self.logger.info(f"Saved {book_data.name}")
+        if self.url_index:
+            self.url_index.add(url)
 
     def _next_page(self, tree):
-        next_btn = tree.css_first(".next a")
-        if not next_btn:
-            return None
-        href = next_btn.attributes.get("href", "")
-        if 'catalogue/' not in href:
-            href = f"catalogue/{next_btn.attributes.get('href').lstrip('./')}"
-        return urljoin(self.base_url, href) if next_btn else None
+        return next_page_url(tree, self.base_url)
+
+    def _page_url(self, page: int) -> str:
+        return urljoin(self.base_url, f"catalogue/page-{page}.html")
+
+
+async def run_crawl(session: aiohttp.ClientSession, categories: Iterable[str] | None = None) -> dict:
+    """One full crawl over an existing session, optionally of some categories only; returns the crawl summary."""
+    with ParseExecutor() as parse_executor:
+        revalidator = None
+        if settings.HTTP_REVALIDATE:
+            revalidator = Revalidator(BodyStore(settings.BODY_STORE_DIR) if settings.BODY_STORE_DIR else None)
+        crawler = BookCrawler(
+            session=session,
+            book_parser=BookParser,
+            parse_executor=parse_executor,
+            revalidator=revalidator,
+            url_index=UrlIndex(),
+        )
+        if settings.CRAWL_MODE == CrawlModeEnum.pipeline:
+            await CrawlPipeline(crawler).run(categories)
+        elif settings.CRAWL_MODE == CrawlModeEnum.distributed:
+            distributed = DistributedCrawl(crawler)
+            await distributed.run(categories)
+            return {**crawler.summary(), "queue": distributed.summary()}
+        else:
+            await crawler.crawl(categories)
+        return crawler.summary()
+
+
+async def main(categories: Iterable[str] | None = None):
+    async with create_session() as session:
+        await run_crawl(session, categories)
 
 
-async def main():
-    async with aiohttp.ClientSession() as session:
-        crawler = BookCrawler(session=session, book_parser=BookParser)
-        await crawler.crawl()
+async def run_standalone():
+    """``python -m app.crawler.crawler``: crawl while publishing metrics for the API's ``/metrics``."""
+    metrics_publisher.role = "crawler"
+    publisher = asyncio.create_task(metrics_publisher.run())
+    try:
+        await main()
+    finally:
+        publisher.cancel()
+        await asyncio.gather(publisher, return_exceptions=True)
+        # once more, so the finished status is there until the snapshot goes stale
+        await metrics_publisher.publish()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    asyncio.run(run_standalone())
@@ -0,0 +1,131 @@
+import hashlib
+import math
+import sys
+from datetime import datetime, timedelta
+
+from app.config import settings
+from app.db import books_collection
+from app.utils import logger
+
+
+def url_digest(url: str) -> int:
+    return int.from_bytes(hashlib.blake2b(url.encode(), digest_size=8).digest(), "big")
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over 64-bit URL digests (no false negatives)."""
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        capacity = max(1, capacity)
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, digest: int):
+        # double hashing: the two 32-bit halves of the digest stand in for k hashes
+        h1, h2 = digest >> 32, (digest & 0xFFFFFFFF) | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, digest: int):
+        for pos in self._positions(digest):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, digest: int) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(digest))
+
+    @property
+    def nbytes(self) -> int:
+        return sys.getsizeof(self.bits)
+
+
+def recently_crawled(max_age_days: float) -> dict | None:
+    """Filter for the books a crawl may skip: crawled in the last ``max_age_days`` and already hashed.
+
+    Books without a ``content_hash`` have no baseline for change detection,
+    so they are always fetched again. ``None`` when ``max_age_days`` is 0:
+    every book is fetched (conditionally, with a revalidator).
+    """
+    if max_age_days <= 0:
+        return None
+    cutoff = datetime.now() - timedelta(days=max_age_days)
+    # crawl_timestamp is stored as an ISO string, which sorts chronologically
+    return {"crawl_timestamp": {"$gte": cutoff.isoformat()}, "content_hash": {"$exists": True}}
+
+
+class UrlIndex:
+    """In-memory index of the book URLs a crawl can skip, loaded once per crawl.
+
+    Only books crawled within ``max_age_days`` are indexed, so anything older
+    is fetched again and goes through conditional revalidation and the
+    writer's content hash comparison; that is where changes are detected. The
+    default of half a day lets a re-run on the same day skip what the last
+    run already fetched while the daily crawl still fetches every book. The
+    URL digest is all the index needs: skipping is decided by age alone, and
+    whether a fetched page changed is decided against the hash the writer
+    reads back for its batch.
+
+    Built from a projection-only scan of ``source_url``, stored as 64-bit
+    digests in a set, or in a Bloom filter once the catalogue is larger than
+    ``bloom_threshold``.
+    """
+
+    def __init__(
+            self,
+            max_age_days: float = settings.DEDUP_MAX_AGE_DAYS,
+            bloom_threshold: int = settings.DEDUP_BLOOM_THRESHOLD,
+            error_rate: float = settings.DEDUP_BLOOM_ERROR_RATE,
+    ):
+        self.max_age_days = max_age_days
+        self.bloom_threshold = bloom_threshold
+        self.error_rate = error_rate
+        self.logger = logger
+        self._digests: set[int] | BloomFilter = set()
+        self.entries = 0
+        self.lookups = 0
+        self.hits = 0
+
+    async def load(self):
+        self.entries = self.lookups = self.hits = 0
+        self._digests = set()
+        recent = recently_crawled(self.max_age_days)
+        if recent is None:
+            self.logger.info("Dedup index disabled (DEDUP_MAX_AGE_DAYS=0), every book is fetched")
+            return
+        query: dict = {"source_url": {"$exists": True}, **recent}
+
+        expected = await books_collection.estimated_document_count()
+        if expected > self.bloom_threshold:
+            self._digests = BloomFilter(expected, self.error_rate)
+        else:
+            self._digests = set()
+        add = self._digests.add
+        async for doc in books_collection.find(query, {"source_url": 1, "_id": 0}):
+            add(url_digest(doc["source_url"]))
+            self.entries += 1
+        self.logger.info(f"Loaded {self.entries} known book URLs into the dedup index")
+
+    def seen(self, url: str) -> bool:
+        self.lookups += 1
+        hit = url_digest(url) in self._digests
+        self.hits += hit
+        return hit
+
+    def add(self, url: str):
+        self._digests.add(url_digest(url))
+        self.entries += 1
+
+    @property
+    def memory_bytes(self) -> int:
+        if isinstance(self._digests, BloomFilter):
+            return self._digests.nbytes
+        return sys.getsizeof(self._digests) + sum(map(sys.getsizeof, self._digests))
+
+    def summary(self) -> dict:
+        return {
+            "mode": "bloom" if isinstance(self._digests, BloomFilter) else "set",
+            "entries": self.entries,
+            "memory_bytes": self.memory_bytes,
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": round(self.hits / self.lookups, 4) if self.lookups else 0.0,
+        }
@@ -0,0 +1,172 @@
+import asyncio
+from dataclasses import dataclass, asdict
+from typing import TYPE_CHECKING, Iterable
+
+from app.config import settings
+from app.crawler.metrics import crawl_metrics
+from app.crawler.parser import select_categories
+from app.crawler.revalidation import NOT_MODIFIED
+from app.crawler.work_queue import BOOK, LEASED, LISTING, PENDING, ROOT, WorkQueue
+from app.utils import logger
+
+if TYPE_CHECKING:
+    from app.crawler.crawler import BookCrawler
+
+
+@dataclass
+class DistributedStats:
+    listings: int = 0
+    books: int = 0
+    acked: int = 0
+    retried: int = 0
+    failed: int = 0
+
+
+class DistributedCrawl:
+    """Crawl driven by the shared ``WorkQueue``, so several processes or hosts can work one run.
+
+    The first process to join a run enqueues the root page. Its sidebar turns
+    into one listing item per category; a listing item enqueues its unknown
+    books and its next page. Listing items are completed right after their
+    children are enqueued. Book items go through the crawler's ``BookWriter``
+    and are only completed after ``flush()`` has persisted them, batched every
+    ``ack_interval`` seconds, so a process that dies loses nothing: its leases
+    run out and other workers redo those items. Workers stop once the queue
+    reports the run drained.
+    """
+
+    def __init__(
+            self,
+            crawler: "BookCrawler",
+            queue: WorkQueue | None = None,
+            workers: int = settings.CRAWL_CONCURRENCY,
+            poll_interval: float = settings.CRAWL_QUEUE_POLL_INTERVAL,
+            ack_interval: float = settings.WRITER_FLUSH_INTERVAL,
+    ):
+        self.crawler = crawler
+        self.queue = queue or WorkQueue()
+        self.workers = max(1, workers)
+        self.poll_interval = poll_interval
+        self.ack_interval = ack_interval
+        self.logger = logger
+        self.stats = DistributedStats()
+        self._unacked: list[dict] = []
+
+    async def run(self, categories: Iterable[str] | None = None):
+        await self.crawler._begin_run()
+        try:
+            if await self.queue.join():
+                self.logger.info(f"Started crawl run {self.queue.run}")
+                root = {"url": self.crawler.base_url, "kind": ROOT, "category": None}
+                if categories:
+                    root["only"] = list(categories)
+                await self.queue.add([root])
+            else:
+                self.logger.info(f"Joined crawl run {self.queue.run}")
+            await self._run()
+        finally:
+            await self.crawler._end_run()
+
+    async def _run(self):
+        acker = asyncio.create_task(self._ack_periodically())
+        workers = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            for task in (*workers, acker):
+                task.cancel()
+            await asyncio.gather(*workers, acker, return_exceptions=True)
+            await self._ack()
+        self.logger.info(f"Distributed crawl finished: {self.summary()}")
+
+    async def _worker(self):
+        while True:
+            item = await self.queue.lease()
+            if item is None:
+                if await self.queue.finish_if_drained():
+                    return
+                await asyncio.sleep(self.poll_interval)
+                continue
+            try:
+                if item["kind"] == BOOK:
+                    await self._book(item)
+                else:
+                    await self._listing(item)
+            except Exception as e:
+                self.logger.error(f"Crawl item {item['url']} failed: {e}")
+                if await self.queue.release(item, str(e)):
+                    self.stats.failed += 1
+                else:
+                    self.stats.retried += 1
+
+    async def _listing(self, item: dict):
+        url, category = item["url"], item.get("category")
+        html = await self.crawler.fetch(url)
+        if not html:
+            raise RuntimeError("fetch failed")
+        listing = await self.crawler._parse_listing(html, url)
+
+        if item["kind"] == ROOT and listing.categories:
+            children = [
+                {"url": c.url, "kind": LISTING, "category": c.name}
+                for c in select_categories(listing.categories, item.get("only"))
+            ]
+        else:
+            # a category page, or a root page without a sidebar walked as one listing
+            children = [
+                {"url": link, "kind": BOOK, "category": category}
+                for link in listing.links
+                if not await self.crawler._is_known(link)
+            ]
+            if listing.next_page:
+                children.append({"url": listing.next_page, "kind": LISTING, "category": category})
+            if category and listing.links:
+                await self.crawler.writer.assign_category(listing.links, category)
+
+        await self.queue.add(children)
+        await self.queue.complete([item])
+        self.stats.listings += 1
+
+    async def _book(self, item: dict):
+        url = item["url"]
+        html = await self.crawler.fetch(url, allow_not_modified=True)
+        if not html:
+            raise RuntimeError("fetch failed")
+        if html is NOT_MODIFIED:
+            await self.crawler._mark_unchanged(url)
+        else:
+            await self.crawler.writer.add(await self.crawler._parse_book(html, url, item.get("category")))
+            if self.crawler.url_index:
+                self.crawler.url_index.add(url)
+        self._unacked.append(item)
+        self.stats.books += 1
+
+    async def _ack(self):
+        items, self._unacked = self._unacked, []
+        if not items:
+            return
+        try:
+            # books are completed only once they are persisted
+            await self.crawler.writer.flush()
+        except Exception:
+            self._unacked[:0] = items
+            raise
+        self.stats.acked += await self.queue.complete(items)
+
+    async def _ack_periodically(self):
+        while True:
+            await asyncio.sleep(self.ack_interval)
+            try:
+                await self._ack()
+            except Exception as e:
+                self.logger.error(f"Acknowledging crawled books failed, will retry: {e}")
+            try:
+                # the shared queue, as seen by this process
+                counts = await self.queue.counts()
+                crawl_metrics.queues["pending"].set(counts.get(PENDING, 0))
+                crawl_metrics.queues["leased"].set(counts.get(LEASED, 0))
+            except Exception as e:
+                self.logger.warning(f"Reading crawl queue depth failed: {e}")
+
+    def summary(self) -> dict:
+        return asdict(self.stats)
@@ -0,0 +1,57 @@
+import asyncio
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+
+from app.config import settings
+from app.crawler.parser import BookParser, ListingPage, parse_book_record, parse_listing
+from app.schemas import Book
+from app.utils import ParseExecutorEnum
+
+
+class ParseExecutor:
+    """Runs selectolax parsing off the event loop.
+
+    Workers receive the raw page and return a compact record (``ListingPage`` or
+    a dict of book fields); the ``Book`` model is assembled back on the loop, so
+    the full HTML never makes the return trip. With ``kind="none"`` parsing runs
+    inline, exactly as the crawler did before.
+    """
+
+    def __init__(
+            self,
+            kind: str = settings.PARSE_EXECUTOR,
+            workers: int = settings.PARSE_WORKERS,
+            parser_cls=BookParser,
+    ):
+        self.kind = ParseExecutorEnum(kind)
+        self.workers = workers or os.cpu_count() or 1
+        self.parser_cls = parser_cls
+        self._pool: Executor | None = None
+        if self.kind == ParseExecutorEnum.process:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        elif self.kind == ParseExecutorEnum.thread:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="parser")
+
+    async def _run(self, fn, *args):
+        if self._pool is None:
+            return fn(*args)
+        return await asyncio.get_running_loop().run_in_executor(self._pool, partial(fn, *args))
+
+    async def parse_listing(self, html: str | bytes, base_url: str, page_url: str | None = None) -> ListingPage:
+        return await self._run(parse_listing, html, base_url, page_url)
+
+    async def parse_book(self, html: str | bytes, url: str, category: str = "") -> Book:
+        record = await self._run(parse_book_record, html, url, category, self.parser_cls)
+        return self.parser_cls.build_book(record, html)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
@@ -0,0 +1,106 @@
+import time
+from datetime import datetime
+from typing import TYPE_CHECKING, Callable
+
+from app.utils.metrics import MetricsRegistry, metrics
+
+if TYPE_CHECKING:
+    from app.crawler.crawler import BookCrawler
+
+FETCH_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+PARSE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+WRITE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUEUES = ("listings", "frontier", "pages", "books", "writer", "pending", "leased")
+
+
+class CrawlMetrics:
+    """The crawler's counters, bound to their label values once so the hot path does no lookups.
+
+    Counters live for the whole process (Prometheus wants them monotonic);
+    ``status()`` reports the current or last crawl by subtracting the values
+    seen when it started.
+    """
+
+    def __init__(self, registry: MetricsRegistry):
+        pages = registry.counter("crawler_pages_total", "Pages fetched, by result", ("result",))
+        self.pages_ok = pages.labels("ok")
+        self.pages_not_modified = pages.labels("not_modified")
+        self.pages_failed = pages.labels("failed")
+        self.bytes = registry.counter("crawler_downloaded_bytes_total", "Response bytes read").labels()
+        self.fetch_seconds = registry.histogram(
+            "crawler_fetch_seconds", "Latency of answered fetch attempts", buckets=FETCH_BUCKETS
+        ).labels()
+        retries = registry.counter("crawler_retries_total", "Fetch attempts retried, by reason", ("reason",))
+        self.retries_throttled = retries.labels("throttled")
+        self.retries_error = retries.labels("error")
+        parse = registry.histogram("crawler_parse_seconds", "Parse time per page", ("page",), PARSE_BUCKETS)
+        self.parse_book_seconds = parse.labels("book")
+        self.parse_listing_seconds = parse.labels("listing")
+        self.write_seconds = registry.histogram(
+            "crawler_mongo_write_seconds", "Time to persist one writer batch", buckets=WRITE_BUCKETS
+        ).labels()
+        books = registry.counter("crawler_books_total", "Books written, by result", ("result",))
+        self.books_new = books.labels("new")
+        self.books_updated = books.labels("updated")
+        self.books_unchanged = books.labels("unchanged")
+        depth = registry.gauge("crawler_queue_depth", "Items waiting in each crawl queue", ("queue",))
+        self.queues = {name: depth.labels(name) for name in QUEUES}
+        self.running = registry.gauge("crawler_running", "1 while a crawl is running").labels()
+        registry.register_status("crawl", self.status)
+
+        self._counters = {
+            "pages_ok": self.pages_ok, "pages_not_modified": self.pages_not_modified,
+            "pages_failed": self.pages_failed, "bytes": self.bytes,
+            "retries_throttled": self.retries_throttled, "retries_error": self.retries_error,
+            "books_new": self.books_new, "books_updated": self.books_updated,
+            "books_unchanged": self.books_unchanged,
+        }
+        self._baseline: dict[str, float] = {}
+        self._run: dict | None = None
+        self._crawler: "BookCrawler | None" = None
+        self._started = 0.0
+
+    def track_queues(self, **sizes: Callable[[], int]):
+        """Report these queues' sizes at collection time until ``untrack_queues``."""
+        for name, size in sizes.items():
+            self.queues[name].set_function(size)
+
+    def untrack_queues(self):
+        for gauge in self.queues.values():
+            gauge.set_function(None)
+            gauge.set(0)
+
+    def crawl_started(self, crawler: "BookCrawler"):
+        self._baseline = {name: counter.value for name, counter in self._counters.items()}
+        self._crawler = crawler
+        self._started = time.monotonic()
+        self._run = {"state": "running", "started_at": datetime.now().isoformat(), "finished_at": None}
+        self.running.inc()
+        self.track_queues(writer=crawler.writer.buffered)
+
+    def crawl_finished(self, summary: dict):
+        self.running.dec()
+        self.untrack_queues()
+        self._run.update(state="finished", finished_at=datetime.now().isoformat(),
+                         elapsed_seconds=round(time.monotonic() - self._started, 3), summary=summary)
+        self._crawler = None
+
+    def status(self) -> dict | None:
+        if self._run is None:
+            return None
+        progress = {name: counter.value - self._baseline.get(name, 0.0) for name, counter in self._counters.items()}
+        status = {
+            **self._run,
+            "pages": {key: progress[f"pages_{key}"] for key in ("ok", "not_modified", "failed")},
+            "bytes": progress["bytes"],
+            "retries": progress["retries_throttled"] + progress["retries_error"],
+            "books": {key: progress[f"books_{key}"] for key in ("new", "updated", "unchanged")},
+        }
+        if self._crawler is not None:
+            status["elapsed_seconds"] = round(time.monotonic() - self._started, 3)
+            status["queues"] = {name: gauge.get() for name, gauge in self.queues.items() if gauge.get()}
+            status["fetch"] = self._crawler.controller.summary()
+        return status
+
+
+crawl_metrics = CrawlMetrics(metrics)
@@ -1,13 +1,94 @@
-import hashlib
 import re
 from selectolax.parser import HTMLParser
 from datetime import datetime
+from typing import Iterable, NamedTuple
 from urllib.parse import urljoin
+from app.crawler.changes import content_hash
 from app.schemas import Book
 
 
+class Category(NamedTuple):
+    key: str
+    name: str
+    url: str
+
+
+class ListingPage(NamedTuple):
+    links: list[str]
+    next_page: str | None
+    page_count: int | None
+    categories: list[Category] = []
+
+
+def extract_book_links(tree: HTMLParser, base_url: str) -> list[str]:
+    links = []
+    for node in tree.css("article.product_pod h3 a"):
+        href = node.attributes.get("href", "")
+        if "catalogue/" not in href:
+            href = f"catalogue/{href.lstrip('./')}"
+        links.append(urljoin(base_url, href))
+    return links
+
+
+def next_page_url(tree: HTMLParser, base_url: str, page_url: str | None = None) -> str | None:
+    next_btn = tree.css_first(".next a")
+    if not next_btn:
+        return None
+    href = next_btn.attributes.get("href", "")
+    if page_url:
+        # relative to the page itself, which also holds for category listings
+        return urljoin(page_url, href)
+    if 'catalogue/' not in href:
+        href = f"catalogue/{href.lstrip('./')}"
+    return urljoin(base_url, href)
+
+
+def extract_categories(tree: HTMLParser, page_url: str) -> list[Category]:
+    """Categories listed in the sidebar, keyed by their URL slug (e.g. ``travel_2``)."""
+    categories = []
+    for node in tree.css(".side_categories ul li ul li a"):
+        url = urljoin(page_url, node.attributes.get("href", ""))
+        key = url.rstrip("/").rsplit("/", 2)[-2]
+        categories.append(Category(key, node.text(strip=True), url))
+    return categories
+
+
+def select_categories(categories: list[Category], only: Iterable[str] | None = None) -> list[Category]:
+    """The categories matching ``only`` by slug or name (case-insensitive); all of them without it."""
+    if not only:
+        return list(categories)
+    wanted = {value.strip().lower() for value in only}
+    return [category for category in categories if category.key.lower() in wanted or category.name.lower() in wanted]
+
+
+def page_count(tree: HTMLParser) -> int | None:
+    current = tree.css_first(".pager .current")
+    match = re.search(r"of\s+(\d+)", current.text()) if current else None
+    return int(match.group(1)) if match else None
+
+
+def parse_listing(html: str | bytes, base_url: str, page_url: str | None = None) -> ListingPage:
+    tree = HTMLParser(html)
+    return ListingPage(
+        extract_book_links(tree, base_url),
+        next_page_url(tree, base_url, page_url),
+        page_count(tree),
+        extract_categories(tree, page_url or base_url),
+    )
+
+
+def parse_book_record(html: str | bytes, url: str, category: str = "", parser_cls=None) -> dict:
+    """Parse a detail page into a plain dict of book fields.
+
+    Module-level and free of the raw HTML, so it can run in a process pool and
+    ship back a small picklable result.
+    """
+    return (parser_cls or BookParser)(html, url, category).parse_record()
+
+
 class BookParser:
-    def __init__(self, html: str, url: str, category: str = ""):
+    def __init__(self, html: str | bytes, url: str, category: str = ""):
+        # bytes go to selectolax as they are; the page is never decoded into a str
         self.tree = HTMLParser(html)
         self.html = html
         self.url = url
@@ -73,31 +154,42 @@ class BookParser:
             node = node.next
         return node.text(strip=True) if node else None
 
+    def parse_category(self) -> str | None:
+        # Home > Books > <category> > <title>
+        links = self.tree.css("ul.breadcrumb li a")
+        return links[-1].text(strip=True) if len(links) >= 3 else None
+
     def parse_name(self) -> str | None:
         name_node = self.tree.css_first("h1")
         return name_node.text(strip=True) if name_node else None
 
-    def parse_book(self) -> Book:
-        name = self.parse_name()
+    def parse_record(self) -> dict:
         price_incl, price_excl, num_reviews = self.parse_metadata()
-        availability = self.parse_availability()
-        rating = self.parse_rating()
-        image_url = self.parse_image()
-        description = self.parse_description()
-        book = Book(
-            name=name,
-            description=description,
-            category=self.category,
-            price_excl_tax=price_excl,
-            price_incl_tax=price_incl,
-            availability=availability,
-            num_reviews=num_reviews,
-            image_url=image_url,
-            rating=rating,
-            source_url=self.url,
+        return {
+            "name": self.parse_name(),
+            "description": self.parse_description(),
+            # the partition the book was found in; the breadcrumb covers books found elsewhere
+            "category": self.category or self.parse_category() or "Unknown",
+            "price_excl_tax": price_excl,
+            "price_incl_tax": price_incl,
+            "availability": self.parse_availability(),
+            "num_reviews": num_reviews,
+            "image_url": self.parse_image(),
+            "rating": self.parse_rating(),
+            "source_url": self.url,
+        }
+
+    @staticmethod
+    def build_book(record: dict, html: str | bytes) -> Book:
+        return Book(
+            **record,
             crawl_timestamp=datetime.now(),
-            row_html=str(self.html)
+            row_html=html if isinstance(html, bytes) else str(html),
+            content_hash=content_hash(record),
         )
-        new_hash = hashlib.md5(str(book).encode()).hexdigest()
-        book.hash = new_hash
-        return book
+
+    def parse_book(self) -> Book:
+        record = self.parse_record()
+        # extraction is done: let the tree go before the page moves on to the writer
+        self.tree = None
+        return self.build_book(record, self.html)
@@ -0,0 +1,182 @@
+import asyncio
+from typing import TYPE_CHECKING, Iterable
+from urllib.parse import urljoin
+
+from app.config import settings
+from app.crawler.metrics import crawl_metrics
+from app.crawler.parser import select_categories
+from app.crawler.revalidation import NOT_MODIFIED
+from app.utils import logger
+
+if TYPE_CHECKING:
+    from app.crawler.crawler import BookCrawler
+    from app.crawler.parser import ListingPage
+
+# how a listing page leads to the next ones: a category's first page seeds the
+# rest from its page count (or, without a pager, follows next); a page reached
+# by next follows next; a seeded page leads nowhere
+FIRST_PAGE, NEXT_PAGE = "first", "next"
+
+
+class CrawlPipeline:
+    """Staged crawl: listing pages -> frontier -> fetchers -> parsers -> writer.
+
+    Stages are connected by bounded queues, so a slow stage applies backpressure
+    to the ones feeding it, and each stage is sized independently. The last stage
+    hands books to the crawler's ``BookWriter``, which batches the upserts.
+    Listing pages are seeded from the pager's page count rather than walked one
+    ``next`` link at a time: when the first listing page lists categories, each
+    category's first page is seeded, and once it reports the category's page
+    count the rest of its ``page-N.html`` pages are queued at once. Books carry
+    their category through the queues. Without a sidebar, every catalogue page
+    is seeded up front. Listings without a pager fall back to the ``next`` chain.
+    """
+
+    def __init__(
+            self,
+            crawler: "BookCrawler",
+            listing_workers: int = settings.PIPELINE_LISTING_WORKERS,
+            fetchers: int = settings.PIPELINE_FETCHERS,
+            parsers: int = settings.PIPELINE_PARSERS,
+            queue_size: int = settings.PIPELINE_QUEUE_SIZE,
+            monitor_interval: float = 10.0,
+    ):
+        self.crawler = crawler
+        self.logger = logger
+        self.listing_workers = max(1, listing_workers)
+        self.fetchers = max(1, fetchers)
+        self.parsers = max(1, parsers)
+        self.monitor_interval = monitor_interval
+        # (url, category, walk) items; listing urls are known up front (or arrive with a category's
+        # page count), so this one is unbounded
+        self.listings: asyncio.Queue[tuple[str, str | None, str | None]] = asyncio.Queue()
+        self.frontier: asyncio.Queue[tuple[str, str | None]] = asyncio.Queue(maxsize=queue_size)
+        self.pages: asyncio.Queue[tuple[str, str, str | None]] = asyncio.Queue(maxsize=queue_size)
+        self.books: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+
+    def queue_depths(self) -> dict[str, int]:
+        return {
+            "listings": self.listings.qsize(),
+            "frontier": self.frontier.qsize(),
+            "pages": self.pages.qsize(),
+            "books": self.books.qsize(),
+        }
+
+    async def run(self, categories: Iterable[str] | None = None):
+        await self.crawler._begin_run()
+        crawl_metrics.track_queues(
+            listings=self.listings.qsize, frontier=self.frontier.qsize, pages=self.pages.qsize, books=self.books.qsize,
+        )
+        try:
+            await self._run(categories)
+        finally:
+            await self.crawler._end_run()
+
+    async def _run(self, categories: Iterable[str] | None = None):
+        base_url = self.crawler.base_url
+        html = await self.crawler.fetch(base_url)
+        if not html:
+            self.logger.error(f"Failed to fetch first listing page {base_url}")
+            return
+
+        listing = await self.crawler._parse_listing(html, base_url)
+        if listing.categories:
+            selected = select_categories(listing.categories, categories)
+            self.logger.info(f"Seeding {len(selected)} categories")
+            for category in selected:
+                self.listings.put_nowait((category.url, category.name, FIRST_PAGE))
+            # the books on the first page are reached through their categories
+            listing = listing._replace(links=[], next_page=None)
+            walk = None
+        elif listing.page_count:
+            self.logger.info(f"Seeding {listing.page_count} listing pages")
+            for page in range(2, listing.page_count + 1):
+                self.listings.put_nowait((self.crawler._page_url(page), None, None))
+            walk = None
+        else:
+            walk = NEXT_PAGE
+
+        workers = [
+            *(asyncio.create_task(self._listing_worker()) for _ in range(self.listing_workers)),
+            *(asyncio.create_task(self._fetch_worker()) for _ in range(self.fetchers)),
+            *(asyncio.create_task(self._parse_worker()) for _ in range(self.parsers)),
+            asyncio.create_task(self._write_worker()),
+            asyncio.create_task(self._monitor()),
+        ]
+        try:
+            await self._enqueue_listing(listing, walk=walk)
+            for queue in (self.listings, self.frontier, self.pages, self.books):
+                await queue.join()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+        self.logger.info("Pipeline crawl finished.")
+
+    async def _enqueue_listing(self, listing: "ListingPage", category: str | None = None, page_url: str | None = None,
+                               walk: str | None = None):
+        if walk == FIRST_PAGE and listing.page_count:
+            # the pager says how many pages the category has, so they are fetched in parallel
+            for page in range(2, listing.page_count + 1):
+                await self.listings.put((urljoin(page_url, f"page-{page}.html"), category, None))
+        elif walk and listing.next_page:
+            await self.listings.put((listing.next_page, category, NEXT_PAGE))
+        for url in listing.links:
+            if not await self.crawler._is_known(url):
+                await self.frontier.put((url, category))
+        if category and listing.links:
+            await self.crawler.writer.assign_category(listing.links, category)
+
+    async def _listing_worker(self):
+        while True:
+            url, category, walk = await self.listings.get()
+            try:
+                self.logger.info(f"Crawling page {url}...")
+                html = await self.crawler.fetch(url)
+                if html:
+                    await self._enqueue_listing(await self.crawler._parse_listing(html, url), category, url, walk)
+            except Exception as e:
+                self.logger.error(f"Listing stage failed for {url}: {e}")
+            finally:
+                self.listings.task_done()
+
+    async def _fetch_worker(self):
+        while True:
+            url, category = await self.frontier.get()
+            try:
+                html = await self.crawler.fetch(url, allow_not_modified=True)
+                if html is NOT_MODIFIED:
+                    await self.crawler._mark_unchanged(url)
+                elif html:
+                    await self.pages.put((url, html, category))
+            except Exception as e:
+                self.logger.error(f"Fetch stage failed for {url}: {e}")
+            finally:
+                self.frontier.task_done()
+
+    async def _parse_worker(self):
+        while True:
+            url, html, category = await self.pages.get()
+            try:
+                await self.books.put(await self.crawler._parse_book(html, url, category))
+            except Exception as e:
+                self.logger.error(f"Parse stage failed for {url}: {e}")
+            finally:
+                self.pages.task_done()
+
+    async def _write_worker(self):
+        while True:
+            book = await self.books.get()
+            try:
+                await self.crawler.writer.add(book)
+                if self.crawler.url_index:
+                    self.crawler.url_index.add(book.source_url)
+            except Exception as e:
+                self.logger.error(f"Write stage failed for {book.source_url}: {e}")
+            finally:
+                self.books.task_done()
+
+    async def _monitor(self):
+        while True:
+            await asyncio.sleep(self.monitor_interval)
+            self.logger.info(f"Pipeline queue depths: {self.queue_depths()}")
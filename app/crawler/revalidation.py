@@ -0,0 +1,176 @@
+import asyncio
+import gzip
+import hashlib
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from pathlib import Path
+
+from pymongo import UpdateOne
+
+from app.db import http_cache_collection
+from app.utils import logger
+
+# Returned by BookCrawler.fetch when the page is known to be unchanged since the
+# last crawl, so the caller can skip parsing and writing it.
+NOT_MODIFIED = object()
+
+
+class BodyStore:
+    """Content-addressed on-disk store of gzip-compressed response bodies.
+
+    Bodies are keyed by their sha256 and laid out as ``<root>/ab/abcdef....gz``,
+    so identical pages are stored once and can be re-parsed offline.
+    """
+
+    def __init__(self, root: str | Path):
+        self.root = Path(root)
+
+    def _path(self, digest: str) -> Path:
+        return self.root / digest[:2] / f"{digest}.gz"
+
+    def has(self, digest: str) -> bool:
+        return self._path(digest).exists()
+
+    def _put(self, digest: str, body: bytes):
+        path = self._path(digest)
+        if path.exists():
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_bytes(gzip.compress(body))
+        tmp.replace(path)
+
+    def _get(self, digest: str) -> bytes | None:
+        try:
+            return gzip.decompress(self._path(digest).read_bytes())
+        except FileNotFoundError:
+            return None
+
+    async def put(self, digest: str, body: bytes):
+        await asyncio.to_thread(self._put, digest, body)
+
+    async def get(self, digest: str) -> bytes | None:
+        return await asyncio.to_thread(self._get, digest)
+
+
+@dataclass
+class RevalidationStats:
+    requests: int = 0
+    not_modified: int = 0
+    unchanged_bodies: int = 0
+    bytes_downloaded: int = 0
+    bytes_saved: int = 0
+
+
+class Revalidator:
+    """Conditional GET bookkeeping for the crawler.
+
+    Keeps ``ETag``/``Last-Modified``, body hash and size per URL (persisted in
+    the ``http_cache`` collection, loaded once per crawl) and turns them into
+    ``If-None-Match``/``If-Modified-Since`` headers. A 304, or a 200 whose body
+    hash matches the previous crawl, means the page is unchanged.
+
+    Book pages skip parsing and writing when they are unchanged, so a changed
+    book page's new entry stays pending until the writer has stored the book
+    (``commit``); a page that failed to parse or write is fetched and
+    processed again next crawl.
+    """
+
+    def __init__(self, body_store: BodyStore | None = None):
+        self.body_store = body_store
+        self.logger = logger
+        self.stats = RevalidationStats()
+        self._entries: dict[str, dict] = {}
+        # url -> entry of a changed page whose book is not stored yet
+        self._pending: dict[str, dict] = {}
+        self._dirty: set[str] = set()
+
+    async def load(self):
+        self._entries = {
+            doc["_id"]: doc
+            async for doc in http_cache_collection.find(
+                {}, {"etag": 1, "last_modified": 1, "body_hash": 1, "size": 1}
+            )
+        }
+        self._pending.clear()
+        self.stats = RevalidationStats()
+        self.logger.info(f"Loaded {len(self._entries)} revalidation entries")
+
+    async def save(self):
+        if not self._dirty:
+            return
+        await http_cache_collection.bulk_write(
+            [UpdateOne({"_id": url}, {"$set": self._entries[url]}, upsert=True) for url in self._dirty],
+            ordered=False,
+        )
+        self._dirty.clear()
+
+    def conditional_headers(self, url: str, need_body: bool) -> dict:
+        entry = self._entries.get(url)
+        if not entry:
+            return {}
+        # a 304 carries no body; only ask for one if the caller can do without
+        # the page or it can be served from the body store
+        if need_body and not (self.body_store and self.body_store.has(entry["body_hash"])):
+            return {}
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    async def not_modified(self, url: str, need_body: bool, as_bytes: bool = False):
+        entry = self._entries[url]
+        self.stats.requests += 1
+        self.stats.not_modified += 1
+        self.stats.bytes_saved += entry.get("size", 0)
+        if not need_body:
+            return NOT_MODIFIED
+        body = await self.body_store.get(entry["body_hash"])
+        if body is None or as_bytes:
+            return body
+        return body.decode("utf-8", errors="replace")
+
+    async def record(self, url: str, headers, text: str | bytes, defer: bool = False) -> bool:
+        """Store validators for a 200 response; returns True if the body is unchanged.
+
+        With ``defer`` a changed page's entry is held back until ``commit``.
+        """
+        body = text.encode() if isinstance(text, str) else text
+        digest = hashlib.sha256(body).hexdigest()
+        previous = self._entries.get(url)
+        self.stats.requests += 1
+        self.stats.bytes_downloaded += len(body)
+        entry = {
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "body_hash": digest,
+            "size": len(body),
+            "checked_at": datetime.now(),
+        }
+        if self.body_store:
+            await self.body_store.put(digest, body)
+        unchanged = previous is not None and previous.get("body_hash") == digest
+        if unchanged:
+            self.stats.unchanged_bodies += 1
+        if defer and not unchanged:
+            self._pending[url] = entry
+        else:
+            self._pending.pop(url, None)
+            self._entries[url] = entry
+            self._dirty.add(url)
+        return unchanged
+
+    def commit(self, urls: list[str]):
+        """Make the pending entries of ``urls`` current, once their books are stored."""
+        for url in urls:
+            entry = self._pending.pop(url, None)
+            if entry is not None:
+                self._entries[url] = entry
+                self._dirty.add(url)
+
+    def summary(self) -> dict:
+        stats = asdict(self.stats)
+        stats["requests_avoided"] = stats["not_modified"]
+        return stats
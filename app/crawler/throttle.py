@@ -0,0 +1,252 @@
+import asyncio
+import random
+import time
+from dataclasses import dataclass, asdict
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+from fastapi import status
+
+from app.config import settings
+from app.utils import logger
+
+# 4xx answers worth asking again: timeout, too early, too many requests
+RETRYABLE_4XX = {
+    status.HTTP_408_REQUEST_TIMEOUT,
+    status.HTTP_425_TOO_EARLY,
+    status.HTTP_429_TOO_MANY_REQUESTS,
+}
+# answers that mean "slow down" rather than "broken" (a 503 only when it says for how long)
+THROTTLE_STATUSES = {status.HTTP_429_TOO_MANY_REQUESTS, status.HTTP_503_SERVICE_UNAVAILABLE}
+
+
+def is_permanent(status_code: int) -> bool:
+    """A 4xx that will not change on retry (404, 410, 403, ...)."""
+    return 400 <= status_code < 500 and status_code not in RETRYABLE_4XX
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Seconds to wait from a ``Retry-After`` header, given as seconds or as an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+def classify(status_code: int, retry_after: float | None) -> str:
+    """The ``HostLimiter.release`` outcome for a response that is not a success."""
+    if is_permanent(status_code):
+        return "permanent"
+    if status_code == status.HTTP_429_TOO_MANY_REQUESTS or (status_code in THROTTLE_STATUSES and retry_after is not None):
+        return "throttled"
+    return "error"
+
+
+def backoff_delay(attempt: int, base: float = settings.CRAWL_BACKOFF_BASE,
+                  cap: float = settings.CRAWL_BACKOFF_CAP) -> float:
+    """Exponential backoff with full jitter, so retries from many workers do not line up."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+@dataclass
+class HostStats:
+    requests: int = 0
+    throttled: int = 0
+    errors: int = 0
+    permanent: int = 0
+    decreases: int = 0
+    breaker_opened: int = 0
+    peak_in_flight: int = 0
+
+
+class HostLimiter:
+    """Adaptive cap on in-flight requests to one host, with a circuit breaker.
+
+    The cap follows AIMD: every answered request within ``latency_tolerance``
+    times the host's baseline latency adds ``1 / limit`` (about +1 per round of
+    ``limit`` requests; +1 per request until the first decrease, like TCP slow
+    start); a 429/503, a server error, a timeout or a latency above tolerance
+    multiplies it by ``decrease_factor``, at most once per smoothed round trip
+    so one burst of bad answers counts once. The baseline is the lowest latency
+    seen, drifting slowly towards the current average so it follows a site
+    that became slower for good. ``Retry-After`` pauses the whole host.
+
+    ``breaker_failures`` errors in a row (5xx, timeouts, connection failures;
+    throttling answers with ``Retry-After`` do not count) open the breaker: no
+    request goes out for ``breaker_cooldown`` seconds, then a single probe is
+    let through. Its success closes the breaker, its failure reopens it for
+    twice as long. Requests already in flight when it opened do not count.
+    """
+
+    def __init__(
+            self,
+            host: str,
+            initial_limit: int = settings.CRAWL_ADAPTIVE_INITIAL,
+            min_limit: int = settings.CRAWL_ADAPTIVE_MIN,
+            max_limit: int = settings.CRAWL_LIMIT_PER_HOST,
+            adaptive: bool = settings.CRAWL_ADAPTIVE,
+            latency_tolerance: float = settings.CRAWL_LATENCY_TOLERANCE,
+            decrease_factor: float = 0.5,
+            breaker_failures: int = settings.CRAWL_BREAKER_FAILURES,
+            breaker_cooldown: float = settings.CRAWL_BREAKER_COOLDOWN,
+            retry_after_cap: float = settings.CRAWL_RETRY_AFTER_CAP,
+            max_cooldown: float = settings.CRAWL_BREAKER_COOLDOWN * 8,
+    ):
+        self.host = host
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.adaptive = adaptive
+        self.limit = float(min(max(initial_limit, self.min_limit), self.max_limit) if adaptive else self.max_limit)
+        self.latency_tolerance = latency_tolerance
+        self.decrease_factor = decrease_factor
+        self.breaker_failures = max(1, breaker_failures)
+        self.breaker_cooldown = breaker_cooldown
+        self.retry_after_cap = retry_after_cap
+        self.max_cooldown = max_cooldown
+        self.logger = logger
+        self.stats = HostStats()
+        self.in_flight = 0
+        self.baseline: float | None = None
+        self.smoothed: float | None = None
+        self.failures = 0
+        self._cooldown = breaker_cooldown
+        self._blocked_until = 0.0
+        self._half_open = False
+        self._opened_at = 0.0
+        self._slow_start = True
+        self._last_decrease = 0.0
+        self._changed = asyncio.Condition()
+
+    def _capacity(self) -> int:
+        # a half-open breaker lets exactly one probe through
+        return 1 if self._half_open else max(self.min_limit, int(self.limit))
+
+    async def acquire(self) -> float:
+        """Wait for a free slot; returns the start time to pass back to ``release``."""
+        async with self._changed:
+            while True:
+                wait = self._blocked_until - time.monotonic()
+                if wait > 0:
+                    try:
+                        await asyncio.wait_for(self._changed.wait(), wait)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                if self.in_flight < self._capacity():
+                    break
+                await self._changed.wait()
+            self.in_flight += 1
+            self.stats.requests += 1
+            self.stats.peak_in_flight = max(self.stats.peak_in_flight, self.in_flight)
+        return time.monotonic()
+
+    async def release(self, started: float, outcome: str, retry_after: float | None = None):
+        """Return a slot with what the request showed: ``ok``, ``permanent``, ``throttled`` or ``error``."""
+        now = time.monotonic()
+        async with self._changed:
+            self.in_flight -= 1
+            if outcome in ("ok", "permanent"):
+                if outcome == "permanent":
+                    self.stats.permanent += 1
+                self._succeeded(started, now)
+            elif outcome == "throttled":
+                self.stats.throttled += 1
+                self._throttled(now, retry_after)
+            else:
+                self.stats.errors += 1
+                self._failed(started, now)
+            self._changed.notify_all()
+
+    def _succeeded(self, started: float, now: float):
+        latency = now - started
+        if started >= self._opened_at:
+            self.failures = 0
+            if self._half_open:
+                self._half_open = False
+                self._cooldown = self.breaker_cooldown
+                self.logger.info(f"{self.host}: circuit closed")
+        self.smoothed = latency if self.smoothed is None else 0.8 * self.smoothed + 0.2 * latency
+        if self.baseline is None:
+            self.baseline = latency
+        else:
+            self.baseline = min(latency, self.baseline + 0.01 * (self.smoothed - self.baseline))
+        if not self.adaptive:
+            return
+        if self.smoothed > self.baseline * self.latency_tolerance:
+            self._decrease(now)
+        else:
+            self.limit = min(self.max_limit, self.limit + (1 if self._slow_start else 1 / self.limit))
+
+    def _throttled(self, now: float, retry_after: float | None):
+        if self.adaptive:
+            self._decrease(now)
+        if retry_after:
+            self._blocked_until = max(self._blocked_until, now + min(retry_after, self.retry_after_cap))
+
+    def _failed(self, started: float, now: float):
+        if self.adaptive:
+            self._decrease(now)
+        if started < self._opened_at:
+            # already in flight when the breaker opened
+            return
+        self.failures += 1
+        if not (self._half_open or self.failures >= self.breaker_failures):
+            return
+        if self._half_open:
+            self._cooldown = min(self._cooldown * 2, self.max_cooldown)
+        self._blocked_until = max(self._blocked_until, now + self._cooldown)
+        self._opened_at = now
+        self._half_open = True
+        self.failures = 0
+        self.stats.breaker_opened += 1
+        self.logger.warning(f"{self.host}: circuit open for {self._cooldown:.1f}s after repeated failures")
+
+    def _decrease(self, now: float):
+        if now - self._last_decrease < (self.smoothed or 0.0):
+            return
+        self._slow_start = False
+        self._last_decrease = now
+        self.limit = max(float(self.min_limit), self.limit * self.decrease_factor)
+        self.stats.decreases += 1
+
+    def summary(self) -> dict:
+        return {"limit": round(self.limit, 2), "latency": self.smoothed, **asdict(self.stats)}
+
+
+class FetchController:
+    """One ``HostLimiter`` per host, plus the retry policy ``BookCrawler.fetch`` follows."""
+
+    def __init__(
+            self,
+            retries: int = settings.CRAWL_RETRIES,
+            backoff_base: float = settings.CRAWL_BACKOFF_BASE,
+            backoff_cap: float = settings.CRAWL_BACKOFF_CAP,
+            **limiter_options,
+    ):
+        self.retries = max(1, retries)
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.limiter_options = limiter_options
+        self.hosts: dict[str, HostLimiter] = {}
+
+    def limiter(self, url: str) -> HostLimiter:
+        host = urlsplit(url).netloc
+        if host not in self.hosts:
+            self.hosts[host] = HostLimiter(host, **self.limiter_options)
+        return self.hosts[host]
+
+    def backoff(self, attempt: int) -> float:
+        return backoff_delay(attempt, self.backoff_base, self.backoff_cap)
+
+    def summary(self) -> dict:
+        return {host: limiter.summary() for host, limiter in self.hosts.items()}
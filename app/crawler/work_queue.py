@@ -0,0 +1,170 @@
+import os
+import socket
+from datetime import datetime, timedelta, timezone
+from typing import Iterable
+from uuid import uuid4
+
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from app.config import settings
+from app.db import crawl_queue_collection
+
+RUN_ID = "__run__"
+
+ROOT = "root"
+LISTING = "listing"
+BOOK = "book"
+# listings are leased first, so the frontier fills up before it drains
+PRIORITY = {ROOT: 0, LISTING: 0, BOOK: 1}
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+
+def default_owner() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class WorkQueue:
+    """Crawl frontier shared by any number of crawler processes, kept in ``crawl_queue``.
+
+    One document per URL per run, keyed ``<run>:<url>``, so enqueuing a URL
+    twice is a no-op. Items are leased rather than popped: ``lease`` claims one
+    with a single ``find_one_and_update`` and hides it for
+    ``visibility_timeout`` seconds; if its worker dies the lease runs out and
+    another worker takes it. ``complete`` is only honoured for the current
+    lease holder. An item that fails ``max_attempts`` times is parked as
+    ``failed``. Delivery is therefore at-least-once, which the idempotent book
+    upserts absorb.
+
+    The ``__run__`` document names the active run; the first process to find
+    no active run starts one, the others join it, and whoever sees the queue
+    drained closes it.
+    """
+
+    def __init__(
+            self,
+            collection=crawl_queue_collection,
+            owner: str | None = None,
+            visibility_timeout: float = settings.CRAWL_QUEUE_VISIBILITY_TIMEOUT,
+            max_attempts: int = settings.CRAWL_QUEUE_MAX_ATTEMPTS,
+    ):
+        self.collection = collection
+        self.owner = owner or default_owner()
+        self.visibility_timeout = timedelta(seconds=visibility_timeout)
+        self.max_attempts = max(1, max_attempts)
+        self.run: str | None = None
+
+    async def join(self) -> bool:
+        """Attach to the active run, starting one if there is none; True if this process started it."""
+        while True:
+            meta = await self.collection.find_one({"_id": RUN_ID})
+            if meta and meta.get("active"):
+                self.run = meta["run"]
+                return False
+
+            run = uuid4().hex
+            fields = {"run": run, "active": True, "started_at": datetime.now(timezone.utc), "finished_at": None}
+            try:
+                if meta is None:
+                    await self.collection.insert_one({"_id": RUN_ID, **fields})
+                else:
+                    result = await self.collection.update_one(
+                        {"_id": RUN_ID, "run": meta["run"], "active": False}, {"$set": fields}
+                    )
+                    if not result.modified_count:
+                        continue
+            except DuplicateKeyError:
+                # another process started a run first
+                continue
+            self.run = run
+            return True
+
+    async def add(self, items: Iterable[dict]):
+        """Enqueue ``{"url", "kind", "category", ...}`` items; URLs already in this run are left alone."""
+        now = datetime.now(timezone.utc)
+        operations = [
+            UpdateOne(
+                {"_id": f"{self.run}:{item['url']}"},
+                {"$setOnInsert": {
+                    **item,
+                    "run": self.run,
+                    "state": PENDING,
+                    "priority": PRIORITY[item["kind"]],
+                    "available_at": now,
+                    "attempts": 0,
+                }},
+                upsert=True,
+            )
+            for item in items
+        ]
+        if operations:
+            await self.collection.bulk_write(operations, ordered=False)
+
+    async def lease(self) -> dict | None:
+        """Claim the next due item (pending, or leased by a worker that never finished it)."""
+        now = datetime.now(timezone.utc)
+        return await self.collection.find_one_and_update(
+            {
+                "run": self.run,
+                "state": {"$in": [PENDING, LEASED]},
+                "available_at": {"$lte": now},
+                "attempts": {"$lt": self.max_attempts},
+            },
+            {
+                "$set": {"state": LEASED, "owner": self.owner, "available_at": now + self.visibility_timeout},
+                "$inc": {"attempts": 1},
+            },
+            sort=[("priority", 1), ("available_at", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def complete(self, items: list[dict]) -> int:
+        if not items:
+            return 0
+        result = await self.collection.update_many(
+            {"_id": {"$in": [item["_id"] for item in items]}, "state": LEASED, "owner": self.owner},
+            {"$set": {"state": DONE, "finished_at": datetime.now(timezone.utc)}},
+        )
+        return result.modified_count
+
+    async def release(self, item: dict, error: str) -> bool:
+        """Hand a failed item back with a backoff, or park it once it is out of attempts; True if parked."""
+        now = datetime.now(timezone.utc)
+        if item["attempts"] >= self.max_attempts:
+            update = {"state": FAILED, "error": error, "finished_at": now}
+        else:
+            backoff = min(2 ** item["attempts"], self.visibility_timeout.total_seconds())
+            update = {"state": PENDING, "error": error, "available_at": now + timedelta(seconds=backoff)}
+        await self.collection.update_one(
+            {"_id": item["_id"], "state": LEASED, "owner": self.owner}, {"$set": update}
+        )
+        return update["state"] == FAILED
+
+    async def finish_if_drained(self) -> bool:
+        """Close the run once nothing is left to do in it; True when the run is over."""
+        now = datetime.now(timezone.utc)
+        # leases that ran out on their last attempt can never be leased again
+        await self.collection.update_many(
+            {"run": self.run, "state": LEASED, "attempts": {"$gte": self.max_attempts}, "available_at": {"$lte": now}},
+            {"$set": {"state": FAILED, "error": "lease expired", "finished_at": now}},
+        )
+        if await self.collection.find_one({"run": self.run, "state": {"$in": [PENDING, LEASED]}}, {"_id": 1}):
+            return False
+        result = await self.collection.update_one(
+            {"_id": RUN_ID, "run": self.run, "active": True}, {"$set": {"active": False, "finished_at": now}}
+        )
+        if result.modified_count:
+            # this run's items stay until the next one, for inspection
+            await self.collection.delete_many({"run": {"$ne": self.run}, "_id": {"$ne": RUN_ID}})
+        return True
+
+    async def counts(self) -> dict[str, int]:
+        pipeline = [
+            {"$match": {"run": self.run, "state": {"$exists": True}}},
+            {"$group": {"_id": "$state", "count": {"$sum": 1}}},
+        ]
+        return {doc["_id"]: doc["count"] async for doc in self.collection.aggregate(pipeline)}
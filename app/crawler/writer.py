@@ -0,0 +1,254 @@
+import asyncio
+import time
+from dataclasses import dataclass, asdict
+from typing import Callable
+
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from app.config import settings
+from app.crawler.changes import TRACKED_PROJECTION, change_record
+from app.crawler.metrics import crawl_metrics
+from app.db import (
+    books_collection, changes_collection, SnapshotRepository, build_snapshot, snapshot_id, BookRepository,
+    ChangeBookRepository,
+)
+from app.schemas import Book
+from app.utils import logger
+
+DUPLICATE_KEY = 11000
+
+
+@dataclass
+class WriterStats:
+    batches: int = 0
+    books: int = 0
+    upserted: int = 0
+    modified: int = 0
+    new: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    changes: int = 0
+    recategorized: int = 0
+    last_batch_seconds: float = 0.0
+    max_batch_seconds: float = 0.0
+    total_seconds: float = 0.0
+
+
+class BookWriter:
+    """Buffers parsed books and persists them with unordered ``bulk_write`` upserts.
+
+    Change detection happens here too: each batch reads the stored content
+    hashes in one query, books whose hash is unchanged only get their crawl
+    timestamp refreshed, and real changes are inserted into ``changes`` in one
+    ``insert_many``, before the books themselves: once a new hash is stored a
+    retried batch would see the book as unchanged, so change records keep
+    their ``_id`` until the batch is written and a retry only fills in what
+    is missing. Raw page HTML is split off the book as soon as it is
+    added; at flush time only pages that changed are gzipped (in a worker
+    thread, off the event loop) and stored as snapshots, and the snapshots of
+    unchanged pages just get their ``last_seen`` moved.
+
+    A batch is flushed once ``batch_size`` books are buffered or every
+    ``flush_interval`` seconds, whichever comes first. ``flush()`` returns only
+    after everything added so far is persisted, which is what crawl checkpoints
+    wait on; ``close()`` flushes the remainder even when the crawl is cancelled.
+    """
+
+    def __init__(
+            self,
+            batch_size: int = settings.WRITER_BATCH_SIZE,
+            flush_interval: float = settings.WRITER_FLUSH_INTERVAL,
+    ):
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.logger = logger
+        self.stats = WriterStats()
+        self._buffer: list[Book] = []
+        # snapshot id -> (source_url, raw HTML) of buffered books, compressed only if stored
+        self._pages: dict[str, tuple[str, str | bytes]] = {}
+        # (book _id, old hash, new hash) -> change record of a batch that is not written yet
+        self._changes: dict[tuple, dict] = {}
+        self._lock = asyncio.Lock()
+        self._timer: asyncio.Task | None = None
+        # called with the source URLs of every batch once it is stored
+        self.on_written: list[Callable[[list[str]], None]] = []
+
+    def buffered(self) -> int:
+        return len(self._buffer)
+
+    async def start(self):
+        self.stats = WriterStats()
+        if self._timer is None and self.flush_interval > 0:
+            self._timer = asyncio.create_task(self._flush_periodically())
+
+    async def add(self, book: Book):
+        if book.row_html is not None:
+            book.snapshot_id = snapshot_id(book.row_html)
+            self._pages[book.snapshot_id] = (book.source_url, book.row_html)
+            book.row_html = None
+        self._buffer.append(book)
+        if len(self._buffer) >= self.batch_size:
+            await self.flush()
+
+    async def flush(self):
+        async with self._lock:
+            while self._buffer:
+                batch, self._buffer = self._buffer[:self.batch_size], self._buffer[self.batch_size:]
+                try:
+                    # shielded so a cancelled crawl still finishes the batch in flight
+                    await asyncio.shield(self._write(batch))
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    self._buffer[:0] = batch
+                    raise
+                urls = [book.source_url for book in batch]
+                for listener in self.on_written:
+                    listener(urls)
+
+    async def close(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            await asyncio.gather(self._timer, return_exceptions=True)
+            self._timer = None
+        await self.flush()
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                self.logger.error(f"Periodic flush failed, will retry: {e}")
+
+    async def _write(self, batch: list[Book]):
+        started = time.perf_counter()
+        stored = {
+            doc["source_url"]: doc
+            async for doc in books_collection.find(
+                {"source_url": {"$in": [book.source_url for book in batch]}}, TRACKED_PROJECTION
+            )
+        }
+        operations, changes, change_keys, pages, seen, updated_ids, recategorized_ids = [], [], [], [], [], [], []
+        new = updated = unchanged = 0
+        for book in batch:
+            old = stored.get(book.source_url)
+            if book.snapshot_id and old is not None and old.get("snapshot_id") == book.snapshot_id:
+                seen.append(book.snapshot_id)
+            elif book.snapshot_id:
+                pages.append(self._pages[book.snapshot_id])
+
+            if old is not None and old.get("content_hash") == book.content_hash:
+                unchanged += 1
+                refresh = {
+                    "crawl_timestamp": book.crawl_timestamp.isoformat(),
+                    "snapshot_id": book.snapshot_id or old.get("snapshot_id"),
+                }
+                if book.category and old.get("category") != book.category:
+                    # not a tracked change, but listings filter on it
+                    refresh["category"] = book.category
+                    recategorized_ids.append(old["_id"])
+                operations.append(UpdateOne({"_id": old["_id"]}, {"$set": refresh}))
+                continue
+
+            document = book.model_dump(mode="json")
+            operations.append(UpdateOne(
+                {"source_url": book.source_url},
+                {"$set": document, "$unset": {"hash": "", "row_html": ""}},
+                upsert=True,
+            ))
+            if old is None:
+                new += 1
+            else:
+                updated += 1
+                updated_ids.append(old["_id"])
+                # books written before content hashes existed have no baseline to diff against
+                if old.get("content_hash"):
+                    key = (old["_id"], old["content_hash"], document.get("content_hash"))
+                    if key not in self._changes:
+                        self._changes[key] = {"_id": ObjectId(), **change_record(old, document)}
+                    changes.append(self._changes[key])
+                    change_keys.append(key)
+
+        snapshots = []
+        if pages:
+            # zlib releases the GIL, so compressing in a thread keeps the loop serving requests
+            snapshots = await asyncio.to_thread(lambda: [build_snapshot(url, html) for url, html in pages])
+        # snapshots first, so a book never points at a snapshot that was not stored
+        await SnapshotRepository.save_many(snapshots, seen)
+        if changes:
+            await self._insert_changes(changes)
+            await ChangeBookRepository.invalidate()
+        result = await books_collection.bulk_write(operations, ordered=False)
+        for key in change_keys:
+            self._changes.pop(key, None)
+        if new or updated or recategorized_ids:
+            await BookRepository.invalidate(updated_ids + recategorized_ids)
+        for book in batch:
+            self._pages.pop(book.snapshot_id, None)
+        elapsed = time.perf_counter() - started
+        crawl_metrics.write_seconds.observe(elapsed)
+        crawl_metrics.books_new.inc(new)
+        crawl_metrics.books_updated.inc(updated)
+        crawl_metrics.books_unchanged.inc(unchanged)
+
+        self.stats.batches += 1
+        self.stats.books += len(batch)
+        self.stats.upserted += result.upserted_count
+        self.stats.modified += result.modified_count
+        self.stats.new += new
+        self.stats.updated += updated
+        self.stats.unchanged += unchanged
+        self.stats.changes += len(changes)
+        self.stats.recategorized += len(recategorized_ids)
+        self.stats.last_batch_seconds = elapsed
+        self.stats.max_batch_seconds = max(self.stats.max_batch_seconds, elapsed)
+        self.stats.total_seconds += elapsed
+        self.logger.info(
+            f"Saved {len(batch)} books in {elapsed * 1000:.1f} ms "
+            f"(new={new}, updated={updated}, unchanged={unchanged}, "
+            f"upserted={result.upserted_count}, modified={result.modified_count})"
+        )
+
+    @staticmethod
+    async def _insert_changes(changes: list[dict]):
+        try:
+            await changes_collection.insert_many(changes, ordered=False)
+        except BulkWriteError as e:
+            # a retried batch: records stored by the failed attempt are already there
+            if e.details.get("writeConcernErrors") or any(
+                    error["code"] != DUPLICATE_KEY for error in e.details.get("writeErrors", [])
+            ):
+                raise
+
+    async def assign_category(self, urls: list[str], category: str) -> int:
+        """Set ``category`` on already stored books among ``urls`` that carry a different one.
+
+        Books skipped as already crawled are never re-parsed, so this is how
+        the ones stored before categories were tracked (as ``Unknown``) get
+        theirs. One indexed query per listing page, and a write only when
+        something is actually wrong.
+        """
+        ids = [
+            doc["_id"]
+            async for doc in books_collection.find(
+                {"source_url": {"$in": urls}, "category": {"$ne": category}}, {"_id": 1}
+            )
+        ]
+        if ids:
+            await books_collection.update_many({"_id": {"$in": ids}}, {"$set": {"category": category}})
+            await BookRepository.invalidate(ids)
+            self.stats.recategorized += len(ids)
+        return len(ids)
+
+    def summary(self) -> dict:
+        return asdict(self.stats)
@@ -1,8 +1,15 @@
-from .database import db, changes_collection, books_collection, users_collection, init_db
+from .database import (
+    db, changes_collection, books_collection, users_collection, http_cache_collection, snapshots_collection,
+    reports_collection, job_runs_collection, crawl_queue_collection,
+    init_db
+)
+from .indexes import INDEXES, ensure_indexes
 from .repositories.book_repository import BookRepository
 from .repositories.user_repository import UserRepository
 from .repositories.change_book_repo import ChangeBookRepository
-from .repositories.report_repository import get_books_by_date
+from .repositories.report_repository import iter_changes, ReportRepository
+from .repositories.job_run_repository import JobRunRepository
+from .repositories.snapshot_repository import SnapshotRepository, build_snapshot, snapshot_id
 
 
 __all__ = (
@@ -10,9 +17,21 @@ __all__ = (
     'changes_collection',
     'books_collection',
     'users_collection',
+    'http_cache_collection',
+    'snapshots_collection',
+    'reports_collection',
+    'job_runs_collection',
+    'crawl_queue_collection',
     'init_db',
+    'INDEXES',
+    'ensure_indexes',
     'BookRepository',
     'UserRepository',
     'ChangeBookRepository',
-    'get_books_by_date'
+    'iter_changes',
+    'ReportRepository',
+    'JobRunRepository',
+    'SnapshotRepository',
+    'build_snapshot',
+    'snapshot_id'
 )
@@ -5,18 +5,24 @@ from motor.motor_asyncio import AsyncIOMotorClient
 from app.config import settings
 from app.utils import logger
 from app.utils import UserRoleEnum
+from app.utils.timing import mongo_command_timer
+from app.db.indexes import ensure_indexes
 
 
-client = AsyncIOMotorClient(settings.MONGO_URL)
+client = AsyncIOMotorClient(settings.MONGO_URL, event_listeners=[mongo_command_timer])
 db = client[settings.DB_NAME]
 books_collection = db.books
 changes_collection = db.change
 users_collection = db.users
+http_cache_collection = db.http_cache
+snapshots_collection = db.snapshots
+reports_collection = db.reports
+job_runs_collection = db.job_runs
+crawl_queue_collection = db.crawl_queue
 
 
 async def init_db():
-    await users_collection.create_index("api_key", unique=True)
-    await users_collection.create_index("username", unique=True)
+    await ensure_indexes(db)
 
     admin = await users_collection.find_one({"username": "admin"})
 
@@ -0,0 +1,83 @@
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+from pymongo.errors import PyMongoError
+
+from app.utils import logger, BookSortEnum
+
+PRICE = BookSortEnum.price.value
+
+
+def filter_sort_indexes(prefix: str) -> list[IndexModel]:
+    """Indexes for the ``category`` + ``price_incl_tax`` filter and every ``BookSortEnum`` sort.
+
+    Keys follow equality, sort, range: ``category`` first, then the sort field
+    with ``_id`` as the keyset tie-break, then the price range, with the same
+    shapes again for requests without a category. Sorting by price is served
+    by the filter index itself.
+    """
+    indexes = [
+        IndexModel([("category", ASCENDING), (PRICE, ASCENDING), ("_id", ASCENDING)],
+                   name=f"{prefix}_category_price_id"),
+        IndexModel([(PRICE, ASCENDING), ("_id", ASCENDING)], name=f"{prefix}_price_id"),
+    ]
+    for sort in BookSortEnum:
+        if sort is BookSortEnum.price:
+            continue
+        indexes += [
+            IndexModel([("category", ASCENDING), (sort.value, ASCENDING), ("_id", ASCENDING), (PRICE, ASCENDING)],
+                       name=f"{prefix}_category_{sort.value}_id_price"),
+            IndexModel([(sort.value, ASCENDING), ("_id", ASCENDING), (PRICE, ASCENDING)],
+                       name=f"{prefix}_{sort.value}_id_price"),
+        ]
+    return indexes
+
+
+# collection name -> indexes the API, crawler and reports rely on
+INDEXES: dict[str, list[IndexModel]] = {
+    "users": [
+        IndexModel("api_key", unique=True),
+        IndexModel("username", unique=True),
+    ],
+    "books": [
+        IndexModel("source_url", unique=True, name="source_url_unique"),
+        *filter_sort_indexes("books"),
+        # /api/books/search; a match in the title counts five times one in the description
+        IndexModel([("name", TEXT), ("description", TEXT)], weights={"name": 5, "description": 1},
+                   default_language="english", name="books_text"),
+    ],
+    "change": [
+        IndexModel("timestamp", name="changes_timestamp"),
+        IndexModel([("book_id", ASCENDING), ("timestamp", ASCENDING)], name="changes_book_timestamp"),
+        *filter_sort_indexes("changes"),
+    ],
+    "crawl_queue": [
+        # the lease query: this run's pending or leased items, listings first, oldest due first
+        IndexModel([("run", ASCENDING), ("state", ASCENDING), ("priority", ASCENDING), ("available_at", ASCENDING)],
+                   name="crawl_queue_lease"),
+    ],
+    "job_runs": [
+        IndexModel([("job", ASCENDING), ("started_at", DESCENDING)], name="job_runs_job_started"),
+    ],
+}
+
+
+async def ensure_indexes(database) -> dict[str, list[str]]:
+    """Create every registered index, one at a time, and return the names created.
+
+    ``create_index`` is a no-op for an index that already exists. A failure
+    (e.g. duplicate ``source_url`` values left by an old crawl) is logged and
+    the remaining indexes are still created, so startup never fails on it.
+    """
+    created: dict[str, list[str]] = {}
+    for collection_name, indexes in INDEXES.items():
+        collection = database[collection_name]
+        for index in indexes:
+            try:
+                name = await collection.create_index(
+                    list(index.document["key"].items()),
+                    **{k: v for k, v in index.document.items() if k != "key"},
+                )
+                created.setdefault(collection_name, []).append(name)
+            except PyMongoError as e:
+                logger.error(f"[DB INIT] Could not create index {index.document['name']} on {collection_name}: {e}")
+    logger.info(f"[DB INIT] Ensured {sum(map(len, created.values()))} indexes")
+    return created
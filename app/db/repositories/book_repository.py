@@ -1,29 +1,49 @@
-from typing import List, Optional
+from typing import Iterable, List, Optional
 from bson import ObjectId, errors as bson_errors
 from app.db import books_collection
-from app.utils import paginate
+from app.config import settings
+from app.utils import paginate, keyset_paginate, search_paginate, PaginationTotalEnum
 from .cache import cache
-from app.utils import logger
+from .snapshot_repository import SnapshotRepository
+
+# heavy fields left out of API reads unless explicitly asked for
+DEFAULT_PROJECTION = {"row_html": 0}
+
+
+async def attach_raw_html(books: List[dict]) -> List[dict]:
+    html_by_snapshot = await SnapshotRepository.get_html(book.get("snapshot_id") for book in books)
+    for book in books:
+        # books crawled before snapshots existed still carry row_html inline
+        legacy_html = book.pop("row_html", None)
+        book["raw_html"] = html_by_snapshot.get(book.get("snapshot_id"), legacy_html)
+    return books
 
 
 class BookRepository:
 
     @staticmethod
-    async def get_by_id(book_id: str) -> Optional[dict]:
-        generate_cache_key = cache.generate_cache_key("book", book_id=book_id)
-        cached_book = await cache.get(generate_cache_key)
-        if cached_book:
-            logger.info(f"Book {book_id} found in cache")
-            return cached_book
+    def detail_cache_key(book_id) -> str:
+        return cache.generate_cache_key("book", book_id=str(book_id))
+
+    @staticmethod
+    async def invalidate(changed_ids: Iterable = ()):
+        """Retire every cached book listing and drop the detail entries of the changed books."""
+        await cache.bump_generation(books_collection.name)
+        await cache.invalidate(keys=[BookRepository.detail_cache_key(book_id) for book_id in changed_ids])
+
+    @staticmethod
+    async def get_by_id(book_id: str, include_raw_html: bool = False) -> Optional[dict]:
         try:
             obj_id = ObjectId(book_id)
         except bson_errors.InvalidId:
             return None
-        book = await books_collection.find_one({"_id": obj_id})
-        if book:
-            logger.info(f"generate cache key and store book id: {book_id}")
-            await cache.set(generate_cache_key, book)
-        return book
+        if include_raw_html:
+            book = await books_collection.find_one({"_id": obj_id})
+            return (await attach_raw_html([book]))[0] if book else None
+        return await cache.get_or_load(
+            BookRepository.detail_cache_key(book_id),
+            lambda: books_collection.find_one({"_id": obj_id}, DEFAULT_PROJECTION),
+        )
 
     @staticmethod
     async def find(
@@ -31,20 +51,82 @@ class BookRepository:
             skip: int = 0,
             limit: int = 10,
             sort_field: str | None = None,
-    ) -> List[dict]:
-        key = cache.generate_cache_key(
+            include_raw_html: bool = False,
+            raw: bool = False,
+    ) -> List[dict] | bytes:
+        if include_raw_html:
+            # raw pages are large and rarely requested, so they bypass the cache
+            books = await paginate(books_collection, query, skip, limit, sort_field)
+            await attach_raw_html(books["results"])
+            return books
+
+        key = await cache.versioned_key(
             "books_list",
+            books_collection.name,
             query=query,
             skip=skip,
             limit=limit,
             sort_field=sort_field
         )
-        cached = await cache.get(key)
-        if cached:
-            logger.info("Book list found in cache")
-            return cached
-        books = await paginate(books_collection, query, skip, limit, sort_field)
-        if books:
-            logger.info("generate cache key and store book list")
-            await cache.set(key, books)
-        return books
+        return await cache.get_or_load(
+            key, lambda: paginate(books_collection, query, skip, limit, sort_field, DEFAULT_PROJECTION), raw=raw
+        )
+
+    @staticmethod
+    async def find_keyset(
+            query: dict,
+            limit: int = 10,
+            sort_field: str | None = None,
+            cursor: str | None = None,
+            total_mode: PaginationTotalEnum = PaginationTotalEnum.exact,
+            include_raw_html: bool = False,
+            raw: bool = False,
+    ) -> dict | bytes:
+        page_args = dict(
+            limit=limit, sort_field=sort_field, cursor=cursor, total_mode=total_mode, cache=cache,
+            count_cap=settings.PAGINATION_COUNT_CAP, count_ttl=settings.PAGINATION_COUNT_TTL,
+        )
+        if include_raw_html:
+            books = await keyset_paginate(books_collection, query, **page_args)
+            await attach_raw_html(books["results"])
+            return books
+
+        key = await cache.versioned_key(
+            "books_keyset",
+            books_collection.name,
+            query=query,
+            limit=limit,
+            sort_field=sort_field,
+            cursor=cursor,
+            total_mode=total_mode.value,
+        )
+        return await cache.get_or_load(
+            key, lambda: keyset_paginate(books_collection, query, projection=DEFAULT_PROJECTION, **page_args),
+            raw=raw,
+        )
+
+    @staticmethod
+    async def search(
+            text: str,
+            query: dict,
+            skip: int = 0,
+            limit: int = 10,
+            sort_field: str | None = None,
+            raw: bool = False,
+    ) -> dict | bytes:
+        """Text search; ``text`` must already be normalized so equivalent searches share a cache key."""
+        key = await cache.versioned_key(
+            "books_search",
+            books_collection.name,
+            text=text,
+            query=query,
+            skip=skip,
+            limit=limit,
+            sort_field=sort_field,
+        )
+        return await cache.get_or_load(
+            key,
+            lambda: search_paginate(books_collection, text, query, skip, limit, sort_field, DEFAULT_PROJECTION,
+                                    count_cap=settings.PAGINATION_COUNT_CAP),
+            raw=raw,
+        )
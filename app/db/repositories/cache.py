@@ -1,3 +1,31 @@
-from app.config import RedisCache
+from app.config import RedisCache, LocalCache, settings
+from app.utils.metrics import family, metrics
 
-cache = RedisCache()
+cache = RedisCache(
+    local_cache=LocalCache(
+        max_entries=settings.LOCAL_CACHE_MAX_ENTRIES,
+        max_bytes=settings.LOCAL_CACHE_MAX_BYTES,
+        ttl=settings.LOCAL_CACHE_TTL,
+    ) if settings.LOCAL_CACHE_MAX_ENTRIES > 0 else None
+)
+
+
+def cache_metric_families() -> list[dict]:
+    """``cache.stats()`` as metric families, read at collection time."""
+    stats = cache.stats()
+    events = [
+        ["cache_events_total", {"tier": tier, "prefix": prefix, "event": event}, count]
+        for tier, prefixes in stats["tiers"].items()
+        for prefix, counters in prefixes.items()
+        for event, count in counters.items()
+    ]
+    families = [family("cache_events_total", "counter", "Cache events by tier, key prefix and event", events)]
+    if "local" in stats:
+        families.append(family("cache_local_entries", "gauge", "Entries in the local cache tier",
+                               [["cache_local_entries", {}, stats["local"]["entries"]]]))
+        families.append(family("cache_local_bytes", "gauge", "Payload bytes in the local cache tier",
+                               [["cache_local_bytes", {}, stats["local"]["bytes"]]]))
+    return families
+
+
+metrics.register_collector(cache_metric_families)
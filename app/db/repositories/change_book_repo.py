@@ -1,27 +1,27 @@
 from typing import List, Optional
 from bson import ObjectId, errors as bson_errors
 from app.db import changes_collection
-from app.utils import paginate, logger
+from app.config import settings
+from app.utils import paginate, keyset_paginate, PaginationTotalEnum
 from .cache import cache
 
 class ChangeBookRepository:
 
+    @staticmethod
+    async def invalidate():
+        """Retire cached change listings after new change records are inserted."""
+        await cache.bump_generation(changes_collection.name)
+
     @staticmethod
     async def get_by_id(book_id: str) -> Optional[dict]:
-        generate_cache_key = cache.generate_cache_key("change_book", book_id=book_id)
-        cached_book = await cache.get(generate_cache_key)
-        if cached_book:
-            logger.info(f"Change book {book_id} found in cache")
-            return cached_book
         try:
             obj_id = ObjectId(book_id)
         except bson_errors.InvalidId:
             return None
-        change_book = await changes_collection.find_one({"_id": obj_id})
-        if change_book:
-            logger.info(f"generate cache key and store book id: {book_id}")
-            await cache.set(generate_cache_key, change_book)
-        return change_book
+        return await cache.get_or_load(
+            cache.generate_cache_key("change_book", book_id=book_id),
+            lambda: changes_collection.find_one({"_id": obj_id}),
+        )
 
     @staticmethod
     async def find(
@@ -29,21 +29,38 @@ class ChangeBookRepository:
             skip: int = 0,
             limit: int = 10,
             sort_field: str | None = None,
-    ) -> List[dict]:
-        key = cache.generate_cache_key(
+            raw: bool = False,
+    ) -> List[dict] | bytes:
+        key = await cache.versioned_key(
             "change_books_list",
+            changes_collection.name,
             query=query,
             skip=skip,
             limit=limit,
             sort_field=sort_field
         )
-        cached = await cache.get(key)
-        if cached:
-            logger.info("Change book list found in cache")
-            return cached
+        return await cache.get_or_load(key, lambda: paginate(changes_collection, query, skip, limit, sort_field), raw=raw)
 
-        books = await paginate(changes_collection, query, skip, limit, sort_field)
-        if books:
-            logger.info("generate cache key and store change book list")
-            await cache.set(key, books)
-        return books
+    @staticmethod
+    async def find_keyset(
+            query: dict,
+            limit: int = 10,
+            sort_field: str | None = None,
+            cursor: str | None = None,
+            total_mode: PaginationTotalEnum = PaginationTotalEnum.exact,
+            raw: bool = False,
+    ) -> dict | bytes:
+        key = await cache.versioned_key(
+            "change_books_keyset",
+            changes_collection.name,
+            query=query,
+            limit=limit,
+            sort_field=sort_field,
+            cursor=cursor,
+            total_mode=total_mode.value,
+        )
+        return await cache.get_or_load(key, lambda: keyset_paginate(
+            changes_collection, query, limit, sort_field, cursor,
+            total_mode=total_mode, cache=cache,
+            count_cap=settings.PAGINATION_COUNT_CAP, count_ttl=settings.PAGINATION_COUNT_TTL,
+        ), raw=raw)
@@ -0,0 +1,42 @@
+from datetime import datetime, timezone
+from typing import List
+
+from bson import ObjectId
+
+from app.db.database import job_runs_collection
+from app.utils import JobRunStatusEnum
+
+
+class JobRunRepository:
+    """One document per scheduled job run: status, timings and item counts."""
+
+    @staticmethod
+    async def start(job: str) -> ObjectId:
+        result = await job_runs_collection.insert_one({
+            "job": job,
+            "status": JobRunStatusEnum.running.value,
+            "started_at": datetime.now(timezone.utc),
+        })
+        return result.inserted_id
+
+    @staticmethod
+    async def finish(run_id: ObjectId, status: JobRunStatusEnum, duration_seconds: float, **fields):
+        await job_runs_collection.update_one({"_id": run_id}, {"$set": {
+            "status": status.value,
+            "finished_at": datetime.now(timezone.utc),
+            "duration_seconds": round(duration_seconds, 3),
+            **fields,
+        }})
+
+    @staticmethod
+    async def skipped(job: str, reason: str):
+        now = datetime.now(timezone.utc)
+        await job_runs_collection.insert_one({
+            "job": job, "status": JobRunStatusEnum.skipped.value, "started_at": now, "finished_at": now,
+            "reason": reason,
+        })
+
+    @staticmethod
+    async def latest(job: str, limit: int = 10) -> List[dict]:
+        cursor = job_runs_collection.find({"job": job}).sort("started_at", -1).limit(limit)
+        return await cursor.to_list(length=limit)
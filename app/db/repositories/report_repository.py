@@ -1,14 +1,41 @@
-from datetime import datetime, timedelta, timezone
-from typing import List
-from app.db import changes_collection
+from datetime import datetime
+from typing import AsyncIterator, Iterable, Optional
+from app.db import changes_collection, reports_collection
 
 
-async def get_books_by_date(target_date: datetime) -> List[dict]:
-    start_time = datetime(target_date.year, target_date.month, target_date.day, tzinfo=timezone.utc)
-    end_time = start_time + timedelta(days=1)
-
+async def iter_changes(start: datetime, end: datetime, batch_size: int = 1000) -> AsyncIterator[dict]:
+    """Change records with ``start <= timestamp < end``, oldest first, read one cursor batch at a time."""
     cursor = changes_collection.find(
-        {"timestamp": {"$gte": start_time, "$lt": end_time}},
-        {"_id": 0}
-    )
-    return await cursor.to_list(length=None)
+        {"timestamp": {"$gte": start, "$lt": end}}
+    ).sort("timestamp", 1).batch_size(batch_size)
+    try:
+        async for change in cursor:
+            yield change
+    finally:
+        # the consumer may stop early (client disconnected); free the server-side cursor
+        await cursor.close()
+
+
+class ReportRepository:
+    """Materialized daily reports, one document per completed UTC day keyed by ``YYYY-MM-DD``."""
+
+    @staticmethod
+    async def get(day: str, fmt: Optional[str] = None) -> Optional[dict]:
+        # with a format, only that artifact is read back
+        projection = {"total": 1, "etags": 1, f"artifacts.{fmt}": 1} if fmt else None
+        return await reports_collection.find_one({"_id": day}, projection)
+
+    @staticmethod
+    async def get_summary(day: str) -> Optional[dict]:
+        return await reports_collection.find_one(
+            {"_id": day}, {"total": 1, "by_category": 1, "by_field": 1, "created_at": 1}
+        )
+
+    @staticmethod
+    async def save(report: dict):
+        await reports_collection.replace_one({"_id": report["_id"]}, report, upsert=True)
+
+    @staticmethod
+    async def existing_days(days: Iterable[str]) -> set[str]:
+        cursor = reports_collection.find({"_id": {"$in": list(days)}}, {"_id": 1})
+        return {doc["_id"] async for doc in cursor}
@@ -0,0 +1,60 @@
+import gzip
+import hashlib
+from datetime import datetime
+from typing import Iterable
+
+from bson import Binary
+from pymongo import UpdateOne
+
+from app.db.database import snapshots_collection
+
+
+def snapshot_id(html: str | bytes) -> str:
+    """Content address of a page: the sha256 of its raw bytes."""
+    return hashlib.sha256(html.encode() if isinstance(html, str) else html).hexdigest()
+
+
+def build_snapshot(source_url: str, html: str | bytes) -> dict:
+    """Compressed, content-addressed snapshot document for a page's raw HTML."""
+    raw = html.encode() if isinstance(html, str) else html
+    return {
+        "_id": snapshot_id(raw),
+        "source_url": source_url,
+        "size": len(raw),
+        "encoding": "gzip",
+        "body": Binary(gzip.compress(raw)),
+    }
+
+
+class SnapshotRepository:
+    """Raw page HTML, kept out of ``books`` in its own compressed collection.
+
+    Snapshots are keyed by the sha256 of the page, so a page that has not
+    changed between crawls is stored once and only its ``last_seen`` moves.
+    """
+
+    @staticmethod
+    async def save_many(snapshots: Iterable[dict], seen: Iterable[str] = ()):
+        """Store new ``snapshots`` and move ``last_seen`` of the already stored ones in ``seen``."""
+        now = datetime.now()
+        operations = [
+            UpdateOne(
+                {"_id": snapshot["_id"]},
+                {"$setOnInsert": {**snapshot, "first_seen": now}, "$set": {"last_seen": now}},
+                upsert=True,
+            )
+            for snapshot in snapshots
+        ]
+        operations += [UpdateOne({"_id": snapshot_id}, {"$set": {"last_seen": now}}) for snapshot_id in seen]
+        if operations:
+            await snapshots_collection.bulk_write(operations, ordered=False)
+
+    @staticmethod
+    async def get_html(snapshot_ids: Iterable[str]) -> dict[str, str]:
+        ids = list({snapshot_id for snapshot_id in snapshot_ids if snapshot_id})
+        if not ids:
+            return {}
+        return {
+            doc["_id"]: gzip.decompress(doc["body"]).decode("utf-8", errors="replace")
+            async for doc in snapshots_collection.find({"_id": {"$in": ids}}, {"body": 1})
+        }
@@ -2,6 +2,7 @@ from app.db.database import users_collection
 from typing import TYPE_CHECKING
 from .cache import cache
 from app.utils import logger, paginate
+from app.utils.api_key_cache import api_key_cache
 
 if TYPE_CHECKING:
     from app.schemas import User
@@ -11,26 +12,33 @@ class UserRepository:
         self.collection = collection
 
     async def get(self, username: str):
-        key = cache.generate_cache_key("user", username=username)
-        cached = await cache.get(key)
-        if cached:
-            logger.info("User found in cache")
-            return cached
-        user = await self.collection.find_one({"username": username})
-        if user:
-            logger.info(f"generate cache key and store user id: {user['_id']}")
-            await cache.set(key, user)
-        return user
+        return await cache.get_or_load(
+            cache.generate_cache_key("user", username=username),
+            lambda: self.collection.find_one({"username": username}),
+        )
 
     async def create(self, user: "User"):
         await self.collection.insert_one(user.model_dump(mode="json"))
+        await cache.bump_generation(users_collection.name)
         return user
 
+    async def _invalidate(self, username: str):
+        """Drop cached lookups of this user, both by username and by API key."""
+        user = await self.collection.find_one({"username": username}, {"api_key": 1})
+        await cache.invalidate(key=cache.generate_cache_key("user", username=username))
+        await cache.bump_generation(users_collection.name)
+        if user:
+            await api_key_cache.invalidate(user.get("api_key"))
+
     async def update(self, username: str, update_data: dict):
+        # invalidate before the write too, in case it replaces the API key
+        await self._invalidate(username)
         await self.collection.update_one({"username": username}, {"$set": update_data})
+        await self._invalidate(username)
         return await self.get(username)
 
     async def delete(self, username: str):
+        await self._invalidate(username)
         result = await self.collection.delete_one({"username": username})
         logger.info(f"Deleted user: {username}")
         return result.deleted_count
@@ -44,17 +52,12 @@ class UserRepository:
     ):
         if query is None:
             query = {}
-        key = cache.generate_cache_key(
+        key = await cache.versioned_key(
             "user_list",
+            users_collection.name,
             query=query | {'query': 'query'},
             skip=skip,
             limit=limit,
             sort_field=sort_field
         )
-        cached = await cache.get(key)
-        if cached:
-            logger.info("User list found in cache")
-            return cached
-        users = await paginate(users_collection, query, skip, limit, sort_field)
-        if users: await cache.set(key, users)
-        return users
\ No newline at end of file
+        return await cache.get_or_load(key, lambda: paginate(users_collection, query, skip, limit, sort_field))
\ No newline at end of file
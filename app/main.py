@@ -1,12 +1,17 @@
+import asyncio
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from redis import asyncio as aioredis
 from fastapi_limiter import FastAPILimiter
 from app.db import init_db
+from app.db.repositories.cache import cache
 from app.utils import logger
+from app.utils.api_key_cache import api_key_cache, last_used_tracker
+from app.utils.metrics import metrics_publisher
+from app.utils.timing import TimingMiddleware
 from app.config import RedisCache
 from app.api.routes import (
-    books_router, changes_router, users_router, crawler_router, report_router
+    books_router, changes_router, users_router, crawler_router, report_router, metrics_router
 )
 
 REDIS_INIT_MESSAGE = "Redis limiter initialized..."
@@ -23,17 +28,29 @@ async def cleanup_redis(redis_client: aioredis.Redis):
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await init_db()
-    redis = await RedisCache().get_client()
+    redis = await RedisCache(decode_responses=True).get_client()
     await FastAPILimiter.init(redis)
     logger.info(REDIS_INIT_MESSAGE)
+    background = [
+        asyncio.create_task(last_used_tracker.run()),
+        asyncio.create_task(cache.listen_for_invalidations()),
+        asyncio.create_task(api_key_cache.listen_for_invalidations()),
+        asyncio.create_task(metrics_publisher.run()),
+    ]
     yield
+    for task in background:
+        task.cancel()
+    await asyncio.gather(*background, return_exceptions=True)
+    await last_used_tracker.flush()
     await cleanup_redis(redis)
 
 
 app = FastAPI(title="Book Crawler API", lifespan=lifespan)
+app.add_middleware(TimingMiddleware)
 
 app.include_router(books_router, prefix="/api/books", tags=["Books"])
 app.include_router(changes_router, prefix="/api/changes", tags=["Changes"])
 app.include_router(users_router, prefix="/api/users", tags=["Users"])
 app.include_router(crawler_router, prefix="/api/crawler", tags=["Crawler"])
 app.include_router(report_router, prefix="/api/report", tags=["Report"])
+app.include_router(metrics_router, tags=["Metrics"])
@@ -1,20 +1,50 @@
-from app.db import books_collection, changes_collection
-from datetime import datetime
-import hashlib
-
-
-async def detect_changes():
-    async for book in books_collection.find({}):
-        book_copy = dict(book)
-        book_copy.pop("hash", None)
-        new_hash = hashlib.md5(str(book_copy).encode()).hexdigest()
-        if book.get("hash") != new_hash:
-            await changes_collection.insert_one({
-                "book_id": book["_id"],
-                "timestamp": datetime.now(),
-                "changes": "Detected modification",
-            })
-            await books_collection.update_one(
-                {"_id": book["_id"]},
-                {"$set": {"hash": new_hash}}
-            )
+from pymongo import UpdateOne
+
+from app.crawler.changes import TRACKED_PROJECTION, change_record, content_hash
+from app.db import books_collection, changes_collection, BookRepository, ChangeBookRepository
+from app.utils import logger
+
+BATCH_SIZE = 1000
+
+
+async def _flush(hash_updates: list, changes: list):
+    if hash_updates:
+        await books_collection.bulk_write(hash_updates, ordered=False)
+    if changes:
+        await changes_collection.insert_many(changes, ordered=False)
+
+
+async def detect_changes() -> int:
+    """Reconcile stored content hashes with the stored business fields.
+
+    The crawler's writer records changes as it upserts, so this pass only
+    catches books modified outside the crawl and backfills hashes for books
+    written before content hashes existed. It reads only the tracked fields
+    and writes in batches. Returns the number of changes recorded.
+    """
+    hash_updates, changes, changed_ids = [], [], []
+    recorded = 0
+    async for book in books_collection.find({"source_url": {"$exists": True}}, TRACKED_PROJECTION):
+        new_hash = content_hash(book)
+        if book.get("content_hash") == new_hash:
+            continue
+        if book.get("content_hash"):
+            # edited outside the crawler: the previous field values are gone, only the hash moved
+            changes.append(change_record(book, book, [
+                {"field": "content_hash", "old": book["content_hash"], "new": new_hash}
+            ]))
+            changed_ids.append(book["_id"])
+        hash_updates.append(UpdateOne({"_id": book["_id"]}, {"$set": {"content_hash": new_hash}}))
+
+        if len(hash_updates) >= BATCH_SIZE:
+            recorded += len(changes)
+            await _flush(hash_updates, changes)
+            hash_updates, changes = [], []
+
+    recorded += len(changes)
+    await _flush(hash_updates, changes)
+    if changed_ids:
+        await BookRepository.invalidate(changed_ids)
+        await ChangeBookRepository.invalidate()
+    logger.info(f"Change detection recorded {recorded} changes")
+    return recorded
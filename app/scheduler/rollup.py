@@ -0,0 +1,90 @@
+import hashlib
+import zlib
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator
+
+from bson import Binary
+
+from app.config import settings
+from app.db import iter_changes, ReportRepository
+from app.services.report_service import REPORT_FORMATS, render_report
+from app.utils import logger
+
+# a report is one Mongo document (16MB cap); larger days are left to the live path
+MAX_ARTIFACT_BYTES = 15 * 1024 * 1024
+
+
+async def _compress(chunks: AsyncIterator) -> tuple[bytes, str]:
+    """gzip body and sha256 of a rendered report, compressed as it is produced."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    digest, parts = hashlib.sha256(), []
+    async for chunk in chunks:
+        chunk = chunk.encode() if isinstance(chunk, str) else chunk
+        digest.update(chunk)
+        parts.append(compressor.compress(chunk))
+    parts.append(compressor.flush())
+    return b"".join(parts), digest.hexdigest()
+
+
+async def _counting(changes: AsyncIterator[dict], by_category: Counter, by_field: Counter) -> AsyncIterator[dict]:
+    async for change in changes:
+        by_category[change.get("category") or "unknown"] += 1
+        diffs = change.get("changes")
+        # early change records carried a free-text description instead of field diffs
+        for diff in diffs if isinstance(diffs, list) else ():
+            if isinstance(diff, dict):
+                by_field[diff.get("field")] += 1
+        yield change
+
+
+async def build_daily_report(day: datetime) -> dict:
+    """Roll up one completed UTC day of changes and store it with every report format, gzipped.
+
+    Each format is rendered from its own pass over the day's changes, the
+    first pass also counting changes per category and per changed field.
+    """
+    start = datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+    end = start + timedelta(days=1)
+    key = start.strftime("%Y-%m-%d")
+    by_category, by_field = Counter(), Counter()
+    artifacts, etags = {}, {}
+    for fmt in REPORT_FORMATS:
+        changes = iter_changes(start, end)
+        if not artifacts:
+            changes = _counting(changes, by_category, by_field)
+        body, digest = await _compress(render_report(fmt, changes, start, end))
+        artifacts[fmt] = Binary(body)
+        etags[fmt] = f'W/"{key}-{fmt}-{digest[:16]}"'
+        if not by_category:
+            break
+
+    total = sum(by_category.values())
+    report = {
+        "_id": key,
+        "total": total,
+        "by_category": dict(by_category),
+        "by_field": dict(by_field),
+        "created_at": datetime.now(timezone.utc),
+    }
+    size = sum(len(body) for body in artifacts.values())
+    if total and size <= MAX_ARTIFACT_BYTES:
+        report.update(artifacts=artifacts, etags=etags, size=size)
+    elif total:
+        logger.warning(f"Report for {key} is {size} bytes compressed; serving it live instead")
+    await ReportRepository.save(report)
+    return report
+
+
+async def build_daily_reports(lookback_days: int = settings.REPORT_ROLLUP_LOOKBACK_DAYS) -> int:
+    """Materialize every completed day in the lookback window that has no report yet."""
+    today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    days = [today - timedelta(days=offset) for offset in range(1, lookback_days + 1)]
+    existing = await ReportRepository.existing_days(day.strftime("%Y-%m-%d") for day in days)
+    built = 0
+    for day in days:
+        if day.strftime("%Y-%m-%d") not in existing:
+            report = await build_daily_report(day)
+            logger.info(f"Materialized report for {report['_id']}: {report['total']} changes")
+            built += 1
+    return built
@@ -1,31 +1,94 @@
-from apscheduler.schedulers.background import BackgroundScheduler
-from app.crawler.crawler import BookCrawler
-from app.scheduler.detector import detect_changes
 import asyncio
+import signal
+import time
+from typing import Optional
+
+import aiohttp
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
 
-scheduler = BackgroundScheduler()
+from app.crawler import create_session, run_crawl
+from app.db import db, ensure_indexes, JobRunRepository
+from app.scheduler.detector import detect_changes
+from app.scheduler.rollup import build_daily_reports
+from app.utils import logger, JobRunStatusEnum
+from app.utils.metrics import metrics_publisher
 
+JOB_NAME = "daily_job"
+# a run delayed by a busy loop or a restart still starts if it is at most this late
+MISFIRE_GRACE_SECONDS = 3600
 
-async def daily_job_async():
-    await BookCrawler().crawl()
-    await detect_changes()
+scheduler = AsyncIOScheduler(timezone="UTC")
+# held for a whole run; a trigger that fires while a slow crawl is still going is skipped
+_running = asyncio.Lock()
 
 
-@scheduler.scheduled_job('cron', hour=0)
-def daily_job():
-    loop = asyncio.get_event_loop()
-    loop.create_task(daily_job_async())
+async def daily_job_async(session: aiohttp.ClientSession) -> dict:
+    crawl = await run_crawl(session)
+    changes = await detect_changes()
+    reports = await build_daily_reports()
+    return {"crawl": crawl, "changes": changes, "reports": reports}
 
 
-if __name__ == "__main__":
-    scheduler.start()
-    print("Scheduler started. Press Ctrl+C to exit.")
-    try:
-        import time
-
-        while True:
-            time.sleep(1)
-    except KeyboardInterrupt:
+async def daily_job(session: aiohttp.ClientSession) -> Optional[dict]:
+    """Run the daily job unless the previous run is still going; every run is recorded in ``job_runs``."""
+    if _running.locked():
+        logger.warning(f"{JOB_NAME}: previous run still in progress, skipping this one")
+        await JobRunRepository.skipped(JOB_NAME, "previous run still in progress")
+        return None
+
+    async with _running:
+        run_id = await JobRunRepository.start(JOB_NAME)
+        started = time.perf_counter()
+        try:
+            counts = await daily_job_async(session)
+        except BaseException as e:
+            # also records runs cut short by shutdown (CancelledError)
+            await JobRunRepository.finish(
+                run_id, JobRunStatusEnum.failed, time.perf_counter() - started, error=repr(e)
+            )
+            raise
+        duration = time.perf_counter() - started
+        await JobRunRepository.finish(run_id, JobRunStatusEnum.success, duration, **counts)
+        logger.info(f"{JOB_NAME} finished in {duration:.1f}s: {counts}")
+        return counts
+
+
+def add_daily_job(target: AsyncIOScheduler, session: aiohttp.ClientSession, trigger: str = "cron", **trigger_args):
+    if trigger == "cron" and not trigger_args:
+        trigger_args = {"hour": 0}
+    return target.add_job(
+        daily_job, trigger, kwargs={"session": session}, id=JOB_NAME, replace_existing=True,
+        max_instances=1, coalesce=True, misfire_grace_time=MISFIRE_GRACE_SECONDS, **trigger_args,
+    )
+
+
+async def main():
+    """Run the scheduler on this event loop, sharing one HTTP session and the Motor client across runs."""
+    await ensure_indexes(db)
+    # crawls run here, so their metrics reach the API's /metrics through Redis
+    metrics_publisher.role = "scheduler"
+    publisher = asyncio.create_task(metrics_publisher.run())
+    async with create_session() as session:
+        add_daily_job(scheduler, session)
+        scheduler.start()
+
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        print("Scheduler started. Press Ctrl+C to exit.")
+        await stop.wait()
+
         print("Shutting down scheduler...")
-        scheduler.shutdown()
-        print("Scheduler stopped.")
+        scheduler.shutdown(wait=False)
+        if _running.locked():
+            print("Waiting for the running job to finish...")
+            async with _running:
+                pass
+    publisher.cancel()
+    await asyncio.gather(publisher, return_exceptions=True)
+    print("Scheduler stopped.")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional
 from datetime import datetime
 
@@ -15,5 +15,7 @@ class Book(BaseModel):
     rating: str
     source_url: str
     crawl_timestamp: datetime
-    row_html: str
-    hash: Optional[str] = None
\ No newline at end of file
+    # raw page, handed to the snapshot store by the writer and never stored on the book
+    row_html: Optional[str | bytes] = Field(default=None, exclude=True)
+    snapshot_id: Optional[str] = None
+    content_hash: Optional[str] = None
\ No newline at end of file
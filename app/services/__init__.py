@@ -1,12 +1,13 @@
 from .book_service import BookService
 from .change_book_service import ChangeBookService
 from .user_service import UserService
-from .report_service import generate_report_service
+from .report_service import generate_report_service, get_report_summary
 
 
 __all__ = (
     'BookService',
     'ChangeBookService',
     'UserService',
-    'generate_report_service'
+    'generate_report_service',
+    'get_report_summary'
 )
\ No newline at end of file
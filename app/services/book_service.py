@@ -1,5 +1,6 @@
 from app.db.repositories.book_repository import BookRepository
 from app.serializers import serialize_book
+from app.utils import PaginationEnum, PaginationTotalEnum, normalize_search_query
 
 
 class BookService:
@@ -7,12 +8,19 @@ class BookService:
     def __init__(self, repo: BookRepository):
         self.repo = repo
 
-    async def get_book_by_id(self, book_id: str) -> dict|None:
-        book = await self.repo.get_by_id(book_id)
+    async def get_book_by_id(self, book_id: str, include_raw_html: bool = False) -> dict|None:
+        book = await self.repo.get_by_id(book_id, include_raw_html)
         if not book:
             return None
         return serialize_book(book)
 
+    @staticmethod
+    def listing_filter(category: str | None, min_price: float, max_price: float) -> dict:
+        query: dict = {"price_incl_tax": {"$gte": min_price, "$lte": max_price}}
+        if category:
+            query["category"] = category
+        return query
+
     async def get_books(
             self,
             category: str | None = None,
@@ -21,10 +29,27 @@ class BookService:
             skip: int = 0,
             limit: int = 10,
             sort_field: str | None = None,
-    ) -> list[dict]:
-        query: dict = {"price_incl_tax": {"$gte": min_price, "$lte": max_price}}
-        if category:
-            query["category"] = category
-
-        return await self.repo.find(query, skip, limit, sort_field)
+            include_raw_html: bool = False,
+            pagination: PaginationEnum = PaginationEnum.offset,
+            cursor: str | None = None,
+            total_mode: PaginationTotalEnum = PaginationTotalEnum.exact,
+            raw: bool = False,
+    ) -> dict | bytes:
+        query = self.listing_filter(category, min_price, max_price)
+        if pagination == PaginationEnum.cursor or cursor:
+            return await self.repo.find_keyset(query, limit, sort_field, cursor, total_mode, include_raw_html, raw)
+        return await self.repo.find(query, skip, limit, sort_field, include_raw_html, raw)
 
+    async def search_books(
+            self,
+            text: str,
+            category: str | None = None,
+            min_price: float = 0,
+            max_price: float = 9999,
+            skip: int = 0,
+            limit: int = 10,
+            sort_field: str | None = None,
+            raw: bool = False,
+    ) -> dict | bytes:
+        query = self.listing_filter(category, min_price, max_price)
+        return await self.repo.search(normalize_search_query(text), query, skip, limit, sort_field, raw)
@@ -1,5 +1,6 @@
 from app.db import ChangeBookRepository
 from app.serializers import serialize_book
+from app.utils import PaginationEnum, PaginationTotalEnum
 
 
 class ChangeBookService:
@@ -21,10 +22,16 @@ class ChangeBookService:
             skip: int = 0,
             limit: int = 10,
             sort_field: str | None = None,
-    ) -> list[dict]:
+            pagination: PaginationEnum = PaginationEnum.offset,
+            cursor: str | None = None,
+            total_mode: PaginationTotalEnum = PaginationTotalEnum.exact,
+            raw: bool = False,
+    ) -> dict | bytes:
         query: dict = {"price_incl_tax": {"$gte": min_price, "$lte": max_price}}
         if category:
             query["category"] = category
 
-        return await self.repo.find(query, skip, limit, sort_field)
+        if pagination == PaginationEnum.cursor or cursor:
+            return await self.repo.find_keyset(query, limit, sort_field, cursor, total_mode, raw)
+        return await self.repo.find(query, skip, limit, sort_field, raw)
 
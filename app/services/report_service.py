@@ -1,60 +1,219 @@
-from datetime import datetime, timezone
-from io import StringIO
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Optional
 import csv
+import gzip
 from bson import ObjectId
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.responses import Response, StreamingResponse
 from fastapi import HTTPException
-from app.db import get_books_by_date
-
-
-def serialize_doc(doc: dict) -> dict:
-    for key, value in doc.items():
-        if isinstance(value, ObjectId):
-            doc[key] = str(value)
-        elif isinstance(value, datetime):
-            doc[key] = value.isoformat()
-        elif isinstance(value, dict):
-            doc[key] = serialize_doc(value)
-        elif isinstance(value, list):
-            doc[key] = [serialize_doc(i) if isinstance(i, dict) else i for i in value]
-    return doc
-
-async def generate_report_service(format: str, date_str: str = None):
+from app.config.codecs import dumps_json
+from app.db import iter_changes, ReportRepository
+
+# CSV columns, fixed so the header can be written before the first row is read
+REPORT_COLUMNS = (
+    "_id", "book_id", "source_url", "name", "category", "price_incl_tax", "rating", "num_reviews", "timestamp",
+    "changes",
+)
+# rows joined into one chunk per write; keeps per-row overhead low and memory bounded
+ROWS_PER_CHUNK = 500
+REPORT_FORMATS = {"json": "application/json", "ndjson": "application/x-ndjson", "csv": "text/csv"}
+# materialized reports never change, but a rebuilt one gets a new ETag; clients revalidate hourly
+MATERIALIZED_CACHE_CONTROL = "private, max-age=3600"
+
+
+def _parse_date(value: str) -> datetime:
     try:
-        if date_str:
-            target_date = datetime.strptime(date_str, "%Y-%m-%d").replace(tzinfo=timezone.utc)
-        else:
-            now = datetime.now(timezone.utc)
-            target_date = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        return datetime.strptime(value, "%Y-%m-%d").replace(tzinfo=timezone.utc)
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD.")
-    changes = await get_books_by_date(target_date)
 
-    changes = [serialize_doc(c) for c in changes]
 
-    if not changes:
+def report_range(date_str: str = None, from_str: str = None, to_str: str = None) -> tuple[datetime, datetime]:
+    """``[start, end)`` covering the requested days; ``to`` is inclusive and defaults to ``from``."""
+    if date_str and (from_str or to_str):
+        raise HTTPException(status_code=400, detail="Use either date or from/to, not both.")
+    from_str = from_str or date_str
+    if from_str:
+        start = _parse_date(from_str)
+    else:
+        start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    end = (_parse_date(to_str) if to_str else start) + timedelta(days=1)
+    if end <= start:
+        raise HTTPException(status_code=400, detail="'to' must not be before 'from'.")
+    return start, end
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, (list, dict)):
+        return dumps_json(value).decode()
+    return value
+
+
+class _Lines:
+    """File-like sink for csv.writer that hands back what was written since the last drain."""
+
+    def __init__(self):
+        self.lines: list[str] = []
+
+    def write(self, line: str):
+        self.lines.append(line)
+
+    def drain(self) -> str:
+        chunk = "".join(self.lines)
+        self.lines.clear()
+        return chunk
+
+
+async def _prepend(first: dict, changes: AsyncIterator[dict]) -> AsyncIterator[dict]:
+    yield first
+    async for change in changes:
+        yield change
+
+
+async def stream_json(changes: AsyncIterator[dict], header: dict) -> AsyncIterator[bytes]:
+    # {<header>, "results": [...], "total": n}; total goes last because it is only known at the end
+    yield dumps_json(header)[:-1] + b',"results":['
+    total, chunk = 0, []
+    async for change in changes:
+        chunk.append(dumps_json(change))
+        total += 1
+        if len(chunk) == ROWS_PER_CHUNK:
+            yield (b"," if total > ROWS_PER_CHUNK else b"") + b",".join(chunk)
+            chunk = []
+    if chunk:
+        yield (b"," if total > len(chunk) else b"") + b",".join(chunk)
+    yield b'],"total":' + str(total).encode() + b"}"
+
+
+async def stream_ndjson(changes: AsyncIterator[dict]) -> AsyncIterator[bytes]:
+    chunk = []
+    async for change in changes:
+        chunk.append(dumps_json(change))
+        if len(chunk) == ROWS_PER_CHUNK:
+            yield b"\n".join(chunk) + b"\n"
+            chunk = []
+    if chunk:
+        yield b"\n".join(chunk) + b"\n"
+
+
+async def stream_csv(changes: AsyncIterator[dict]) -> AsyncIterator[str]:
+    lines = _Lines()
+    writer = csv.writer(lines)
+    writer.writerow(REPORT_COLUMNS)
+    async for change in changes:
+        writer.writerow([_csv_value(change.get(column)) for column in REPORT_COLUMNS])
+        if len(lines.lines) >= ROWS_PER_CHUNK:
+            yield lines.drain()
+    yield lines.drain()
+
+
+def render_report(format: str, changes: AsyncIterator[dict], start: datetime, end: datetime) -> AsyncIterator:
+    first_day, last_day = _days(start, end)
+    if format == "json":
+        header = {"date": first_day} if first_day == last_day else {}
+        return stream_json(changes, {**header, "from": first_day, "to": last_day})
+    if format == "ndjson":
+        return stream_ndjson(changes)
+    return stream_csv(changes)
+
+
+def _days(start: datetime, end: datetime) -> tuple[str, str]:
+    return start.strftime("%Y-%m-%d"), (end - timedelta(days=1)).strftime("%Y-%m-%d")
+
+
+def _download_headers(format: str, start: datetime, end: datetime) -> dict:
+    if format != "csv":
+        return {}
+    first_day, last_day = _days(start, end)
+    suffix = first_day if first_day == last_day else f"{first_day}_to_{last_day}"
+    return {"Content-Disposition": f"attachment; filename=book_changes_{suffix.replace('-', '_')}.csv"}
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    # weak comparison, as If-None-Match requires
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in candidates or etag.removeprefix("W/") in candidates
+
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    """Whether ``Accept-Encoding`` allows gzip: listed (or covered by ``*``) with a non-zero q-value."""
+    weights = {}
+    for item in (accept_encoding or "").split(","):
+        coding, *params = [part.strip() for part in item.split(";")]
+        weight = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        if coding:
+            weights[coding.lower()] = weight
+    weight = weights.get("gzip", weights.get("x-gzip", weights.get("*", 0.0)))
+    return weight > 0
+
+
+async def materialized_response(format: str, start: datetime, end: datetime, if_none_match: Optional[str] = None,
+                                accept_encoding: Optional[str] = None) -> Optional[Response]:
+    """The stored report for a completed day, or ``None`` if the scheduler has not built it."""
+    report = await ReportRepository.get(start.strftime("%Y-%m-%d"), format)
+    if report is None:
+        return None
+    if not report["total"]:
         raise HTTPException(status_code=404, detail="No changes found for this date.")
-    if format.lower() == "json":
-        return JSONResponse(content={
-            "date": target_date.strftime("%Y-%m-%d"),
-            "total": len(changes),
-            "results": changes
-        })
-
-    # Return CSV response
-    elif format.lower() == "csv":
-        output = StringIO()
-        writer = csv.DictWriter(output, fieldnames=list(changes[0].keys()))
-        writer.writeheader()
-        writer.writerows(changes)
-        output.seek(0)
-        filename = f"book_changes_{target_date.strftime('%Y_%m_%d')}.csv"
-
-        return StreamingResponse(
-            output,
-            media_type="text/csv",
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
-        )
+    body = report.get("artifacts", {}).get(format)
+    if body is None:
+        # too large to store; rendered live
+        return None
 
-    else:
-        raise HTTPException(status_code=400, detail="Invalid format. Choose 'json' or 'csv'.")
+    etag = report["etags"][format]
+    headers = {"ETag": etag, "Cache-Control": MATERIALIZED_CACHE_CONTROL, "Vary": "Accept-Encoding",
+               **_download_headers(format, start, end)}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    if accepts_gzip(accept_encoding):
+        return Response(bytes(body), media_type=REPORT_FORMATS[format], headers={**headers, "Content-Encoding": "gzip"})
+    return Response(gzip.decompress(body), media_type=REPORT_FORMATS[format], headers=headers)
+
+
+async def generate_report_service(format: str, date_str: str = None, from_str: str = None, to_str: str = None,
+                                  if_none_match: str = None, accept_encoding: str = None):
+    format = format.lower()
+    if format not in REPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="Invalid format. Choose 'json', 'ndjson' or 'csv'.")
+    start, end = report_range(date_str, from_str, to_str)
+
+    today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    if end - start == timedelta(days=1) and end <= today:
+        response = await materialized_response(format, start, end, if_none_match, accept_encoding)
+        if response is not None:
+            return response
+
+    changes = iter_changes(start, end)
+    # read the first record up front so an empty range is still a 404, not an empty 200 stream
+    first = await anext(changes, None)
+    if first is None:
+        raise HTTPException(status_code=404, detail="No changes found for this date.")
+
+    return StreamingResponse(
+        render_report(format, _prepend(first, changes), start, end),
+        media_type=REPORT_FORMATS[format],
+        headers=_download_headers(format, start, end),
+    )
+
+
+async def get_report_summary(date_str: str = None) -> dict:
+    """Per-category and per-field change counts of a materialized day."""
+    start, _ = report_range(date_str)
+    summary = await ReportRepository.get_summary(start.strftime("%Y-%m-%d"))
+    if summary is None:
+        raise HTTPException(status_code=404, detail="No report has been built for this date.")
+    return {"date": summary.pop("_id"), **summary}
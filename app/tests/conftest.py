@@ -0,0 +1,383 @@
+"""Shared crawler fixtures: a local stand-in for books.toscrape.com and in-memory collections.
+
+``MockBookSite`` serves catalogue listing pages, per-category listing pages
+and book detail pages with the same markup the crawler and parser expect,
+with an optional per-response delay to model network round-trip time. With a ``capacity`` it
+also behaves like an overloaded server: beyond ``capacity`` concurrent
+requests responses slow down in proportion, and beyond twice that it sheds
+load with 503s (carrying ``Retry-After`` when set). ``error_rate`` injects
+random 500s; both can be changed while it runs to model spikes.
+``MemoryCollection`` stands in for the Motor collections a crawl writes to.
+The benchmarks import both from here.
+"""
+import asyncio
+import random
+from contextlib import contextmanager
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from bson import ObjectId
+
+CATEGORIES = ("Travel", "Mystery", "Historical Fiction", "Poetry", "Fantasy")
+RATINGS = ("One", "Two", "Three", "Four", "Five")
+
+LISTING_TEMPLATE = """<!DOCTYPE html>
+<html><head><title>All products | Books to Scrape</title></head>
+<body>
+{sidebar}
+<section><ol class="row">
+{articles}
+</ol>
+<ul class="pager"><li class="current">Page {page} of {pages}</li>{next}</ul>
+</section></body></html>
+"""
+
+SIDEBAR_TEMPLATE = """<div class="side_categories"><ul class="nav nav-list"><li><a href="catalogue/category/books_1/index.html">Books</a><ul>
+{categories}
+</ul></li></ul></div>"""
+
+ARTICLE_TEMPLATE = """<li><article class="product_pod">
+<div class="image_container"><a href="{href}"><img src="../media/cache/{book_id}.jpg" alt="Book {book_id}"></a></div>
+<p class="star-rating {rating}"></p>
+<h3><a href="{href}" title="Book {book_id}">Book {book_id}</a></h3>
+<div class="product_price"><p class="price_color">£{price:.2f}</p><p class="instock availability">In stock</p></div>
+</article></li>"""
+
+DETAIL_TEMPLATE = """<!DOCTYPE html>
+<html><head><title>Book {book_id} | Books to Scrape</title></head>
+<body>
+<ul class="breadcrumb"><li><a href="../../index.html">Home</a></li>
+<li><a href="../category/books_1/index.html">Books</a></li>
+<li><a href="../category/books/{category_slug}/index.html">{category}</a></li>
+<li class="active">Book {book_id}</li></ul>
+<article class="product_page">
+<div class="row"><div id="product_gallery"><div class="thumbnail"><img src="../../media/cache/{book_id}.jpg" alt="Book {book_id}"></div></div>
+<div class="product_main"><h1>Book {book_id}</h1>
+<p class="price_color">£{price:.2f}</p>
+<p class="instock availability"><i class="icon-ok"></i> In stock ({stock} available)</p>
+<p class="star-rating {rating}"><i class="icon-star"></i></p></div></div>
+<div id="product_description" class="sub-header"><h2>Product Description</h2></div>
+<p>{description}</p>
+<div class="sub-header"><h2>Product Information</h2></div>
+<table class="table table-striped">
+<tr><th>UPC</th><td>{upc}</td></tr>
+<tr><th>Product Type</th><td>Books</td></tr>
+<tr><th>Price (excl. tax)</th><td>£{price:.2f}</td></tr>
+<tr><th>Price (incl. tax)</th><td>£{price:.2f}</td></tr>
+<tr><th>Tax</th><td>£0.00</td></tr>
+<tr><th>Availability</th><td>In stock ({stock} available)</td></tr>
+<tr><th>Number of reviews</th><td>{reviews}</td></tr>
+</table>
+</article>
+<footer>{filler}</footer>
+</body></html>
+"""
+
+
+class MockBookSite:
+    """aiohttp application serving a synthetic catalogue of ``pages * books_per_page`` books."""
+
+    def __init__(
+            self,
+            pages: int = 10,
+            books_per_page: int = 20,
+            latency: float = 0.0,
+            capacity: int = 0,
+            retry_after: float | None = None,
+            error_rate: float = 0.0,
+            padding: int = 200,
+    ):
+        self.pages = pages
+        self.books_per_page = books_per_page
+        self.latency = latency
+        self.capacity = capacity
+        self.retry_after = retry_after
+        self.error_rate = error_rate
+        # repeats of a 16-byte comment on each detail page, to size pages like real ones
+        self.padding = padding
+        # book id -> price, for books repriced since the site started
+        self.prices: dict[int, float] = {}
+        self.requests = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.rejected = 0
+        self.errors = 0
+        self.runner: web.AppRunner | None = None
+        self.base_url = ""
+
+    @staticmethod
+    def category_of(book_id: int) -> str:
+        return CATEGORIES[book_id % len(CATEGORIES)]
+
+    def price_of(self, book_id: int) -> float:
+        return self.prices.get(book_id, 10 + (book_id * 7) % 50 + 0.99)
+
+    @staticmethod
+    def category_slug(category: str, index: int) -> str:
+        return f"{category.lower().replace(' ', '-')}_{index + 2}"
+
+    def detail_html(self, book_id: int) -> str:
+        category = self.category_of(book_id)
+        return DETAIL_TEMPLATE.format(
+            book_id=book_id,
+            category=category,
+            category_slug=self.category_slug(category, CATEGORIES.index(category)),
+            price=self.price_of(book_id),
+            stock=1 + book_id % 22,
+            rating=RATINGS[book_id % len(RATINGS)],
+            reviews=book_id % 5,
+            upc=f"{book_id:016x}",
+            description=f"Synthetic description for book {book_id}. " * 20,
+            filler="<!-- padding -->" * self.padding,
+        )
+
+    def listing_html(self, page: int) -> str:
+        # page 1 is served from the site root, so its links carry the catalogue/ prefix
+        prefix = "catalogue/" if page == 1 else ""
+        first = (page - 1) * self.books_per_page
+        articles = "\n".join(
+            ARTICLE_TEMPLATE.format(
+                href=f"{prefix}book-{book_id}_{book_id}/index.html",
+                book_id=book_id,
+                rating=RATINGS[book_id % len(RATINGS)],
+                price=self.price_of(book_id),
+            )
+            for book_id in range(first, first + self.books_per_page)
+        )
+        next_link = f'<li class="next"><a href="{prefix}page-{page + 1}.html">next</a></li>' if page < self.pages else ""
+        # only the root page carries the sidebar; its links are relative to the site root
+        return LISTING_TEMPLATE.format(
+            sidebar=self.sidebar_html() if page == 1 else "",
+            articles=articles, page=page, pages=self.pages, next=next_link,
+        )
+
+    def sidebar_html(self) -> str:
+        categories = "\n".join(
+            f'<li><a href="catalogue/category/books/{self.category_slug(name, index)}/index.html">{name}</a></li>'
+            for index, name in enumerate(CATEGORIES)
+        )
+        return SIDEBAR_TEMPLATE.format(categories=categories)
+
+    def category_books(self, category: str) -> list[int]:
+        return [book_id for book_id in range(self.pages * self.books_per_page) if self.category_of(book_id) == category]
+
+    def category_html(self, category: str, page: int) -> str | None:
+        books = self.category_books(category)
+        pages = max(1, -(-len(books) // self.books_per_page))
+        if not 1 <= page <= pages:
+            return None
+        # book links climb out of catalogue/category/books/<slug>/, as on the real site
+        articles = "\n".join(
+            ARTICLE_TEMPLATE.format(
+                href=f"../../../book-{book_id}_{book_id}/index.html",
+                book_id=book_id,
+                rating=RATINGS[book_id % len(RATINGS)],
+                price=self.price_of(book_id),
+            )
+            for book_id in books[(page - 1) * self.books_per_page:page * self.books_per_page]
+        )
+        next_link = f'<li class="next"><a href="page-{page + 1}.html">next</a></li>' if page < pages else ""
+        return LISTING_TEMPLATE.format(sidebar="", articles=articles, page=page, pages=pages, next=next_link)
+
+    async def _respond(self, body: str) -> web.Response:
+        self.requests += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            if self.capacity and self.in_flight > 2 * self.capacity:
+                self.rejected += 1
+                headers = {"Retry-After": f"{self.retry_after:g}"} if self.retry_after is not None else None
+                return web.Response(status=503, text="overloaded", headers=headers)
+            if self.error_rate and random.random() < self.error_rate:
+                self.errors += 1
+                return web.Response(status=500, text="error")
+            delay = self.latency
+            if self.capacity and self.in_flight > self.capacity:
+                # requests beyond capacity queue behind the ones being served
+                delay *= self.in_flight / self.capacity
+            if delay:
+                await asyncio.sleep(delay)
+            return web.Response(text=body, content_type="text/html")
+        finally:
+            self.in_flight -= 1
+
+    async def index(self, request: web.Request) -> web.Response:
+        return await self._respond(self.listing_html(1))
+
+    async def listing(self, request: web.Request) -> web.Response:
+        page = int(request.match_info["page"])
+        if not 1 <= page <= self.pages:
+            raise web.HTTPNotFound()
+        return await self._respond(self.listing_html(page))
+
+    async def category(self, request: web.Request) -> web.Response:
+        slug = request.match_info["slug"]
+        names = [name for index, name in enumerate(CATEGORIES) if self.category_slug(name, index) == slug]
+        html = self.category_html(names[0], int(request.match_info.get("page", 1))) if names else None
+        if html is None:
+            raise web.HTTPNotFound()
+        return await self._respond(html)
+
+    async def detail(self, request: web.Request) -> web.Response:
+        book_id = int(request.match_info["slug"].rsplit("_", 1)[-1])
+        if book_id >= self.pages * self.books_per_page:
+            raise web.HTTPNotFound()
+        return await self._respond(self.detail_html(book_id))
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/", self.index)
+        app.router.add_get("/index.html", self.index)
+        app.router.add_get("/catalogue/page-{page:\\d+}.html", self.listing)
+        app.router.add_get("/catalogue/category/books/{slug}/index.html", self.category)
+        app.router.add_get("/catalogue/category/books/{slug}/page-{page:\\d+}.html", self.category)
+        app.router.add_get("/catalogue/{slug}/index.html", self.detail)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        self.runner = web.AppRunner(self.app(), access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://{host}:{port}/"
+        return self.base_url
+
+    async def stop(self):
+        if self.runner:
+            await self.runner.cleanup()
+            self.runner = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+
+class MemoryCollection:
+    """Just enough of the Motor collection API for the crawler, without a mongod."""
+
+    def __init__(self):
+        self.docs: dict = {}
+
+    @staticmethod
+    def _matches(doc: dict, query: dict) -> bool:
+        # only the shapes the crawler uses: {field: value}, $in, $ne, $gte, $exists; others match everything
+        for field, condition in query.items():
+            value = doc.get(field)
+            if isinstance(condition, dict):
+                if "$in" in condition and value not in condition["$in"]:
+                    return False
+                if "$ne" in condition and value == condition["$ne"]:
+                    return False
+                if "$gte" in condition and (value is None or value < condition["$gte"]):
+                    return False
+                if "$exists" in condition and (field in doc) != condition["$exists"]:
+                    return False
+            elif value != condition:
+                return False
+        return True
+
+    async def estimated_document_count(self) -> int:
+        return len(self.docs)
+
+    async def find_one(self, query: dict, *args, **kwargs):
+        await asyncio.sleep(0)
+        for doc in self.docs.values():
+            if self._matches(doc, query):
+                return doc
+        return None
+
+    async def find(self, query: dict, projection: dict | None = None):
+        for doc in list(self.docs.values()):
+            await asyncio.sleep(0)
+            if self._matches(doc, query):
+                yield doc
+
+    def _update(self, query: dict, update: dict, upsert: bool) -> tuple[int, int]:
+        key = tuple(sorted(query.items()))
+        doc = self.docs.get(key)
+        if doc is None and "_id" in query:
+            doc = next((doc for doc in self.docs.values() if doc["_id"] == query["_id"]), None)
+        existing = doc is not None
+        if doc is None and upsert:
+            doc = self.docs[key] = {"_id": ObjectId(), **query}
+        if doc is not None:
+            if not existing:
+                doc.update(update.get("$setOnInsert", {}))
+            doc.update(update.get("$set", {}))
+        return int(doc is not None and not existing), int(existing)
+
+    async def update_one(self, query: dict, update: dict, upsert: bool = False):
+        await asyncio.sleep(0)
+        self._update(query, update, upsert)
+
+    async def update_many(self, query: dict, update: dict):
+        await asyncio.sleep(0)
+        modified = 0
+        for doc in self.docs.values():
+            if self._matches(doc, query):
+                doc.update(update.get("$set", {}))
+                modified += 1
+        return SimpleNamespace(modified_count=modified)
+
+    async def insert_many(self, documents: list[dict], ordered: bool = True):
+        await asyncio.sleep(0)
+        for document in documents:
+            document.setdefault("_id", ObjectId())
+            self.docs[(("_id", document["_id"]),)] = document
+
+    async def bulk_write(self, operations, ordered: bool = True):
+        await asyncio.sleep(0)
+        upserted = modified = 0
+        for op in operations:
+            doc = op._doc
+            inserted, updated = self._update(op._filter, doc, op._upsert)
+            upserted += inserted
+            modified += updated
+        return SimpleNamespace(upserted_count=upserted, modified_count=modified)
+
+
+@contextmanager
+def memory_collections():
+    """Patch every collection a crawl touches with a ``MemoryCollection``, and skip cache invalidation."""
+    db = SimpleNamespace(books=MemoryCollection(), changes=MemoryCollection(),
+                         http_cache=MemoryCollection(), snapshots=MemoryCollection())
+    with patch("app.crawler.crawler.books_collection", db.books), \
+            patch("app.crawler.dedup.books_collection", db.books), \
+            patch("app.crawler.writer.books_collection", db.books), \
+            patch("app.crawler.writer.changes_collection", db.changes), \
+            patch("app.scheduler.detector.books_collection", db.books), \
+            patch("app.scheduler.detector.changes_collection", db.changes), \
+            patch("app.crawler.revalidation.http_cache_collection", db.http_cache), \
+            patch("app.crawler.writer.BookRepository.invalidate", AsyncMock()), \
+            patch("app.crawler.writer.ChangeBookRepository.invalidate", AsyncMock()), \
+            patch("app.db.repositories.snapshot_repository.snapshots_collection", db.snapshots):
+        yield db
+
+
+@pytest.fixture
+def memory_db():
+    with memory_collections() as db:
+        yield db
+
+
+@pytest_asyncio.fixture
+async def book_site():
+    """Start a ``MockBookSite(**options)`` per call; all of them are stopped at teardown."""
+    sites = []
+
+    async def start(**options) -> MockBookSite:
+        site = MockBookSite(**options)
+        sites.append(site)
+        await site.start()
+        return site
+
+    yield start
+    for site in sites:
+        await site.stop()
@@ -0,0 +1,148 @@
+import json
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from bson import ObjectId
+from fastapi import HTTPException
+
+from app.config.redis_caching import INVALIDATION_CHANNEL
+from app.utils import verify_user_api_key
+from app.utils.api_key_cache import ApiKeyCache, LastUsedTracker
+
+
+def redis_client():
+    return MagicMock(get=AsyncMock(return_value=None), setex=AsyncMock(), delete=AsyncMock(), publish=AsyncMock())
+
+
+def cache_on(client, **options):
+    key_cache = ApiKeyCache(ttl=60, local_ttl=60, **options)
+    key_cache.redis.get_client = AsyncMock(return_value=client)
+    return key_cache
+
+
+@pytest.fixture
+def key_cache():
+    return cache_on(redis_client())
+
+
+def user_doc(**fields):
+    return {"_id": ObjectId(), "username": "reader", "api_key": "k1", "role": "user", **fields}
+
+
+class TestApiKeyCache:
+    @pytest.mark.asyncio
+    async def test_second_lookup_is_served_locally(self, key_cache):
+        client = await key_cache.redis.get_client()
+        loader = AsyncMock(return_value=user_doc())
+        first = await key_cache.get("k1", loader)
+        second = await key_cache.get("k1", loader)
+
+        assert first == second
+        assert "api_key" not in first
+        loader.assert_awaited_once()
+        client.get.assert_awaited_once()
+        client.setex.assert_awaited_once()
+        assert "k1" not in client.setex.call_args.args[0]
+
+    @pytest.mark.asyncio
+    async def test_redis_hit_skips_mongo(self, key_cache):
+        client = await key_cache.redis.get_client()
+        client.get.return_value = key_cache.redis.codec.encode({"_id": "x", "username": "reader"})
+        loader = AsyncMock()
+        assert (await key_cache.get("k1", loader))["username"] == "reader"
+        loader.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_redis_outage_still_caches_locally(self, key_cache):
+        key_cache.redis.get_client.side_effect = ConnectionError("down")
+        loader = AsyncMock(return_value=user_doc())
+        await key_cache.get("k1", loader)
+        await key_cache.get("k1", loader)
+        loader.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_invalidate_forces_reload(self, key_cache):
+        client = await key_cache.redis.get_client()
+        loader = AsyncMock(side_effect=[user_doc(), user_doc(is_active=False)])
+        await key_cache.get("k1", loader)
+        await key_cache.invalidate("k1", None)
+
+        assert (await key_cache.get("k1", loader))["is_active"] is False
+        client.delete.assert_awaited_once_with(ApiKeyCache.redis_key("k1"))
+
+    @pytest.mark.asyncio
+    async def test_invalidate_reaches_other_processes(self, key_cache):
+        other = cache_on(redis_client())
+        loader = AsyncMock(side_effect=[user_doc(), user_doc(is_active=False)])
+        await other.get("k1", loader)
+
+        await key_cache.invalidate("k1")
+        client = await key_cache.redis.get_client()
+        channel, message = client.publish.call_args.args
+        assert channel == INVALIDATION_CHANNEL
+        other.redis._apply_message(json.loads(message))
+
+        assert (await other.get("k1", loader))["is_active"] is False
+
+    @pytest.mark.asyncio
+    async def test_local_tier_evicts_least_recently_used(self):
+        key_cache = cache_on(redis_client(), max_entries=2)
+        loader = AsyncMock(side_effect=lambda api_key: user_doc(api_key=api_key))
+        for api_key in ("k1", "k2", "k1", "k3"):
+            await key_cache.get(api_key, loader)
+
+        assert len(key_cache.local) == 2
+        assert key_cache.local.get(ApiKeyCache.redis_key("k1")) is not None
+        assert key_cache.local.get(ApiKeyCache.redis_key("k2")) is None
+
+    @pytest.mark.asyncio
+    async def test_unknown_key_is_not_cached(self, key_cache):
+        client = await key_cache.redis.get_client()
+        assert await key_cache.get("nope", AsyncMock(return_value=None)) is None
+        client.setex.assert_not_called()
+
+
+class TestLastUsedTracker:
+    @pytest.mark.asyncio
+    async def test_touches_are_coalesced_into_one_bulk_write(self):
+        tracker = LastUsedTracker(interval=60)
+        for key in ("k1", "k2", "k1", "k1"):
+            tracker.touch(key)
+        with patch("app.db.users_collection") as users:
+            users.bulk_write = AsyncMock()
+            assert await tracker.flush() == 2
+            assert await tracker.flush() == 0
+
+        operations = users.bulk_write.call_args.args[0]
+        assert users.bulk_write.await_count == 1
+        assert sorted(op._filter["api_key"] for op in operations) == ["k1", "k2"]
+        assert not any(op._upsert for op in operations)
+
+    @pytest.mark.asyncio
+    async def test_failed_flush_keeps_timestamps(self):
+        tracker = LastUsedTracker(interval=60)
+        tracker.touch("k1")
+        with patch("app.db.users_collection") as users:
+            users.bulk_write = AsyncMock(side_effect=RuntimeError("down"))
+            with pytest.raises(RuntimeError):
+                await tracker.flush()
+        assert "k1" in tracker._pending
+
+
+class TestVerifyUserApiKey:
+    @pytest.mark.asyncio
+    async def test_valid_key_records_last_used_without_writing(self):
+        with patch("app.utils.security.api_key_cache.get", new_callable=AsyncMock,
+                   return_value={"_id": "x", "username": "reader"}), \
+                patch("app.utils.security.last_used_tracker") as tracker:
+            user = await verify_user_api_key("k1")
+        assert user["username"] == "reader"
+        tracker.touch.assert_called_once_with("k1")
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("user", [None, {"_id": "x", "is_active": False}])
+    async def test_rejected_keys(self, user):
+        with patch("app.utils.security.api_key_cache.get", new_callable=AsyncMock, return_value=user):
+            with pytest.raises(HTTPException) as exc:
+                await verify_user_api_key("k1")
+        assert exc.value.status_code == 401
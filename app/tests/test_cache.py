@@ -0,0 +1,250 @@
+import asyncio
+import json
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.config import RedisCache, LocalCache, CacheCodec
+from app.config.codecs import msgpack, zstandard
+from app.config.redis_caching import INVALIDATION_CHANNEL
+
+
+@pytest.fixture
+def redis_client():
+    client = MagicMock()
+    client.get = AsyncMock(return_value=None)
+    client.setex = AsyncMock()
+    client.delete = AsyncMock()
+    client.publish = AsyncMock()
+    return client
+
+
+@pytest.fixture
+def two_tier(redis_client):
+    cache = RedisCache(local_cache=LocalCache(max_entries=10, ttl=30))
+    cache._client = redis_client
+    return cache
+
+
+class TestLocalCache:
+    def test_least_recently_used_is_evicted_first(self):
+        local = LocalCache(max_entries=2)
+        local.set("book:a", "1")
+        local.set("book:b", "2")
+        local.get("book:a")
+        local.set("book:c", "3")
+
+        assert local.get("book:b") is None
+        assert local.get("book:a") == 1
+        assert local.stats.snapshot()["local"]["book"]["evictions"] == 1
+
+    def test_byte_budget_is_enforced(self):
+        local = LocalCache(max_entries=100, max_bytes=10)
+        local.set("books_list:a", json.dumps("xxxx"))
+        local.set("books_list:b", json.dumps("yyyy"))
+        assert len(local) == 1 and local.bytes <= 10
+        local.set("books_list:c", json.dumps("z" * 20))
+        assert local.get("books_list:c") is None
+
+    def test_expired_entries_miss(self):
+        local = LocalCache(ttl=30)
+        with patch("app.config.local_cache.time.monotonic", return_value=0):
+            local.set("user:a", '{"username": "a"}')
+        with patch("app.config.local_cache.time.monotonic", return_value=31):
+            assert local.get("user:a") is None
+        assert len(local) == 0 and local.bytes == 0
+
+
+class TestTwoTierCache:
+    @pytest.mark.asyncio
+    async def test_redis_hit_is_promoted_to_local(self, two_tier, redis_client):
+        redis_client.get.return_value = json.dumps({"results": []})
+        assert await two_tier.get("books_list:x") == {"results": []}
+        assert await two_tier.get("books_list:x") == {"results": []}
+
+        redis_client.get.assert_awaited_once()
+        tiers = two_tier.stats()["tiers"]
+        assert tiers["redis"]["books_list"]["hits"] == 1
+        assert tiers["local"]["books_list"] == {"hits": 1, "misses": 1, "evictions": 0}
+
+    @pytest.mark.asyncio
+    async def test_set_fills_both_tiers(self, two_tier, redis_client):
+        await two_tier.set("book:1", {"name": "A"})
+        assert await two_tier.get("book:1") == {"name": "A"}
+        redis_client.setex.assert_awaited_once()
+        redis_client.get.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_invalidate_is_broadcast(self, two_tier, redis_client):
+        await two_tier.set("book:1", {"name": "A"})
+        await two_tier.invalidate(key="book:1")
+
+        assert two_tier.local.get("book:1") is None
+        channel, message = redis_client.publish.call_args.args
+        assert channel == INVALIDATION_CHANNEL
+        assert json.loads(message) == {"keys": ["book:1"]}
+
+    @pytest.mark.asyncio
+    async def test_invalidation_from_another_worker_clears_local(self, two_tier, redis_client):
+        await two_tier.set("book:1", {"name": "A"})
+
+        async def listen():
+            yield {"type": "subscribe", "data": 1}
+            yield {"type": "message", "data": json.dumps({"keys": ["book:1"]})}
+            yield {"type": "message", "data": json.dumps({"generations": {"books": 7}})}
+            raise asyncio.CancelledError
+
+        pubsub = MagicMock(subscribe=AsyncMock(), close=AsyncMock(), listen=listen)
+        redis_client.pubsub.return_value = pubsub
+        with pytest.raises(asyncio.CancelledError):
+            await two_tier.listen_for_invalidations()
+
+        pubsub.subscribe.assert_awaited_once_with(INVALIDATION_CHANNEL)
+        assert two_tier.local.get("book:1") is None
+        assert await two_tier.generation("books") == 7
+        redis_client.get.assert_not_called()
+
+
+class TestGenerations:
+    @pytest.mark.asyncio
+    async def test_bump_moves_versioned_keys(self, two_tier, redis_client):
+        redis_client.get.return_value = "3"
+        before = await two_tier.versioned_key("books_list", "books", skip=0)
+
+        pipe = MagicMock(incr=MagicMock(), execute=AsyncMock(return_value=[4]))
+        pipe.__aenter__ = AsyncMock(return_value=pipe)
+        pipe.__aexit__ = AsyncMock(return_value=False)
+        redis_client.pipeline.return_value = pipe
+        await two_tier.bump_generation("books")
+        after = await two_tier.versioned_key("books_list", "books", skip=0)
+
+        assert before.startswith("books_list:v3:") and after.startswith("books_list:v4:")
+        assert before.split(":")[-1] == after.split(":")[-1]
+        assert json.loads(redis_client.publish.call_args.args[1]) == {"generations": {"books": 4}}
+        redis_client.keys.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_stale_generation_message_is_ignored(self, two_tier):
+        two_tier._apply_message({"generations": {"books": 5}})
+        two_tier._apply_message({"generations": {"books": 4}})
+        assert await two_tier.generation("books") == 5
+
+
+class TestSingleFlight:
+    @pytest.mark.asyncio
+    async def test_concurrent_misses_run_one_query(self, redis_client):
+        from app.db import BookRepository
+        single_flight = RedisCache()
+        single_flight._client = redis_client
+        calls = 0
+
+        async def slow_paginate(*args):
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return {"total": 1, "results": [{"name": "A"}]}
+
+        with patch("app.db.repositories.book_repository.cache", single_flight), \
+                patch("app.db.repositories.book_repository.paginate", slow_paginate):
+            pages = await asyncio.gather(*(BookRepository.find({"category": "Travel"}) for _ in range(50)))
+
+        assert calls == 1
+        assert all(page["results"] == [{"name": "A"}] for page in pages)
+        redis_client.setex.assert_awaited_once()
+        assert single_flight.stats()["tiers"]["loader"]["books_list"] == {
+            "hits": 0, "misses": 0, "evictions": 0, "loads": 1, "coalesced": 49
+        }
+
+    @pytest.mark.asyncio
+    async def test_loader_error_reaches_every_waiter(self, redis_client):
+        single_flight = RedisCache()
+        single_flight._client = redis_client
+        loader = AsyncMock(side_effect=RuntimeError("mongo down"))
+
+        results = await asyncio.gather(
+            *(single_flight.get_or_load("book:1", loader) for _ in range(5)), return_exceptions=True
+        )
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert loader.await_count == 1
+        assert not single_flight._inflight
+
+    @pytest.mark.asyncio
+    async def test_stale_entry_is_served_while_one_refresh_runs(self, redis_client):
+        stale = RedisCache(stale_ttl=60)
+        stale._client = redis_client
+        redis_client.get.return_value = stale.codec.pack_entry("old", 0)
+        refreshed = asyncio.Event()
+
+        async def loader():
+            await refreshed.wait()
+            return "new"
+
+        values = await asyncio.gather(*(stale.get_or_load("books_list:x", loader) for _ in range(10)))
+        assert values == ["old"] * 10
+        assert len(stale._loads) == 1
+
+        refreshed.set()
+        await asyncio.gather(*stale._loads)
+        key, ttl, payload = redis_client.setex.call_args.args
+        assert (key, ttl, stale.codec.decode(payload)["value"]) == ("books_list:x", 360, "new")
+
+    @pytest.mark.asyncio
+    async def test_lock_holder_elsewhere_is_waited_for(self, redis_client):
+        locked = RedisCache(use_lock=True, lock_timeout=1)
+        locked._client = redis_client
+        redis_client.set = AsyncMock(return_value=None)
+        fresh = locked.codec.pack_entry("from other worker", 2 ** 40)
+        redis_client.get.side_effect = [None, None, fresh]
+        loader = AsyncMock()
+
+        assert await locked.get_or_load("book:1", loader) == "from other worker"
+        loader.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_raw_hit_is_sent_without_reencoding(self, redis_client):
+        raw = RedisCache()
+        raw._client = redis_client
+        page = {"total": 1, "results": [{"name": "A", "price_incl_tax": 51.77}]}
+        redis_client.get.return_value = raw.codec.pack_entry(page, 2 ** 40)
+        loader = AsyncMock()
+
+        body = await raw.get_or_load("books_list:x", loader, raw=True)
+        assert isinstance(body, bytes) and json.loads(body) == page
+        loader.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_raw_miss_returns_loaded_page_as_json(self, redis_client):
+        raw = RedisCache()
+        raw._client = redis_client
+        body = await raw.get_or_load("books_list:x", AsyncMock(return_value={"total": 0}), raw=True)
+        assert json.loads(body) == {"total": 0}
+
+
+PAGE = {"total": 1000, "limit": 50, "results": [
+    {"_id": str(i), "name": f"Book {i}", "description": "lorem ipsum " * 80, "price_incl_tax": 10.5 + i}
+    for i in range(50)
+]}
+
+
+class TestCacheCodec:
+    @pytest.mark.parametrize("name", ["json", "orjson", pytest.param("msgpack", marks=pytest.mark.skipif(
+        msgpack is None, reason="msgpack not installed"))])
+    @pytest.mark.parametrize("compression", ["none", "zlib", pytest.param("zstd", marks=pytest.mark.skipif(
+        zstandard is None, reason="zstandard not installed"))])
+    def test_round_trip(self, name, compression):
+        codec = CacheCodec(name, compression, compress_min_bytes=1024)
+        payload = codec.encode(PAGE)
+        assert codec.decode(payload) == PAGE
+        assert json.loads(codec.to_json(payload)) == PAGE
+        assert codec.decode(codec.encode({"total": 0})) == {"total": 0}
+        if compression != "none":
+            assert len(payload) < len(json.dumps(PAGE)) / 4
+
+    def test_entries_from_other_settings_still_decode(self):
+        assert CacheCodec("orjson", "none").decode(CacheCodec("json", "zlib", 0).encode(PAGE)) == PAGE
+        # entries written before the codec layer were plain JSON text
+        assert CacheCodec().decode(json.dumps(PAGE).encode()) == PAGE
+        assert CacheCodec().decode(json.dumps(PAGE)) == PAGE
+
+    def test_envelope_keeps_fresh_until(self):
+        codec = CacheCodec()
+        assert codec.decode(codec.pack_entry(PAGE, 12.5)) == {"value": PAGE, "fresh_until": 12.5}
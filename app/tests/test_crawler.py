@@ -1,7 +1,28 @@
+import asyncio
 import pytest
+from datetime import datetime, timedelta
 from unittest.mock import AsyncMock, patch, MagicMock
-from app.crawler.crawler import BookCrawler
-from app.crawler.parser import BookParser
+from app.crawler.crawler import BookCrawler, create_session
+from app.crawler.dedup import UrlIndex
+from app.crawler.executor import ParseExecutor
+from app.crawler.metrics import crawl_metrics
+from app.crawler.parser import BookParser, parse_listing
+from app.crawler.revalidation import Revalidator
+from app.db.repositories.snapshot_repository import build_snapshot
+from app.scheduler.detector import detect_changes
+from app.tests.conftest import MockBookSite
+
+SITE_URL = "http://books.toscrape.com/"
+
+
+def serve_body(response, text: str, charset: str | None = "utf-8"):
+    """Give a mocked aiohttp response ``text`` as its streamed body."""
+    async def iter_chunked(size):
+        yield text.encode(charset or "utf-8")
+
+    response.content_length = None
+    response.charset = charset
+    response.content.iter_chunked = iter_chunked
 
 
 @pytest.fixture
@@ -27,7 +48,7 @@ class TestBookCrawler:
         """Test successful page fetch"""
         mock_response = AsyncMock()
         mock_response.status = 200
-        mock_response.text = AsyncMock(return_value="<html>Test HTML</html>")
+        serve_body(mock_response, "<html>Test HTML</html>")
 
         mock_session.get = MagicMock()
         mock_session.get.return_value.__aenter__.return_value = mock_response
@@ -35,6 +56,18 @@ class TestBookCrawler:
         result = await book_crawler.fetch("http://test.com")
         assert result == "<html>Test HTML</html>"
 
+    @pytest.mark.asyncio
+    async def test_fetch_counts_bytes_not_characters(self, book_crawler, mock_session):
+        mock_response = AsyncMock()
+        mock_response.status = 200
+        serve_body(mock_response, "<p>Café – £51.77</p>", charset="utf-8")
+        mock_session.get = MagicMock()
+        mock_session.get.return_value.__aenter__.return_value = mock_response
+
+        before = crawl_metrics.bytes.value
+        assert await book_crawler.fetch("http://test.com") == "<p>Café – £51.77</p>"
+        assert crawl_metrics.bytes.value - before == len("<p>Café – £51.77</p>".encode())
+
     @pytest.mark.asyncio
     async def test_fetch_failure(self, book_crawler, mock_session):
         """Test failed page fetch with retries"""
@@ -75,6 +108,18 @@ class TestBookCrawler:
             await book_crawler.save_last_page("http://test.com/page3")
             mock_collection.update_one.assert_called_once()
 
+    @pytest.mark.asyncio
+    async def test_get_last_page_of_another_run(self, book_crawler):
+        with patch('app.crawler.crawler.books_collection') as mock_collection:
+            mock_collection.find_one = AsyncMock(return_value={
+                "_id": "book_crawler:travel_2",
+                "last_page": "http://test.com/travel_2/page-2.html",
+                "run": ["travel_2"],
+            })
+
+            assert await book_crawler.get_last_page("travel_2", ["poetry_5", "travel_2"]) is None
+            assert await book_crawler.get_last_page("travel_2", ["travel_2"]) == "http://test.com/travel_2/page-2.html"
+
     def test_extract_book_links(self, book_crawler):
         """Test extracting book links from HTML"""
         html = """
@@ -110,23 +155,29 @@ class TestBookCrawler:
 
         mock_response = AsyncMock()
         mock_response.status = 200
-        mock_response.text = AsyncMock(return_value=book_html)
+        serve_body(mock_response, book_html)
 
         mock_session.get = MagicMock()
         mock_session.get.return_value.__aenter__.return_value = mock_response
 
-        with patch('app.crawler.crawler.books_collection') as mock_collection:
+        with patch('app.crawler.crawler.books_collection') as mock_collection, \
+                patch('app.crawler.writer.books_collection') as mock_writer_collection, \
+                patch('app.crawler.writer.BookRepository.invalidate', new_callable=AsyncMock):
             mock_collection.find_one = AsyncMock(return_value=None)
-            mock_collection.update_one = AsyncMock()
+            mock_writer_collection.bulk_write = AsyncMock()
 
             with patch.object(book_crawler.parser, 'parse_book') as mock_parse:
                 mock_parse.return_value = MagicMock(
                     name="New Book",
+                    row_html=None,
+                    snapshot_id=None,
                     model_dump=MagicMock(return_value={"name": "New Book"})
                 )
 
                 await book_crawler._process_book("http://test.com/book1")
-                mock_collection.update_one.assert_called_once()
+                await book_crawler.writer.flush()
+                mock_writer_collection.bulk_write.assert_called_once()
+                assert len(mock_writer_collection.bulk_write.call_args.args[0]) == 1
 
     def test_next_page_exists(self, book_crawler):
         html = """
@@ -147,4 +198,339 @@ class TestBookCrawler:
         tree = HTMLParser(html)
 
         next_page = book_crawler._next_page(tree)
-        assert next_page is None
\ No newline at end of file
+        assert next_page is None
+
+    @pytest.mark.asyncio
+    async def test_process_books_respects_concurrency(self, mock_session):
+        crawler = BookCrawler(
+            base_url="http://books.toscrape.com",
+            session=mock_session,
+            book_parser=BookParser,
+            concurrency=3
+        )
+        in_flight = peak = 0
+
+        async def slow_process(url, category=None):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+
+        with patch.object(crawler, '_process_book', side_effect=slow_process) as mock_process:
+            await crawler._process_books([f"http://test.com/book{i}" for i in range(10)])
+
+        assert mock_process.call_count == 10
+        assert peak == 3
+
+    @pytest.mark.asyncio
+    async def test_crawl_saves_checkpoints_in_page_order(self, mock_session):
+        crawler = BookCrawler(
+            base_url="http://books.toscrape.com",
+            session=mock_session,
+            book_parser=BookParser,
+            prefetch_pages=2
+        )
+        pages = {
+            "http://books.toscrape.com": '<li class="next"><a href="catalogue/page-2.html">next</a></li>',
+            "http://books.toscrape.com/catalogue/page-2.html": '<li class="next"><a href="page-3.html">next</a></li>',
+            "http://books.toscrape.com/catalogue/page-3.html": "<html></html>",
+        }
+        saved = []
+
+        async def fetch(url):
+            await asyncio.sleep(0)
+            return pages[url]
+
+        async def save_last_page(next_page, partition=None):
+            await asyncio.sleep(0)
+            saved.append(next_page)
+
+        with patch.object(crawler, 'fetch', side_effect=fetch), \
+                patch.object(crawler, 'get_last_page', AsyncMock(return_value=None)), \
+                patch.object(crawler, 'save_last_page', side_effect=save_last_page):
+            await crawler.crawl()
+
+        assert saved == [
+            "http://books.toscrape.com/catalogue/page-2.html",
+            "http://books.toscrape.com/catalogue/page-3.html",
+            None,
+        ]
+
+
+DETAIL_HTML = """
+<html>
+    <div id="product_gallery"><img src="../../media/cache/book.jpg"></div>
+    <h1>Executor Book</h1>
+    <p class="instock availability">In stock (7 available)</p>
+    <p class="star-rating Four"></p>
+    <div id="product_description"><h2>Product Description</h2></div>
+    <p>A book parsed off the event loop.</p>
+    <table class="table">
+        <tr><th>Price (excl. tax)</th><td>£10.00</td></tr>
+        <tr><th>Price (incl. tax)</th><td>£12.00</td></tr>
+        <tr><th>Number of reviews</th><td>3</td></tr>
+    </table>
+</html>
+"""
+
+
+class TestParseExecutor:
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("kind", ["none", "thread", "process"])
+    async def test_parse_book_matches_inline_parser(self, kind):
+        url = "http://books.toscrape.com/catalogue/executor-book_1/index.html"
+        expected = BookParser(DETAIL_HTML, url, "Travel").parse_record()
+
+        with ParseExecutor(kind=kind, workers=1) as executor:
+            book = await executor.parse_book(DETAIL_HTML.encode(), url, "Travel")
+
+        assert book.model_dump(include=set(expected)) == expected
+        # the raw page is handed on as it came in, without a decoded copy
+        assert book.row_html == DETAIL_HTML.encode()
+
+    @pytest.mark.asyncio
+    async def test_parse_listing_in_process_pool(self):
+        html = """
+        <html>
+            <article class="product_pod"><h3><a href="catalogue/book1.html">Book 1</a></h3></article>
+            <ul class="pager"><li class="current">Page 1 of 50</li></ul>
+            <li class="next"><a href="catalogue/page-2.html">next</a></li>
+        </html>
+        """
+        with ParseExecutor(kind="process", workers=1) as executor:
+            listing = await executor.parse_listing(html, "http://books.toscrape.com")
+
+        assert listing.links == ["http://books.toscrape.com/catalogue/book1.html"]
+        assert listing.next_page == "http://books.toscrape.com/catalogue/page-2.html"
+        assert listing.page_count == 50
+
+
+class TestBytesFetch:
+    @pytest.mark.asyncio
+    async def test_bytes_path_parses_like_the_str_path(self, book_site):
+        site = await book_site(pages=1)
+        async with create_session() as session:
+            url = f"{site.base_url}catalogue/book-3_3/index.html"
+            text = await BookCrawler(base_url=site.base_url, session=session).fetch(url)
+            crawler = BookCrawler(base_url=site.base_url, session=session, book_parser=BookParser,
+                                  fetch_bytes=True)
+            raw = await crawler.fetch(url)
+
+        assert isinstance(raw, bytes) and raw == text.encode()
+        book = await crawler._parse_book(raw, url, "")
+        assert book.row_html is raw
+        assert book.model_dump(exclude={"row_html", "crawl_timestamp"}) == \
+            BookParser(text, url).parse_book().model_dump(exclude={"row_html", "crawl_timestamp"})
+        assert build_snapshot(url, raw)["_id"] == build_snapshot(url, text)["_id"]
+
+    @pytest.mark.asyncio
+    async def test_body_over_the_cap_is_dropped_without_retrying(self, book_site):
+        site = await book_site(pages=1)
+        async with create_session() as session:
+            crawler = BookCrawler(base_url=site.base_url, session=session, fetch_bytes=True, max_body_bytes=512)
+            assert await crawler.fetch(f"{site.base_url}catalogue/book-3_3/index.html") is None
+            assert site.requests == 1
+
+            crawler.max_body_bytes = 1024 * 1024
+            assert await crawler.fetch(f"{site.base_url}catalogue/book-3_3/index.html")
+
+
+def mock_site_pages() -> dict[str, str]:
+    """Listing pages of the mock site keyed by URL (two per category), without serving them."""
+    site = MockBookSite(pages=10, books_per_page=5)
+    html = {SITE_URL: site.listing_html(1)}
+    for category in parse_listing(html[SITE_URL], SITE_URL, SITE_URL).categories:
+        page, url = 1, category.url
+        while url:
+            html[url] = site.category_html(category.name, page)
+            url = parse_listing(html[url], SITE_URL, url).next_page
+            page += 1
+    return html
+
+
+class TestCategoryParsing:
+    def test_sidebar_categories(self):
+        listing = parse_listing(MockBookSite().listing_html(1), SITE_URL, SITE_URL)
+
+        assert [category.name for category in listing.categories][:2] == ["Travel", "Mystery"]
+        assert listing.categories[0].key == "travel_2"
+        assert listing.categories[0].url == f"{SITE_URL}catalogue/category/books/travel_2/index.html"
+
+    def test_category_page_links_resolve_against_the_page(self):
+        url = f"{SITE_URL}catalogue/category/books/travel_2/index.html"
+        listing = parse_listing(MockBookSite(pages=10).category_html("Travel", 1), SITE_URL, url)
+
+        assert listing.links[0] == f"{SITE_URL}catalogue/book-0_0/index.html"
+        assert listing.next_page == f"{SITE_URL}catalogue/category/books/travel_2/page-2.html"
+        assert listing.categories == []
+
+    def test_breadcrumb_category_is_the_fallback(self):
+        html = MockBookSite().detail_html(3)
+        assert BookParser(html, "http://x/book", None).parse_record()["category"] == "Poetry"
+        assert BookParser(html, "http://x/book", "Travel").parse_record()["category"] == "Travel"
+        assert BookParser("<html></html>", "http://x/book").parse_record()["category"] == "Unknown"
+
+
+ALL_CATEGORIES = ["fantasy_6", "historical-fiction_4", "mystery_3", "poetry_5", "travel_2"]
+
+
+class TestCategoryPartitions:
+    async def _crawl(self, checkpoints: dict, categories=None, partitions=2, runs: dict | None = None):
+        crawler = BookCrawler(base_url=SITE_URL, session=MagicMock(), book_parser=BookParser,
+                              partitions=partitions)
+        pages, fetched, books = mock_site_pages(), [], []
+
+        async def fetch(url, allow_not_modified=False):
+            await asyncio.sleep(0)
+            fetched.append(url)
+            return pages[url]
+
+        async def process_book(url, category=None):
+            books.append((url, category))
+
+        runs_by_partition = {} if runs is None else runs
+
+        async def get_last_page(partition=None, run=None):
+            if run is not None and runs_by_partition.get(partition) != run:
+                return None
+            return checkpoints.get(partition)
+
+        async def save_last_page(next_page, partition=None, run=None):
+            checkpoints[partition] = next_page
+            if run is not None:
+                runs_by_partition[partition] = run
+
+        with patch.object(crawler, "fetch", side_effect=fetch), \
+                patch.object(crawler, "_process_book", side_effect=process_book), \
+                patch.object(crawler, "get_last_page", side_effect=get_last_page), \
+                patch.object(crawler, "save_last_page", side_effect=save_last_page), \
+                patch.object(crawler.writer, "assign_category", AsyncMock()) as assign:
+            await crawler.crawl(categories)
+        return fetched, books, assign
+
+    @pytest.mark.asyncio
+    async def test_every_category_is_crawled_with_its_name(self):
+        checkpoints = {}
+        fetched, books, assign = await self._crawl(checkpoints)
+
+        assert len(books) == 50 and len({url for url, _ in books}) == 50
+        assert all(
+            category == MockBookSite.category_of(int(url.rsplit("_", 1)[-1].split("/")[0])) for url, category in books
+        )
+        assert set(checkpoints) == {"travel_2", "mystery_3", "historical-fiction_4", "poetry_5", "fantasy_6"}
+        assert set(checkpoints.values()) == {None}
+        assert {call.args[1] for call in assign.await_args_list} == {
+            "Travel", "Mystery", "Historical Fiction", "Poetry", "Fantasy"
+        }
+
+    @pytest.mark.asyncio
+    async def test_resume_skips_finished_categories(self):
+        resume_at = f"{SITE_URL}catalogue/category/books/travel_2/page-2.html"
+        checkpoints = {
+            "travel_2": resume_at,
+            "mystery_3": None,
+            "poetry_5": f"{SITE_URL}catalogue/category/books/poetry_5/index.html",
+        }
+        fetched, books, _ = await self._crawl(checkpoints, runs={key: ALL_CATEGORIES for key in checkpoints})
+
+        # a category without a checkpoint was not part of the interrupted run
+        assert {category for _, category in books} == {"Travel", "Poetry"}
+        assert sum(category == "Travel" for _, category in books) == 5
+        assert f"{SITE_URL}catalogue/category/books/travel_2/index.html" not in fetched
+        assert resume_at in fetched
+
+    @pytest.mark.asyncio
+    async def test_only_selected_categories(self):
+        checkpoints, runs = {}, {}
+        _, books, _ = await self._crawl(checkpoints, categories=["poetry_5", "travel"], runs=runs)
+
+        assert {category for _, category in books} == {"Travel", "Poetry"}
+        assert set(checkpoints) == {"travel_2", "poetry_5"}
+        assert runs == {"travel_2": ["poetry_5", "travel_2"], "poetry_5": ["poetry_5", "travel_2"]}
+
+    @pytest.mark.asyncio
+    async def test_checkpoints_of_a_run_over_other_categories_are_ignored(self):
+        # a travel-only run was interrupted; a full crawl must not resume it and skip the rest
+        checkpoints = {"travel_2": f"{SITE_URL}catalogue/category/books/travel_2/page-2.html"}
+        runs = {"travel_2": ["travel_2"]}
+        _, books, _ = await self._crawl(checkpoints, runs=runs)
+
+        assert len(books) == 50
+        assert {category for _, category in books} == {
+            "Travel", "Mystery", "Historical Fiction", "Poetry", "Fantasy"
+        }
+        assert runs == {key: ALL_CATEGORIES for key in ALL_CATEGORIES}
+
+    @pytest.mark.asyncio
+    async def test_partitions_run_in_parallel_up_to_the_limit(self):
+        crawler = BookCrawler(base_url=SITE_URL, session=MagicMock(), book_parser=BookParser, partitions=3)
+        pages = mock_site_pages()
+        running = peak = 0
+
+        async def crawl_partition(category, start, html=None):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+        with patch.object(crawler, "fetch", AsyncMock(return_value=pages[SITE_URL])), \
+                patch.object(crawler, "get_last_page", AsyncMock(return_value=None)), \
+                patch.object(crawler, "save_last_page", AsyncMock()), \
+                patch.object(crawler, "_crawl_partition", side_effect=crawl_partition) as partition:
+            await crawler.crawl()
+
+        assert partition.call_count == 5
+        assert peak == 3
+
+    @pytest.mark.asyncio
+    async def test_a_failing_category_does_not_stop_the_others(self):
+        crawler = BookCrawler(base_url=SITE_URL, session=MagicMock(), book_parser=BookParser, partitions=2)
+        pages = mock_site_pages()
+        finished = []
+
+        async def crawl_partition(category, start, html=None):
+            await asyncio.sleep(0.01)
+            if category.key == "mystery_3":
+                raise RuntimeError("write failed")
+            await asyncio.sleep(0.01)
+            finished.append(category.key)
+
+        with patch.object(crawler, "fetch", AsyncMock(return_value=pages[SITE_URL])), \
+                patch.object(crawler, "get_last_page", AsyncMock(return_value=None)), \
+                patch.object(crawler, "save_last_page", AsyncMock()), \
+                patch.object(crawler, "_crawl_partition", side_effect=crawl_partition), \
+                patch.object(crawler, "logger") as logger:
+            await crawler.crawl()
+
+        assert sorted(finished) == ["fantasy_6", "historical-fiction_4", "poetry_5", "travel_2"]
+        assert "Mystery" in logger.error.call_args.args[0]
+
+
+class TestChangeTracking:
+    @pytest.mark.asyncio
+    async def test_next_days_crawl_records_a_price_change(self, memory_db, book_site):
+        site = await book_site(pages=1, books_per_page=10)
+        async with create_session() as session:
+            async def daily_crawl():
+                # what run_crawl builds with the default settings
+                crawler = BookCrawler(base_url=site.base_url, session=session, book_parser=BookParser,
+                                      revalidator=Revalidator(), url_index=UrlIndex())
+                await crawler.crawl()
+                return crawler.summary()
+
+            await daily_crawl()
+            site.prices[3] = 8.49
+            for doc in memory_db.books.docs.values():
+                if "crawl_timestamp" in doc:
+                    doc["crawl_timestamp"] = (datetime.now() - timedelta(days=1)).isoformat()
+            summary = await daily_crawl()
+            assert await detect_changes() == 0
+
+        # the other nine pages came back identical and were not rewritten
+        assert summary["writer"]["books"] == summary["writer"]["updated"] == 1
+        [change] = memory_db.changes.docs.values()
+        assert change["name"] == "Book 3"
+        assert change["price_incl_tax"] == 8.49
+        assert {"field": "price_incl_tax", "old": 31.99, "new": 8.49} in change["changes"]
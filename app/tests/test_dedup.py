@@ -0,0 +1,145 @@
+import pytest
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock, patch
+from app.crawler.crawler import BookCrawler, create_session
+from app.crawler.dedup import BloomFilter, UrlIndex, url_digest
+from app.crawler.parser import BookParser
+from app.crawler.writer import BookWriter
+
+BASE = "http://books.toscrape.com/catalogue"
+
+
+class AsyncCursor:
+    def __init__(self, docs):
+        self.docs = iter(docs)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self.docs)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+def mock_books(urls):
+    collection = MagicMock()
+    collection.estimated_document_count = AsyncMock(return_value=len(urls))
+    collection.find = MagicMock(return_value=AsyncCursor([{"source_url": url} for url in urls]))
+    collection.find_one = AsyncMock()
+    return collection
+
+
+class TestUrlIndex:
+    def test_bloom_filter_has_no_false_negatives(self):
+        bloom = BloomFilter(capacity=10_000, error_rate=0.01)
+        digests = [url_digest(f"{BASE}/book{i}/index.html") for i in range(10_000)]
+        for digest in digests:
+            bloom.add(digest)
+
+        assert all(digest in bloom for digest in digests)
+        false_positives = sum(url_digest(f"{BASE}/other{i}/index.html") in bloom for i in range(10_000))
+        assert false_positives < 300
+
+    @pytest.mark.asyncio
+    async def test_load_uses_projection_and_reports_hit_rate(self):
+        urls = [f"{BASE}/book{i}/index.html" for i in range(3)]
+        collection = mock_books(urls)
+        with patch("app.crawler.dedup.books_collection", collection):
+            index = UrlIndex()
+            await index.load()
+
+        query, projection = collection.find.call_args.args
+        assert projection == {"source_url": 1, "_id": 0}
+        assert query["content_hash"] == {"$exists": True}
+        assert index.seen(urls[0])
+        assert not index.seen(f"{BASE}/new/index.html")
+        summary = index.summary()
+        assert summary["mode"] == "set"
+        assert summary["entries"] == 3
+        assert summary["hit_rate"] == 0.5
+        assert summary["memory_bytes"] > 0
+
+    @pytest.mark.asyncio
+    async def test_switches_to_bloom_filter_for_large_catalogues(self):
+        urls = [f"{BASE}/book{i}/index.html" for i in range(50)]
+        with patch("app.crawler.dedup.books_collection", mock_books(urls)):
+            index = UrlIndex(bloom_threshold=10)
+            await index.load()
+
+        assert index.summary()["mode"] == "bloom"
+        assert all(index.seen(url) for url in urls)
+
+    @pytest.mark.asyncio
+    async def test_max_age_only_indexes_recent_books(self):
+        collection = mock_books([])
+        with patch("app.crawler.dedup.books_collection", collection):
+            await UrlIndex(max_age_days=7).load()
+
+        query = collection.find.call_args.args[0]
+        assert "$gte" in query["crawl_timestamp"]
+
+    @pytest.mark.asyncio
+    async def test_zero_max_age_skips_nothing(self):
+        collection = mock_books([f"{BASE}/book1/index.html"])
+        with patch("app.crawler.dedup.books_collection", collection), \
+                patch("app.crawler.crawler.books_collection", collection), \
+                patch("app.crawler.crawler.settings.DEDUP_MAX_AGE_DAYS", 0):
+            index = UrlIndex(max_age_days=0)
+            await index.load()
+            crawler = BookCrawler(session=MagicMock(), book_parser=BookParser)
+
+            assert not index.seen(f"{BASE}/book1/index.html")
+            assert not await crawler._is_known(f"{BASE}/book1/index.html")
+        collection.find.assert_not_called()
+        collection.find_one.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_crawler_checks_index_without_mongo(self):
+        urls = [f"{BASE}/book1/index.html"]
+        collection = mock_books(urls)
+        with patch("app.crawler.dedup.books_collection", collection), \
+                patch("app.crawler.crawler.books_collection", collection):
+            index = UrlIndex()
+            await index.load()
+            crawler = BookCrawler(session=MagicMock(), book_parser=BookParser, url_index=index)
+
+            assert await crawler._is_known(urls[0])
+            assert not await crawler._is_known(f"{BASE}/book2/index.html")
+            collection.find_one.assert_not_called()
+
+
+class TestRecrawl:
+    @pytest.mark.asyncio
+    async def test_known_book_is_refetched_once_stale_and_its_change_recorded(self, memory_db, book_site):
+        books = memory_db.books
+        site = await book_site(pages=1, books_per_page=3)
+        async with create_session() as session:
+            def crawler():
+                return BookCrawler(base_url=site.base_url, session=session, book_parser=BookParser,
+                                   writer=BookWriter(flush_interval=0), url_index=UrlIndex())
+
+            await crawler().crawl()
+            url = next(url for url in (doc.get("source_url", "") for doc in books.docs.values()) if "_1/" in url)
+            site.prices[1] = 5.99
+
+            # crawled moments ago: skipped
+            recent = crawler()
+            await recent.url_index.load()
+            assert await recent._is_known(url)
+
+            # a day later the book is fetched again and the new price is written
+            for doc in books.docs.values():
+                doc["crawl_timestamp"] = (datetime.now() - timedelta(days=1)).isoformat()
+            stale = crawler()
+            await stale.url_index.load()
+            assert not await stale._is_known(url)
+            await stale._process_book(url)
+            await stale.writer.flush()
+
+        book = await books.find_one({"source_url": url})
+        assert book["price_incl_tax"] == 5.99
+        [change] = memory_db.changes.docs.values()
+        assert change["book_id"] == book["_id"]
+        assert {"field": "price_incl_tax", "old": 17.99, "new": 5.99} in change["changes"]
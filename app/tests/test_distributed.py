@@ -0,0 +1,255 @@
+import asyncio
+from collections import Counter
+import os
+import sys
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+import pytest_asyncio
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import PyMongoError
+
+from app.config import settings
+from app.crawler.crawler import BookCrawler
+from app.crawler.distributed import DistributedCrawl
+from app.crawler.work_queue import BOOK, DONE, FAILED, LISTING, RUN_ID, WorkQueue
+from app.crawler.writer import BookWriter
+from app.db import ensure_indexes
+from app.tests.test_crawler import SITE_URL, mock_site_pages
+
+ROOT_DIR = Path(__file__).resolve().parents[2]
+
+
+class MemoryQueue:
+    """``WorkQueue`` semantics over a dict; queues sharing ``items`` act as separate processes."""
+
+    def __init__(self, items: dict | None = None, owner: str = "worker-1", max_attempts: int = 3):
+        self.items = {} if items is None else items
+        self.owner = owner
+        self.max_attempts = max_attempts
+        self.run = "run-1"
+        self.acked: list[str] = []
+
+    async def join(self) -> bool:
+        return not self.items
+
+    async def add(self, items):
+        for item in items:
+            self.items.setdefault(item["url"], {**item, "_id": item["url"], "state": "pending", "attempts": 0})
+
+    async def lease(self):
+        await asyncio.sleep(0)
+        for item in sorted(self.items.values(), key=lambda item: item["kind"] == BOOK):
+            if item["state"] == "pending" and item["attempts"] < self.max_attempts:
+                item.update(state="leased", owner=self.owner, attempts=item["attempts"] + 1)
+                return dict(item)
+        return None
+
+    async def complete(self, items) -> int:
+        completed = 0
+        for item in items:
+            stored = self.items[item["_id"]]
+            if stored["state"] == "leased" and stored["owner"] == self.owner:
+                stored.update(state=DONE, completions=stored.get("completions", 0) + 1)
+                self.acked.append(item["url"])
+                completed += 1
+        return completed
+
+    async def release(self, item, error) -> bool:
+        stored = self.items[item["_id"]]
+        stored["state"] = FAILED if stored["attempts"] >= self.max_attempts else "pending"
+        return stored["state"] == FAILED
+
+    async def finish_if_drained(self) -> bool:
+        return not any(item["state"] in ("pending", "leased") for item in self.items.values())
+
+    async def counts(self) -> dict[str, int]:
+        return dict(Counter(item["state"] for item in self.items.values()))
+
+
+@pytest.fixture
+def book_parser():
+    parser = MagicMock()
+    parser.side_effect = lambda html, url, category: MagicMock(
+        parse_book=MagicMock(return_value=MagicMock(
+            name=url, source_url=url, category=category, row_html=None, snapshot_id=None,
+            model_dump=MagicMock(return_value={"source_url": url})
+        ))
+    )
+    return parser
+
+
+class TestDistributedCrawl:
+    async def _run(self, book_parser, queues, fail_once=(), written=None):
+        pages, failed = mock_site_pages(), set()
+        written = [] if written is None else written
+
+        async def fetch(url, allow_not_modified=False):
+            await asyncio.sleep(0)
+            if url in fail_once and url not in failed:
+                failed.add(url)
+                return None
+            return pages.get(url, "<html>book</html>")
+
+        async def bulk_write(operations, ordered=True):
+            written.extend(op._filter["source_url"] for op in operations)
+            return MagicMock(upserted_count=len(operations), modified_count=0)
+
+        crawls = []
+        for queue in queues:
+            crawler = BookCrawler(base_url=SITE_URL, session=MagicMock(), book_parser=book_parser,
+                                  writer=BookWriter(flush_interval=0))
+            crawls.append(DistributedCrawl(crawler, queue, workers=4, poll_interval=0.001, ack_interval=0.005))
+
+        with patch("app.crawler.writer.books_collection") as collection, \
+                patch("app.crawler.writer.BookRepository.invalidate", AsyncMock()):
+            collection.bulk_write = bulk_write
+            for crawl in crawls:
+                crawl.crawler.fetch = fetch
+                crawl.crawler._is_known = AsyncMock(return_value=False)
+                crawl.crawler.writer.assign_category = AsyncMock()
+            await asyncio.gather(*(crawl.run() for crawl in crawls))
+        return crawls, written
+
+    @pytest.mark.asyncio
+    async def test_every_book_is_crawled_once_with_its_category(self, book_parser):
+        queue = MemoryQueue()
+        (crawl,), written = await self._run(book_parser, [queue])
+
+        assert sorted(written) == sorted(set(written)) and len(written) == 50
+        parsed = {call.args[1]: call.args[2] for call in book_parser.call_args_list}
+        assert parsed[f"{SITE_URL}catalogue/book-3_3/index.html"] == "Poetry"
+        assert all(item["state"] == DONE and item["completions"] == 1 for item in queue.items.values())
+        assert sum(item["kind"] == LISTING for item in queue.items.values()) == 10
+        assert crawl.summary() == {"listings": 11, "books": 50, "acked": 50, "retried": 0, "failed": 0}
+
+    @pytest.mark.asyncio
+    async def test_books_are_acked_only_once_persisted(self, book_parser):
+        queue, written, persisted_at_ack = MemoryQueue(), [], []
+        complete = queue.complete
+
+        async def complete_after_write(items):
+            persisted_at_ack.append({item["url"] for item in items if item["kind"] == BOOK} <= set(written))
+            return await complete(items)
+
+        queue.complete = complete_after_write
+        await self._run(book_parser, [queue], written=written)
+
+        assert len(queue.acked) == 61 and all(persisted_at_ack)
+
+    @pytest.mark.asyncio
+    async def test_failed_fetch_is_retried(self, book_parser):
+        book = f"{SITE_URL}catalogue/book-7_7/index.html"
+        queue = MemoryQueue()
+        (crawl,), written = await self._run(book_parser, [queue], fail_once={book})
+
+        assert queue.items[book]["attempts"] == 2 and queue.items[book]["state"] == DONE
+        assert written.count(book) == 1
+        assert crawl.summary()["retried"] == 1
+
+    @pytest.mark.asyncio
+    async def test_two_processes_share_one_run(self, book_parser):
+        items = {}
+        queues = [MemoryQueue(items, owner="worker-1"), MemoryQueue(items, owner="worker-2")]
+        crawls, written = await self._run(book_parser, queues)
+
+        assert len(written) == 50 and len(set(written)) == 50
+        assert all(crawl.summary()["books"] > 0 for crawl in crawls)
+        assert all(item["completions"] == 1 for item in items.values())
+
+
+@pytest_asyncio.fixture
+async def queue_db():
+    """Throwaway database on the configured mongod; skipped without one."""
+    client = AsyncIOMotorClient(settings.MONGO_URL, serverSelectionTimeoutMS=500)
+    try:
+        await client.admin.command("ping")
+    except PyMongoError:
+        client.close()
+        pytest.skip("work queue checks need a reachable mongod")
+    database = client[f"{settings.DB_NAME}_crawl_queue"]
+    await client.drop_database(database.name)
+    await ensure_indexes(database)
+    yield database
+    await client.drop_database(database.name)
+    client.close()
+
+
+class TestWorkQueue:
+    @pytest.mark.asyncio
+    async def test_second_process_joins_the_active_run(self, queue_db):
+        first, second = WorkQueue(queue_db.crawl_queue, owner="a"), WorkQueue(queue_db.crawl_queue, owner="b")
+        assert await first.join() is True
+        assert await second.join() is False
+        assert first.run == second.run
+
+    @pytest.mark.asyncio
+    async def test_lease_is_exclusive_until_it_expires(self, queue_db):
+        first = WorkQueue(queue_db.crawl_queue, owner="a", visibility_timeout=0.2)
+        second = WorkQueue(queue_db.crawl_queue, owner="b", visibility_timeout=0.2)
+        await first.join()
+        await second.join()
+        await first.add([{"url": "http://x/1", "kind": BOOK, "category": "Travel"}] * 2)
+
+        item = await first.lease()
+        assert item["attempts"] == 1 and await second.lease() is None
+        await asyncio.sleep(0.3)
+        # the first worker "died"; its ack no longer counts once the item is leased again
+        retaken = await second.lease()
+        assert retaken["_id"] == item["_id"] and retaken["attempts"] == 2
+        assert await first.complete([item]) == 0
+        assert await second.complete([retaken]) == 1
+        assert await first.finish_if_drained() is True
+        assert (await queue_db.crawl_queue.find_one({"_id": RUN_ID}))["active"] is False
+
+    @pytest.mark.asyncio
+    async def test_item_is_parked_after_max_attempts(self, queue_db):
+        queue = WorkQueue(queue_db.crawl_queue, owner="a", max_attempts=1)
+        await queue.join()
+        await queue.add([{"url": "http://x/1", "kind": LISTING, "category": None}])
+
+        assert await queue.release(await queue.lease(), "fetch failed") is True
+        assert await queue.counts() == {FAILED: 1}
+        assert await queue.finish_if_drained() is True
+
+
+async def distributed_run(site_url: str, database, processes: int) -> float:
+    """Crawl ``site_url`` with ``processes`` crawler processes on one queue; returns the run's seconds."""
+    await database.client.drop_database(database.name)
+    await ensure_indexes(database)
+    env = {
+        **os.environ,
+        "BASE_URL": site_url,
+        "DB_NAME": database.name,
+        "CRAWL_MODE": "distributed",
+        "CRAWL_CONCURRENCY": "4",
+        "CRAWL_QUEUE_POLL_INTERVAL": "0.05",
+        "WRITER_FLUSH_INTERVAL": "0.2",
+        "HTTP_REVALIDATE": "false",
+    }
+    workers = [
+        await asyncio.create_subprocess_exec(
+            sys.executable, "-m", "app.crawler.crawler", cwd=ROOT_DIR, env=env,
+            stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL,
+        )
+        for _ in range(processes)
+    ]
+    assert await asyncio.gather(*(worker.wait() for worker in workers)) == [0] * processes
+    run = await database.crawl_queue.find_one({"_id": RUN_ID})
+    assert run["active"] is False
+    return (run["finished_at"] - run["started_at"]).total_seconds()
+
+
+class TestDistributedScaling:
+    @pytest.mark.asyncio
+    async def test_processes_scale_the_crawl_near_linearly(self, queue_db, book_site):
+        site = await book_site(pages=30, books_per_page=20, latency=0.05)
+        single = await distributed_run(site.base_url, queue_db, processes=1)
+        triple = await distributed_run(site.base_url, queue_db, processes=3)
+
+        items = await queue_db.crawl_queue.find({"state": {"$exists": True}}).to_list(None)
+        assert len(items) == 1 + 30 + 600
+        assert all(item["state"] == DONE and item["attempts"] == 1 for item in items)
+        assert await queue_db.books.count_documents({"source_url": {"$exists": True}}) == 600
+        assert single / triple >= 2.1
@@ -0,0 +1,150 @@
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import httpx
+import pytest
+
+from app.api.routes.crawling_router import get_crawl_progress
+from app.crawler.crawler import BookCrawler, create_session
+from app.crawler.metrics import CrawlMetrics, crawl_metrics
+from app.crawler.parser import BookParser
+from app.crawler.writer import BookWriter
+from app.utils.metrics import MetricsPublisher, MetricsRegistry, render
+
+
+def sample_lines(text: str, name: str) -> list[str]:
+    return [line for line in text.splitlines() if line.startswith(name)]
+
+
+USERS = {"user-key": {"username": "prometheus", "is_active": True}}
+
+
+class TestRegistry:
+    def test_prometheus_text_format(self):
+        registry = MetricsRegistry()
+        pages = registry.counter("pages_total", "Pages", ("result",))
+        ok = pages.labels("ok")
+        ok.inc()
+        ok.inc(2)
+        registry.gauge("depth", "Depth").labels().set_function(lambda: 7)
+        latency = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0)).labels()
+        for value in (0.05, 0.1, 0.5, 3.0):
+            latency.observe(value)
+
+        text = render({"api": registry.collect()})
+
+        assert "# TYPE pages_total counter" in text
+        assert 'pages_total{process="api",result="ok"} 3' in text
+        assert 'depth{process="api"} 7' in text
+        assert sample_lines(text, "latency_seconds_bucket") == [
+            'latency_seconds_bucket{process="api",le="0.1"} 2',
+            'latency_seconds_bucket{process="api",le="1"} 3',
+            'latency_seconds_bucket{process="api",le="+Inf"} 4',
+        ]
+        assert 'latency_seconds_count{process="api"} 4' in text
+
+    def test_children_are_bound_once(self):
+        registry = MetricsRegistry()
+        pages = registry.counter("pages_total", "Pages", ("result",))
+        assert pages.labels("ok") is pages.labels("ok")
+        assert registry.counter("pages_total", "Pages", ("result",)) is pages
+        with pytest.raises(ValueError):
+            pages.labels()
+        with pytest.raises(ValueError):
+            registry.gauge("pages_total", "Pages")
+
+    def test_processes_share_one_family_header(self):
+        registry = MetricsRegistry()
+        registry.counter("pages_total", "Pages").labels().inc()
+        families = registry.collect()
+
+        text = render({"api": families, "scheduler@host:1": families})
+
+        assert text.count("# TYPE pages_total counter") == 1
+        assert sample_lines(text, "pages_total") == [
+            'pages_total{process="api"} 1',
+            'pages_total{process="scheduler@host:1"} 1',
+        ]
+
+
+class TestPublisher:
+    @pytest.mark.asyncio
+    async def test_merges_other_processes_snapshots(self):
+        scheduler = MetricsRegistry()
+        scheduler.counter("pages_total", "Pages").labels().inc(5)
+        client = MagicMock()
+        client.zrangebyscore = AsyncMock(return_value=["scheduler@host:1"])
+        client.mget = AsyncMock(return_value=[json.dumps(scheduler.snapshot())])
+        redis = MagicMock(get_client=AsyncMock(return_value=client))
+
+        local = MetricsRegistry()
+        local.counter("pages_total", "Pages").labels().inc()
+        publisher = MetricsPublisher(local, role="api", redis=redis)
+        text = await publisher.render()
+
+        assert f'pages_total{{process="{publisher.process}"}} 1' in text
+        assert 'pages_total{process="scheduler@host:1"} 5' in text
+
+    @pytest.mark.asyncio
+    async def test_serves_this_process_when_redis_is_down(self):
+        redis = MagicMock(get_client=AsyncMock(side_effect=ConnectionError("redis down")))
+        registry = MetricsRegistry()
+        registry.counter("pages_total", "Pages").labels().inc()
+        publisher = MetricsPublisher(registry, redis=redis)
+
+        assert await publisher.publish() is False
+        assert list(await publisher.snapshots()) == [publisher.process]
+
+
+class TestMetricsEndpoint:
+    async def _get(self, headers: dict) -> httpx.Response:
+        from app.main import app
+
+        with patch("app.utils.security.api_key_cache.get", AsyncMock(side_effect=lambda key, load: USERS.get(key))), \
+                patch("app.api.routes.metrics_router.metrics_publisher.render", AsyncMock(return_value="up 1\n")):
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                return await client.get("/metrics", headers=headers)
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("headers", [{}, {"x-api-key": "wrong"}])
+    async def test_requires_an_api_key(self, headers):
+        response = await self._get(headers)
+        assert response.status_code == 401
+        assert "up 1" not in response.text
+
+    @pytest.mark.asyncio
+    async def test_serves_users(self):
+        response = await self._get({"x-api-key": "user-key"})
+        assert response.status_code == 200 and response.text == "up 1\n"
+
+
+class TestCrawlMetrics:
+    @pytest.mark.asyncio
+    async def test_crawl_reports_progress(self, memory_db, book_site):
+        site = await book_site(pages=2, books_per_page=5)
+        async with create_session() as session:
+            crawler = BookCrawler(base_url=site.base_url, session=session, book_parser=BookParser,
+                                  writer=BookWriter(flush_interval=0))
+            book_seconds = crawl_metrics.parse_book_seconds.count
+            await crawler.crawl()
+
+        status = crawl_metrics.status()
+        assert status["state"] == "finished"
+        # the home page, one listing page per category and the ten books
+        assert status["pages"] == {"ok": site.requests, "not_modified": 0, "failed": 0}
+        assert status["books"] == {"new": 10, "updated": 0, "unchanged": 0}
+        assert status["bytes"] > 0
+        assert crawl_metrics.parse_book_seconds.count - book_seconds == 10
+        assert crawl_metrics.write_seconds.count >= 1
+        assert crawl_metrics.running.get() == 0
+
+        progress = await get_crawl_progress()
+        assert progress["crawls"][0]["books"]["new"] == 10
+
+    def test_queue_gauges_follow_their_queues(self):
+        metrics = CrawlMetrics(MetricsRegistry())
+        queue = [1, 2, 3]
+        metrics.track_queues(frontier=lambda: len(queue))
+        assert metrics.queues["frontier"].get() == 3
+        metrics.untrack_queues()
+        assert metrics.queues["frontier"].get() == 0
@@ -0,0 +1,128 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from bson import ObjectId
+
+from app.utils import keyset_paginate, PaginationTotalEnum
+from app.utils.pagination import encode_cursor, decode_cursor, count_total
+
+
+def mock_collection(docs: list[dict], total: int = 0):
+    collection = MagicMock()
+    collection.name = "books"
+    collection.count_documents = AsyncMock(return_value=total)
+    cursor = collection.find.return_value.sort.return_value.limit.return_value
+    cursor.to_list = AsyncMock(side_effect=lambda length: [dict(doc) for doc in docs[:length]])
+    return collection
+
+
+class TestCursor:
+    def test_descending_sort_resumes_below_last_key(self):
+        last_id = ObjectId()
+        cursor = encode_cursor("rating", {"_id": last_id, "rating": "Four"})
+        assert decode_cursor(cursor, "rating") == {"$or": [
+            {"rating": {"$lt": "Four"}},
+            {"rating": "Four", "_id": {"$lt": last_id}},
+            {"rating": None},
+        ]}
+
+    def test_without_sort_resumes_after_id(self):
+        last_id = ObjectId()
+        assert decode_cursor(encode_cursor(None, {"_id": last_id}), None) == {"_id": {"$gt": last_id}}
+
+    def test_cursor_for_other_sort_is_rejected(self):
+        cursor = encode_cursor("rating", {"_id": ObjectId(), "rating": "Four"})
+        with pytest.raises(ValueError):
+            decode_cursor(cursor, "num_reviews")
+
+    @pytest.mark.parametrize("cursor", ["not-base64!", "eyJzIjpudWxsfQ=="])
+    def test_malformed_cursor_is_rejected(self, cursor):
+        with pytest.raises(ValueError):
+            decode_cursor(cursor, None)
+
+
+def matches(doc: dict, query: dict) -> bool:
+    """Mongo semantics for the filters ``decode_cursor`` builds; null matches missing fields."""
+    if "$or" in query:
+        return any(matches(doc, branch) for branch in query["$or"])
+    for field, condition in query.items():
+        value = doc.get(field)
+        if not isinstance(condition, dict):
+            if value != condition:
+                return False
+        elif "$ne" in condition:
+            if value == condition["$ne"]:
+                return False
+        elif value is None or not (value > condition["$gt"] if "$gt" in condition else value < condition["$lt"]):
+            return False
+    return True
+
+
+def mongo_sorted(docs: list[dict], sort_field: str, descending: bool) -> list[dict]:
+    # null and missing sort before any number
+    return sorted(docs, key=lambda doc: (doc.get(sort_field) is not None, doc.get(sort_field) or 0, doc["_id"]),
+                  reverse=descending)
+
+
+class TestKeysetPaginate:
+    @pytest.mark.parametrize("sort_field", ["price_incl_tax", "rating", "num_reviews"])
+    @pytest.mark.parametrize("descending", [True, False])
+    def test_walk_reaches_books_missing_the_sort_field(self, sort_field, descending):
+        docs = [{"_id": ObjectId(), sort_field: i % 3} for i in range(6)]
+        docs += [{"_id": ObjectId()}, {"_id": ObjectId(), sort_field: None}, {"_id": ObjectId()}]
+        ordered = mongo_sorted(docs, sort_field, descending)
+
+        seen, query = [], {}
+        with patch("app.utils.pagination.DESCENDING_SORTS", {sort_field} if descending else set()):
+            while True:
+                page = [doc for doc in ordered if matches(doc, query)][:2]
+                if not page:
+                    break
+                seen += page
+                query = decode_cursor(encode_cursor(sort_field, page[-1]), sort_field)
+
+        assert seen == ordered
+
+
+    @pytest.mark.asyncio
+    async def test_next_cursor_only_when_more_results(self):
+        docs = [{"_id": ObjectId(), "num_reviews": 10 - i} for i in range(3)]
+        collection = mock_collection(docs, total=3)
+
+        page = await keyset_paginate(collection, {}, limit=2, sort_field="num_reviews")
+        assert [book["num_reviews"] for book in page["results"]] == [10, 9]
+        assert decode_cursor(page["next_cursor"], "num_reviews")["$or"][1]["_id"] == {"$lt": docs[1]["_id"]}
+        collection.find.return_value.sort.assert_called_with([("num_reviews", -1), ("_id", -1)])
+
+        last = await keyset_paginate(mock_collection(docs[2:]), {}, limit=2, sort_field="num_reviews")
+        assert last["next_cursor"] is None
+
+    @pytest.mark.asyncio
+    async def test_cursor_is_anded_with_filter(self):
+        collection = mock_collection([])
+        cursor = encode_cursor(None, {"_id": ObjectId()})
+        await keyset_paginate(collection, {"category": "Travel"}, cursor=cursor)
+        query = collection.find.call_args.args[0]
+        assert query["$and"][0] == {"category": "Travel"}
+
+
+class TestCountTotal:
+    @pytest.mark.asyncio
+    async def test_none_skips_count(self):
+        collection = mock_collection([])
+        assert await count_total(collection, {}, PaginationTotalEnum.none) == (None, False)
+        collection.count_documents.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_estimated_is_capped(self):
+        collection = mock_collection([], total=100)
+        assert await count_total(collection, {}, PaginationTotalEnum.estimated, cap=100) == (100, False)
+        assert collection.count_documents.call_args.kwargs == {"limit": 100}
+
+    @pytest.mark.asyncio
+    async def test_cached_counts_once(self):
+        collection = mock_collection([], total=42)
+        cache = MagicMock(versioned_key=AsyncMock(return_value="count_books:v0:x"),
+                          get=AsyncMock(side_effect=[None, 42]), set=AsyncMock())
+        assert await count_total(collection, {}, PaginationTotalEnum.cached, cache) == (42, True)
+        assert await count_total(collection, {}, PaginationTotalEnum.cached, cache) == (42, True)
+        assert collection.count_documents.await_count == 1
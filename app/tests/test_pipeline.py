@@ -0,0 +1,118 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from app.crawler.crawler import BookCrawler
+from app.crawler.pipeline import CrawlPipeline
+from app.crawler.writer import BookWriter
+from app.tests.test_crawler import SITE_URL, mock_site_pages
+
+BASE_URL = "http://books.toscrape.com"
+
+
+def listing_html(page: int, pages: int, with_pager: bool = True) -> str:
+    prefix = "catalogue/" if page == 1 else ""
+    articles = "".join(
+        f'<article class="product_pod"><h3><a href="{prefix}book{page}-{i}.html">Book</a></h3></article>'
+        for i in range(3)
+    )
+    pager = f'<ul class="pager"><li class="current">Page {page} of {pages}</li></ul>' if with_pager else ""
+    next_link = f'<li class="next"><a href="{prefix}page-{page + 1}.html">next</a></li>' if page < pages else ""
+    return f"<html>{articles}{pager}{next_link}</html>"
+
+
+def make_site(pages: int, with_pager: bool = True) -> dict:
+    site = {BASE_URL: listing_html(1, pages, with_pager)}
+    for page in range(2, pages + 1):
+        site[f"{BASE_URL}/catalogue/page-{page}.html"] = listing_html(page, pages, with_pager)
+    return site
+
+
+@pytest.fixture
+def book_parser():
+    parser = MagicMock()
+    parser.side_effect = lambda html, url, category: MagicMock(
+        parse_book=MagicMock(return_value=MagicMock(
+            name=url, source_url=url, row_html=None, snapshot_id=None,
+            model_dump=MagicMock(return_value={"source_url": url})
+        ))
+    )
+    return parser
+
+
+class TestCrawlPipeline:
+    async def _run(self, site, book_parser, batch_size=100, categories=None, base_url=BASE_URL, follow_next=True):
+        crawler = BookCrawler(
+            base_url=base_url,
+            session=MagicMock(),
+            book_parser=book_parser,
+            writer=BookWriter(batch_size=batch_size, flush_interval=0.01),
+        )
+        fetched = []
+
+        async def fetch(url, allow_not_modified=False):
+            await asyncio.sleep(0)
+            fetched.append(url)
+            return site.get(url, "<html>book</html>")
+
+        parse_listing = crawler._parse_listing
+
+        async def parse_listing_without_next(html, page_url=None):
+            listing = await parse_listing(html, page_url)
+            return listing if follow_next else listing._replace(next_page=None)
+
+        with patch.object(crawler, "fetch", side_effect=fetch), \
+                patch.object(crawler, "_parse_listing", side_effect=parse_listing_without_next), \
+                patch.object(crawler, "_is_known", AsyncMock(return_value=False)), \
+                patch.object(crawler.writer, "assign_category", AsyncMock()), \
+                patch("app.crawler.writer.books_collection") as mock_collection:
+            mock_collection.bulk_write = AsyncMock()
+            pipeline = CrawlPipeline(crawler)
+            await pipeline.run(categories)
+        return pipeline, fetched, mock_collection
+
+    @pytest.mark.asyncio
+    async def test_seeds_pages_from_page_count(self, book_parser):
+        pipeline, fetched, mock_collection = await self._run(make_site(4), book_parser, batch_size=5)
+
+        listing_urls = [url for url in fetched if "page-" in url]
+        assert sorted(listing_urls) == [f"{BASE_URL}/catalogue/page-{n}.html" for n in range(2, 5)]
+        written = [op for call in mock_collection.bulk_write.call_args_list for op in call.args[0]]
+        assert len(written) == 12
+        assert all(len(call.args[0]) <= 5 for call in mock_collection.bulk_write.call_args_list)
+        assert pipeline.queue_depths() == {"listings": 0, "frontier": 0, "pages": 0, "books": 0}
+
+    @pytest.mark.asyncio
+    async def test_follows_next_links_without_pager(self, book_parser):
+        _, fetched, mock_collection = await self._run(make_site(3, with_pager=False), book_parser)
+
+        assert f"{BASE_URL}/catalogue/page-3.html" in fetched
+        written = [op for call in mock_collection.bulk_write.call_args_list for op in call.args[0]]
+        assert len(written) == 9
+
+    @pytest.mark.asyncio
+    async def test_categories_are_carried_to_the_parser(self, book_parser):
+        site = mock_site_pages()
+        _, fetched, mock_collection = await self._run(
+            site, book_parser, categories=["Poetry", "travel_2"], base_url=SITE_URL
+        )
+
+        parsed = {call.args[1]: call.args[2] for call in book_parser.call_args_list}
+        assert len(parsed) == 20
+        assert set(parsed.values()) == {"Travel", "Poetry"}
+        assert f"{SITE_URL}catalogue/category/books/poetry_5/page-2.html" in fetched
+        assert not any("/catalogue/page-" in url for url in fetched)
+
+    @pytest.mark.asyncio
+    async def test_category_pages_are_seeded_from_the_page_count(self, book_parser):
+        # without next links the category's other pages can only come from its pager
+        _, fetched, _ = await self._run(
+            mock_site_pages(), book_parser, categories=["Poetry", "travel_2"], base_url=SITE_URL, follow_next=False
+        )
+
+        listings = [url for url in fetched if "/category/" in url]
+        assert sorted(listings) == sorted(
+            f"{SITE_URL}catalogue/category/books/{slug}/{page}.html"
+            for slug in ("poetry_5", "travel_2") for page in ("index", "page-2")
+        )
+        parsed = {call.args[1] for call in book_parser.call_args_list}
+        assert len(parsed) == 20
@@ -0,0 +1,135 @@
+import pytest
+import pytest_asyncio
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, MagicMock
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import PyMongoError
+
+from app.config import settings
+from app.db import ensure_indexes
+from app.services import BookService, ChangeBookService
+from app.utils import BookSortEnum, keyset_paginate, search_paginate
+from app.utils.pagination import decode_cursor, encode_cursor
+
+SORTS = (None, *(sort.value for sort in BookSortEnum))
+CATEGORIES = (None, "Travel")
+
+
+@pytest_asyncio.fixture
+async def plan_db():
+    """Throwaway database on the configured mongod; the whole module is skipped without one."""
+    client = AsyncIOMotorClient(settings.MONGO_URL, serverSelectionTimeoutMS=500)
+    try:
+        await client.admin.command("ping")
+    except PyMongoError:
+        client.close()
+        pytest.skip("query plan checks need a reachable mongod")
+    database = client[f"{settings.DB_NAME}_query_plans"]
+    await client.drop_database(database.name)
+    books = [
+        {"source_url": f"http://books.toscrape.com/{i}", "category": ("Travel", "Poetry")[i % 2],
+         "name": f"Book {i} of the {('attic', 'garden', 'sea')[i % 3]}", "description": "A story told in verse.",
+         "price_incl_tax": float(i % 60), "rating": i % 5, "num_reviews": i % 7}
+        for i in range(500)
+    ]
+    for book in books[::50]:
+        # not filled in yet; keyset walks must still reach these
+        del book["price_incl_tax"], book["rating"]
+    changes = [
+        {**book, "book_id": i, "timestamp": datetime(2025, 1, 1 + i % 28, tzinfo=timezone.utc)}
+        for i, book in enumerate(books)
+    ]
+    await database.books.insert_many(books)
+    await database.change.insert_many(changes)
+    await ensure_indexes(database)
+    yield database
+    await client.drop_database(database.name)
+    client.close()
+
+
+def stages(plan: dict):
+    yield plan.get("stage")
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            yield from stages(plan[key])
+    for child in plan.get("inputStages", []):
+        yield from stages(child)
+
+
+async def assert_no_collscan(database, collection: str, query: dict, sort: str | None = None):
+    cursor = database[collection].find(query)
+    if sort:
+        cursor = cursor.sort(sort, -1)
+    find_plan = (await cursor.explain())["queryPlanner"]["winningPlan"]
+    count_plan = (await database.command("explain", {"count": collection, "query": query}))["queryPlanner"]["winningPlan"]
+    for plan in (find_plan, count_plan):
+        assert "COLLSCAN" not in set(stages(plan)), f"{collection} {query} sort={sort}: {plan}"
+
+
+async def captured_query(service_cls, method: str, category: str | None) -> dict:
+    """The exact filter the service hands to its repository for an API request."""
+    repo = MagicMock(find=AsyncMock(return_value={}))
+    await getattr(service_cls(repo), method)(category, 10, 50)
+    return repo.find.call_args.args[0]
+
+
+class TestQueryPlans:
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("category", CATEGORIES)
+    @pytest.mark.parametrize("sort", SORTS)
+    async def test_book_list_uses_index(self, plan_db, category, sort):
+        query = await captured_query(BookService, "get_books", category)
+        await assert_no_collscan(plan_db, "books", query, sort)
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("category", CATEGORIES)
+    @pytest.mark.parametrize("sort", SORTS)
+    async def test_change_list_uses_index(self, plan_db, category, sort):
+        query = await captured_query(ChangeBookService, "get_changes", category)
+        await assert_no_collscan(plan_db, "change", query, sort)
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("category", CATEGORIES)
+    @pytest.mark.parametrize("sort", SORTS)
+    async def test_keyset_page_uses_index(self, plan_db, category, sort):
+        query = await captured_query(BookService, "get_books", category)
+        last = await plan_db.books.find_one(query)
+        page_query = {"$and": [query, decode_cursor(encode_cursor(sort, last), sort)]}
+        await assert_no_collscan(plan_db, "books", page_query, sort)
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("sort", SORTS)
+    async def test_keyset_walk_returns_every_book_once(self, plan_db, sort):
+        query = await captured_query(BookService, "get_books", "Travel")
+        seen, cursor = [], None
+        while True:
+            page = await keyset_paginate(plan_db.books, query, limit=7, sort_field=sort, cursor=cursor)
+            seen += [book["_id"] for book in page["results"]]
+            cursor = page["next_cursor"]
+            if not cursor:
+                break
+        assert len(seen) == len(set(seen)) == await plan_db.books.count_documents(query)
+
+    @pytest.mark.asyncio
+    async def test_source_url_lookup_uses_index(self, plan_db):
+        await assert_no_collscan(plan_db, "books", {"source_url": {"$in": ["http://books.toscrape.com/1"]}})
+
+    @pytest.mark.asyncio
+    async def test_report_range_uses_index(self, plan_db):
+        start = datetime(2025, 1, 3, tzinfo=timezone.utc)
+        await assert_no_collscan(plan_db, "change", {"timestamp": {"$gte": start, "$lt": datetime(2025, 1, 4, tzinfo=timezone.utc)}})
+
+    @pytest.mark.asyncio
+    async def test_book_history_uses_index(self, plan_db):
+        await assert_no_collscan(plan_db, "change", {"book_id": 3}, "timestamp")
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("sort", SORTS)
+    async def test_search_uses_text_index(self, plan_db, sort):
+        query = {"$text": {"$search": "attic"}, "category": "Travel"}
+        plan = (await plan_db.books.find(query).explain())["queryPlanner"]["winningPlan"]
+        assert "TEXT_MATCH" in set(stages(plan)) and "COLLSCAN" not in set(stages(plan))
+
+        page = await search_paginate(plan_db.books, "attic", {"category": "Travel"}, limit=500, sort_field=sort)
+        assert page["total"] == len(page["results"]) == 84
+        assert all("attic" in book["name"] for book in page["results"])
@@ -0,0 +1,129 @@
+import gzip
+import json
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, patch
+
+import pytest
+import pytest_asyncio
+from fastapi import HTTPException
+
+from app.scheduler.rollup import build_daily_report, build_daily_reports
+from app.services import generate_report_service
+from app.services.report_service import accepts_gzip
+
+DAY = datetime(2025, 10, 15, tzinfo=timezone.utc)
+CHANGES = [
+    {"book_id": 1, "category": "Poetry", "timestamp": DAY, "changes": [
+        {"field": "price_incl_tax", "old": 53.74, "new": 51.77}, {"field": "availability", "old": 3, "new": 2},
+    ]},
+    {"book_id": 2, "category": "Travel", "timestamp": DAY, "changes": [
+        {"field": "price_incl_tax", "old": 20.0, "new": 18.5},
+    ]},
+    {"book_id": 3, "category": "Poetry", "timestamp": DAY, "changes": "Demo modification detected"},
+]
+
+
+def fake_iter_changes(changes: list[dict]):
+    calls = []
+
+    async def iter_changes(start, end):
+        calls.append((start, end))
+        for change in changes:
+            yield dict(change)
+
+    iter_changes.calls = calls
+    return iter_changes
+
+
+async def build(changes: list[dict]) -> dict:
+    with patch("app.scheduler.rollup.iter_changes", fake_iter_changes(changes)), \
+            patch("app.scheduler.rollup.ReportRepository.save", new_callable=AsyncMock) as save:
+        report = await build_daily_report(DAY + timedelta(hours=5))
+    save.assert_awaited_once_with(report)
+    return report
+
+
+class TestBuildDailyReport:
+    @pytest.mark.asyncio
+    async def test_counts_and_artifacts(self):
+        report = await build(CHANGES)
+
+        assert (report["_id"], report["total"]) == ("2025-10-15", 3)
+        assert report["by_category"] == {"Poetry": 2, "Travel": 1}
+        assert report["by_field"] == {"price_incl_tax": 2, "availability": 1}
+        data = json.loads(gzip.decompress(report["artifacts"]["json"]))
+        assert (data["date"], data["total"], data["results"][1]["book_id"]) == ("2025-10-15", 3, 2)
+        assert len(gzip.decompress(report["artifacts"]["ndjson"]).splitlines()) == 3
+        assert gzip.decompress(report["artifacts"]["csv"]).startswith(b"_id,book_id,")
+        assert len(set(report["etags"].values())) == 3
+
+    @pytest.mark.asyncio
+    async def test_empty_day_stores_only_the_count(self):
+        report = await build([])
+        assert report["total"] == 0 and "artifacts" not in report
+
+    @pytest.mark.asyncio
+    async def test_only_missing_days_are_built(self):
+        yesterday = (datetime.now(timezone.utc) - timedelta(days=1)).strftime("%Y-%m-%d")
+        with patch("app.scheduler.rollup.ReportRepository.existing_days", AsyncMock(return_value={yesterday})), \
+                patch("app.scheduler.rollup.build_daily_report",
+                      AsyncMock(side_effect=lambda day: {"_id": day.strftime("%Y-%m-%d"), "total": 0})) as build_day:
+            assert await build_daily_reports(lookback_days=3) == 2
+        assert yesterday not in {call.args[0].strftime("%Y-%m-%d") for call in build_day.await_args_list}
+
+
+class TestMaterializedReport:
+    @pytest_asyncio.fixture
+    async def stored(self):
+        report = await build(CHANGES)
+        live = fake_iter_changes(CHANGES)
+        with patch("app.services.report_service.ReportRepository.get", AsyncMock(return_value=report)), \
+                patch("app.services.report_service.iter_changes", live):
+            yield report, live
+
+    @pytest.mark.asyncio
+    async def test_past_day_is_served_from_the_artifact(self, stored):
+        report, live = stored
+        response = await generate_report_service("json", "2025-10-15")
+
+        assert json.loads(response.body)["total"] == 3
+        assert response.headers["etag"] == report["etags"]["json"]
+        assert not live.calls
+
+    @pytest.mark.asyncio
+    async def test_matching_etag_is_304(self, stored):
+        report, _ = stored
+        response = await generate_report_service("csv", "2025-10-15", if_none_match=f'"x", {report["etags"]["csv"]}')
+        assert response.status_code == 304 and not response.body
+
+    @pytest.mark.asyncio
+    async def test_gzip_clients_get_the_stored_bytes(self, stored):
+        report, _ = stored
+        response = await generate_report_service("ndjson", "2025-10-15", accept_encoding="gzip, deflate")
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.body == bytes(report["artifacts"]["ndjson"])
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("accept_encoding", [None, "gzip;q=0, deflate", "br, *;q=0", "identity", "gzipped"])
+    async def test_clients_refusing_gzip_get_the_plain_body(self, stored, accept_encoding):
+        report, _ = stored
+        response = await generate_report_service("ndjson", "2025-10-15", accept_encoding=accept_encoding)
+        assert "content-encoding" not in response.headers
+        assert response.body == gzip.decompress(report["artifacts"]["ndjson"])
+
+    @pytest.mark.parametrize("accept_encoding", ["gzip", "GZIP;q=0.5", "br, *", "deflate;q=1, gzip ; q=0.1"])
+    def test_gzip_accepted(self, accept_encoding):
+        assert accepts_gzip(accept_encoding)
+
+    @pytest.mark.asyncio
+    async def test_ranges_are_computed_live(self, stored):
+        _, live = stored
+        response = await generate_report_service("json", from_str="2025-10-14", to_str="2025-10-15")
+        assert "etag" not in response.headers and len(live.calls) == 1
+
+    @pytest.mark.asyncio
+    async def test_empty_materialized_day_is_404(self):
+        with patch("app.services.report_service.ReportRepository.get", AsyncMock(return_value={"total": 0})):
+            with pytest.raises(HTTPException) as exc:
+                await generate_report_service("json", "2025-10-15")
+        assert exc.value.status_code == 404
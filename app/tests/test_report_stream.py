@@ -0,0 +1,156 @@
+import csv
+import io
+import json
+import os
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+from app.services import generate_report_service
+from app.services.report_service import REPORT_COLUMNS, report_range
+
+START = datetime(2025, 10, 15, tzinfo=timezone.utc)
+
+
+class SyntheticCursor:
+    """Motor-like cursor yielding ``count`` change records without holding them."""
+
+    def __init__(self, count: int):
+        self.count = count
+        self.closed = False
+
+    def sort(self, *args):
+        return self
+
+    def batch_size(self, size):
+        return self
+
+    async def close(self):
+        self.closed = True
+
+    async def __aiter__(self):
+        book_id = ObjectId()
+        for i in range(self.count):
+            yield {
+                "_id": ObjectId(),
+                "book_id": book_id,
+                "source_url": f"https://books.toscrape.com/catalogue/book_{i}/index.html",
+                "name": f"Book {i}",
+                "category": "Poetry",
+                "price_incl_tax": 51.77,
+                "rating": "Three",
+                "num_reviews": i % 50,
+                "timestamp": START + timedelta(seconds=i % 86_400),
+                "changes": [{"field": "price_incl_tax", "old": 53.74, "new": 51.77}],
+            }
+
+
+def changes_collection(count: int) -> MagicMock:
+    collection = MagicMock()
+    collection.find.return_value = SyntheticCursor(count)
+    return collection
+
+
+@pytest.fixture(autouse=True)
+def no_materialized_reports():
+    with patch("app.services.report_service.ReportRepository.get", AsyncMock(return_value=None)) as get:
+        yield get
+
+
+async def body(response) -> bytes:
+    chunks = [chunk async for chunk in response.body_iterator]
+    return b"".join(chunk if isinstance(chunk, bytes) else chunk.encode() for chunk in chunks)
+
+
+def rss() -> int:
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+async def drain(response) -> tuple[int, int]:
+    """Bytes streamed and the highest RSS seen while streaming them."""
+    size, peak = 0, rss()
+    async for chunk in response.body_iterator:
+        size += len(chunk)
+        peak = max(peak, rss())
+    return size, peak
+
+
+class TestReportRange:
+    def test_to_is_inclusive(self):
+        start, end = report_range(from_str="2025-10-01", to_str="2025-10-31")
+        assert (start.day, end) == (1, datetime(2025, 11, 1, tzinfo=timezone.utc))
+
+    @pytest.mark.parametrize("kwargs", [
+        {"from_str": "2025-10-02", "to_str": "2025-10-01"},
+        {"date_str": "2025-10-01", "to_str": "2025-10-02"},
+        {"date_str": "2025/10/01"},
+    ])
+    def test_invalid_ranges_are_rejected(self, kwargs):
+        with pytest.raises(HTTPException) as exc:
+            report_range(**kwargs)
+        assert exc.value.status_code == 400
+
+
+class TestStreamingReport:
+    @pytest.mark.asyncio
+    async def test_json_is_one_document(self):
+        with patch("app.db.repositories.report_repository.changes_collection", changes_collection(1234)):
+            response = await generate_report_service("json", "2025-10-15")
+            data = json.loads(await body(response))
+
+        assert (data["date"], data["from"], data["to"], data["total"]) == ("2025-10-15", "2025-10-15", "2025-10-15", 1234)
+        assert len(data["results"]) == 1234
+        assert data["results"][0]["timestamp"] == "2025-10-15T00:00:00+00:00"
+        assert ObjectId.is_valid(data["results"][0]["_id"])
+
+    @pytest.mark.asyncio
+    async def test_ndjson_has_one_record_per_line(self):
+        with patch("app.db.repositories.report_repository.changes_collection", changes_collection(501)):
+            response = await generate_report_service("ndjson", from_str="2025-10-01", to_str="2025-10-31")
+            lines = (await body(response)).splitlines()
+
+        assert len(lines) == 501 and json.loads(lines[-1])["name"] == "Book 500"
+
+    @pytest.mark.asyncio
+    async def test_csv_uses_fixed_columns(self):
+        collection = changes_collection(3)
+        with patch("app.db.repositories.report_repository.changes_collection", collection):
+            response = await generate_report_service("csv", from_str="2025-10-01", to_str="2025-10-31")
+            rows = list(csv.reader(io.StringIO((await body(response)).decode())))
+
+        assert tuple(rows[0]) == REPORT_COLUMNS and len(rows) == 4
+        assert ObjectId.is_valid(rows[1][0])
+        assert json.loads(rows[1][-1]) == [{"field": "price_incl_tax", "old": 53.74, "new": 51.77}]
+        assert "book_changes_2025_10_01_to_2025_10_31.csv" in response.headers["content-disposition"]
+        assert collection.find.call_args.args[0] == {"timestamp": {
+            "$gte": datetime(2025, 10, 1, tzinfo=timezone.utc), "$lt": datetime(2025, 11, 1, tzinfo=timezone.utc)
+        }}
+        assert collection.find.return_value.closed
+
+    @pytest.mark.asyncio
+    async def test_empty_range_is_404(self):
+        with patch("app.db.repositories.report_repository.changes_collection", changes_collection(0)):
+            with pytest.raises(HTTPException) as exc:
+                await generate_report_service("csv", "2025-10-15")
+        assert exc.value.status_code == 404
+
+    @pytest.mark.asyncio
+    @pytest.mark.skipif(not os.path.exists("/proc/self/statm"), reason="needs /proc to read RSS")
+    @pytest.mark.parametrize("format", ["json", "csv"])
+    async def test_peak_rss_stays_flat_for_a_million_changes(self, format):
+        async def stream(count: int) -> tuple[int, int]:
+            with patch("app.db.repositories.report_repository.changes_collection", changes_collection(count)):
+                before = rss()
+                size, peak = await drain(await generate_report_service(format, from_str="2025-10-01", to_str="2025-10-31"))
+                return size, peak - before
+
+        small_size, _ = await stream(10_000)
+        size, growth = await stream(1_000_000)
+
+        # roughly 300MB of output; holding it (or the records) in memory would grow RSS by far more than this
+        assert size > 100 * small_size
+        assert growth < 16 * 1024 * 1024
@@ -0,0 +1,144 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from app.crawler.crawler import BookCrawler
+from app.crawler.dedup import UrlIndex
+from app.crawler.parser import BookParser
+from app.crawler.revalidation import NOT_MODIFIED, BodyStore, Revalidator
+from app.tests.test_crawler import serve_body
+
+URL = "http://books.toscrape.com/catalogue/book1/index.html"
+HTML = "<html><h1>Book 1</h1></html>"
+
+
+def make_response(status, text="", headers=None):
+    response = AsyncMock()
+    response.status = status
+    serve_body(response, text)
+    response.headers = headers or {}
+    return response
+
+
+@pytest.fixture
+def mock_session():
+    session = MagicMock()
+    session.get = MagicMock()
+    return session
+
+
+class TestRevalidation:
+    @pytest.mark.asyncio
+    async def test_304_is_reported_as_not_modified(self, mock_session):
+        crawler = BookCrawler(session=mock_session, book_parser=BookParser, revalidator=Revalidator())
+        mock_session.get.return_value.__aenter__.side_effect = [
+            make_response(200, HTML, {"ETag": '"v1"', "Last-Modified": "Wed, 15 Oct 2025 00:00:00 GMT"}),
+            make_response(304),
+        ]
+
+        assert await crawler.fetch(URL, allow_not_modified=True) == HTML
+        crawler.revalidator.commit([URL])  # as the writer does once the book is stored
+        assert await crawler.fetch(URL, allow_not_modified=True) is NOT_MODIFIED
+
+        conditional_headers = mock_session.get.call_args_list[1].kwargs["headers"]
+        assert conditional_headers == {
+            "If-None-Match": '"v1"',
+            "If-Modified-Since": "Wed, 15 Oct 2025 00:00:00 GMT",
+        }
+        summary = crawler.revalidator.summary()
+        assert summary["requests_avoided"] == 1
+        assert summary["bytes_saved"] == len(HTML)
+
+    @pytest.mark.asyncio
+    async def test_identical_body_counts_as_unchanged(self, mock_session):
+        crawler = BookCrawler(session=mock_session, book_parser=BookParser, revalidator=Revalidator())
+        mock_session.get.return_value.__aenter__.return_value = make_response(200, HTML)
+
+        assert await crawler.fetch(URL, allow_not_modified=True) == HTML
+        crawler.revalidator.commit([URL])
+        assert await crawler.fetch(URL, allow_not_modified=True) is NOT_MODIFIED
+        assert crawler.revalidator.summary()["unchanged_bodies"] == 1
+
+    @pytest.mark.asyncio
+    async def test_unchanged_book_page_refreshes_its_crawl_timestamp(self, mock_session):
+        crawler = BookCrawler(session=mock_session, book_parser=BookParser, revalidator=Revalidator(),
+                              url_index=UrlIndex())
+        mock_session.get.return_value.__aenter__.side_effect = [make_response(200, HTML, {"ETag": '"v1"'}),
+                                                                make_response(304)]
+        await crawler.fetch(URL, allow_not_modified=True)
+        crawler.revalidator.commit([URL])
+
+        with patch("app.crawler.crawler.books_collection") as collection:
+            collection.update_one = AsyncMock()
+            await crawler._process_book(URL)
+
+        query, update = collection.update_one.call_args.args
+        assert query == {"source_url": URL}
+        assert list(update["$set"]) == ["crawl_timestamp"]
+        assert crawler.writer.buffered() == 0
+        assert crawler.url_index.seen(URL)
+
+    @pytest.mark.asyncio
+    async def test_listing_page_served_from_body_store(self, mock_session, tmp_path):
+        crawler = BookCrawler(
+            session=mock_session, book_parser=BookParser, revalidator=Revalidator(BodyStore(tmp_path))
+        )
+        mock_session.get.return_value.__aenter__.side_effect = [
+            make_response(200, HTML, {"ETag": '"v1"'}),
+            make_response(304),
+        ]
+
+        assert await crawler.fetch(URL) == HTML
+        assert await crawler.fetch(URL) == HTML
+        assert len(list(tmp_path.rglob("*.gz"))) == 1
+
+    @pytest.mark.asyncio
+    async def test_body_store_serves_bytes_to_the_bytes_path(self, tmp_path):
+        revalidator = Revalidator(BodyStore(tmp_path))
+        assert not await revalidator.record(URL, {"ETag": '"v1"'}, HTML.encode())
+        assert await revalidator.record(URL, {"ETag": '"v1"'}, HTML)
+
+        assert await revalidator.not_modified(URL, need_body=True, as_bytes=True) == HTML.encode()
+        assert await revalidator.not_modified(URL, need_body=True) == HTML
+
+    @pytest.mark.asyncio
+    async def test_save_persists_validators(self, mock_session):
+        revalidator = Revalidator()
+        await revalidator.record(URL, {"ETag": '"v1"'}, HTML)
+
+        with patch("app.crawler.revalidation.http_cache_collection") as mock_collection:
+            mock_collection.bulk_write = AsyncMock()
+            await revalidator.save()
+
+        operations = mock_collection.bulk_write.call_args.args[0]
+        assert len(operations) == 1
+        assert operations[0]._filter == {"_id": URL}
+
+    @pytest.mark.asyncio
+    async def test_book_page_validators_wait_for_the_writer(self, mock_session):
+        crawler = BookCrawler(session=mock_session, book_parser=BookParser, revalidator=Revalidator())
+        mock_session.get.return_value.__aenter__.return_value = make_response(200, HTML, {"ETag": '"v1"'})
+        await crawler.fetch(URL, allow_not_modified=True)
+
+        assert crawler.revalidator.conditional_headers(URL, need_body=False) == {}
+        with patch.object(crawler.writer, "_write", AsyncMock()):
+            await crawler.writer.add(MagicMock(source_url=URL, row_html=None))
+            await crawler.writer.flush()
+        assert crawler.revalidator.conditional_headers(URL, need_body=False) == {"If-None-Match": '"v1"'}
+
+    @pytest.mark.asyncio
+    async def test_failed_write_does_not_save_the_new_validators(self, mock_session):
+        crawler = BookCrawler(session=mock_session, book_parser=BookParser, revalidator=Revalidator())
+        mock_session.get.return_value.__aenter__.return_value = make_response(200, HTML, {"ETag": '"v1"'})
+        await crawler.fetch(URL, allow_not_modified=True)
+        await crawler.fetch("http://books.toscrape.com/index.html")
+
+        with patch.object(crawler.writer, "_write", AsyncMock(side_effect=Exception("lost connection"))), \
+                patch("app.crawler.crawler.crawl_metrics"), \
+                patch("app.crawler.revalidation.http_cache_collection") as collection:
+            collection.bulk_write = AsyncMock()
+            await crawler.writer.add(MagicMock(source_url=URL, row_html=None))
+            with pytest.raises(Exception, match="lost connection"):
+                await crawler._end_run()
+
+        # the listing page is saved; the book page is fetched and processed again next crawl
+        operations = collection.bulk_write.call_args.args[0]
+        assert [operation._filter for operation in operations] == [{"_id": "http://books.toscrape.com/index.html"}]
@@ -1,14 +1,123 @@
+import asyncio
+from datetime import datetime, timezone
+
 import pytest
-from unittest.mock import AsyncMock, patch
-from app.scheduler.scheduler import daily_job_async
+from unittest.mock import AsyncMock, MagicMock, patch
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from bson import ObjectId
+from app.crawler.changes import content_hash
+from app.scheduler.detector import detect_changes
+from app.scheduler.scheduler import add_daily_job, daily_job, daily_job_async
+from app.utils import JobRunStatusEnum
+
+@pytest.fixture
+def job_runs():
+    with patch("app.scheduler.scheduler.JobRunRepository") as runs:
+        runs.start = AsyncMock(return_value=ObjectId())
+        runs.finish = AsyncMock()
+        runs.skipped = AsyncMock()
+        yield runs
+
 
 @pytest.mark.asyncio
 async def test_daily_job_async():
-    with patch("app.scheduler.scheduler.BookCrawler") as MockCrawler, \
-         patch("app.scheduler.scheduler.detect_changes", new_callable=AsyncMock) as mock_detect:
-
-        mock_crawler_instance = MockCrawler.return_value
-        mock_crawler_instance.crawl = AsyncMock()
-        await daily_job_async()
-        mock_crawler_instance.crawl.assert_called_once()
-        mock_detect.assert_called_once()
+    session = MagicMock()
+    with patch("app.scheduler.scheduler.run_crawl", new_callable=AsyncMock) as mock_crawl, \
+         patch("app.scheduler.scheduler.detect_changes", new_callable=AsyncMock) as mock_detect, \
+         patch("app.scheduler.scheduler.build_daily_reports", new_callable=AsyncMock) as mock_reports:
+        mock_crawl.return_value = {"writer": {"books": 20}}
+        mock_detect.return_value = 2
+        mock_reports.return_value = 1
+
+        counts = await daily_job_async(session)
+
+    mock_crawl.assert_awaited_once_with(session)
+    mock_detect.assert_awaited_once()
+    mock_reports.assert_awaited_once()
+    assert counts == {"crawl": {"writer": {"books": 20}}, "changes": 2, "reports": 1}
+
+
+@pytest.mark.asyncio
+async def test_overlapping_run_is_skipped(job_runs):
+    release = asyncio.Event()
+
+    async def slow_job(session):
+        await release.wait()
+        return {"changes": 0}
+
+    with patch("app.scheduler.scheduler.daily_job_async", slow_job):
+        first = asyncio.create_task(daily_job(MagicMock()))
+        await asyncio.sleep(0)
+        assert await daily_job(MagicMock()) is None
+        release.set()
+        assert await first == {"changes": 0}
+
+    job_runs.skipped.assert_awaited_once()
+    assert job_runs.finish.call_args.args[1] == JobRunStatusEnum.success and job_runs.finish.call_args.kwargs == {"changes": 0}
+
+
+@pytest.mark.asyncio
+async def test_failed_run_is_recorded(job_runs):
+    with patch("app.scheduler.scheduler.daily_job_async", AsyncMock(side_effect=RuntimeError("site down"))):
+        with pytest.raises(RuntimeError):
+            await daily_job(MagicMock())
+    assert job_runs.finish.call_args.args[1] == JobRunStatusEnum.failed
+    assert "site down" in job_runs.finish.call_args.kwargs["error"]
+
+
+@pytest.mark.asyncio
+async def test_scheduled_job_is_awaited_on_the_running_loop(job_runs):
+    done = asyncio.Event()
+
+    async def job(session):
+        done.set()
+        return {}
+
+    test_scheduler = AsyncIOScheduler(timezone="UTC")
+    with patch("app.scheduler.scheduler.daily_job_async", job):
+        add_daily_job(test_scheduler, MagicMock(), "date", run_date=datetime.now(timezone.utc))
+        test_scheduler.start()
+        try:
+            await asyncio.wait_for(done.wait(), timeout=5)
+        finally:
+            test_scheduler.shutdown(wait=False)
+    job_runs.start.assert_awaited_once()
+
+
+class AsyncCursor:
+    def __init__(self, docs):
+        self.docs = iter(docs)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self.docs)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+@pytest.mark.asyncio
+async def test_detect_changes_batches_only_real_changes():
+    unchanged = {"_id": ObjectId(), "source_url": "a", "price_incl_tax": 10.0}
+    unchanged["content_hash"] = content_hash(unchanged)
+    modified = {"_id": ObjectId(), "source_url": "b", "price_incl_tax": 10.0, "content_hash": "stale"}
+    legacy = {"_id": ObjectId(), "source_url": "c", "price_incl_tax": 10.0}
+
+    with patch("app.scheduler.detector.books_collection") as books, \
+            patch("app.scheduler.detector.changes_collection") as changes, \
+            patch("app.scheduler.detector.BookRepository.invalidate", new_callable=AsyncMock) as invalidate_books, \
+            patch("app.scheduler.detector.ChangeBookRepository.invalidate", new_callable=AsyncMock):
+        books.find = MagicMock(return_value=AsyncCursor([unchanged, modified, legacy]))
+        books.bulk_write = AsyncMock()
+        changes.insert_many = AsyncMock()
+
+        recorded = await detect_changes()
+
+    assert recorded == 1
+    books.bulk_write.assert_called_once()
+    assert len(books.bulk_write.call_args.args[0]) == 2
+    changes.insert_many.assert_called_once()
+    assert changes.insert_many.call_args.args[0][0]["book_id"] == modified["_id"]
+    invalidate_books.assert_awaited_once_with([modified["_id"]])
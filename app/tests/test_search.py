@@ -0,0 +1,85 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from bson import ObjectId
+from starlette.routing import Match
+
+from app.db.repositories.book_repository import BookRepository
+from app.services import BookService
+from app.utils import normalize_search_query, search_paginate
+from app.utils.search import TEXT_SCORE
+
+
+def mock_collection(docs: list[dict], total: int):
+    collection = MagicMock()
+    collection.name = "books"
+    collection.count_documents = AsyncMock(return_value=total)
+    cursor = collection.find.return_value.sort.return_value.skip.return_value.limit.return_value
+    cursor.to_list = AsyncMock(side_effect=lambda length: [dict(doc) for doc in docs[:length]])
+    return collection
+
+
+class TestNormalize:
+    @pytest.mark.parametrize("text", ["Light attic", "  ATTIC   light ", "attic light light"])
+    def test_equivalent_queries_normalize_alike(self, text):
+        assert normalize_search_query(text) == "attic light"
+
+    def test_phrases_keep_their_order(self):
+        assert normalize_search_query('"In the  Attic" Light') == '"in the attic" light'
+
+    @pytest.mark.parametrize("text", ["   ", '""', "-"])
+    def test_empty_query_is_rejected(self, text):
+        with pytest.raises(ValueError):
+            normalize_search_query(text)
+
+
+class TestSearchPaginate:
+    @pytest.mark.asyncio
+    async def test_relevance_order_with_filter(self):
+        docs = [{"_id": ObjectId(), "name": "A Light in the Attic", "score": 6.2}]
+        collection = mock_collection(docs, total=1)
+
+        page = await search_paginate(collection, "attic", {"category": "Poetry"}, projection={"row_html": 0})
+
+        query = {"$text": {"$search": "attic"}, "category": "Poetry"}
+        collection.find.assert_called_once_with(query, {"row_html": 0, "score": TEXT_SCORE})
+        collection.find.return_value.sort.assert_called_once_with([("score", TEXT_SCORE), ("_id", 1)])
+        collection.count_documents.assert_awaited_once_with(query, limit=10_000)
+        assert page["results"][0]["_id"] == str(docs[0]["_id"])
+        assert page["total"] == 1 and page["total_exact"] and page["next"] is None
+
+    @pytest.mark.asyncio
+    async def test_sort_field_comes_before_relevance(self):
+        collection = mock_collection([], total=0)
+        await search_paginate(collection, "attic", {}, sort_field="price_incl_tax")
+        collection.find.return_value.sort.assert_called_once_with(
+            [("price_incl_tax", -1), ("score", TEXT_SCORE), ("_id", 1)]
+        )
+
+    @pytest.mark.asyncio
+    async def test_capped_count_still_offers_the_next_page(self):
+        docs = [{"_id": ObjectId()} for _ in range(2)]
+        page = await search_paginate(mock_collection(docs, total=2), "the", {}, skip=0, limit=2, count_cap=2)
+        assert page["total_exact"] is False
+        assert page["next"] == 2
+
+
+class TestSearchBooks:
+    @pytest.mark.asyncio
+    async def test_equivalent_searches_share_a_cache_key(self):
+        cache = MagicMock(versioned_key=AsyncMock(side_effect=lambda *args, **kwargs: repr(kwargs)),
+                          get_or_load=AsyncMock(return_value={}))
+        service = BookService(BookRepository())
+        with patch("app.db.repositories.book_repository.cache", cache):
+            await service.search_books("Light Attic", category="Poetry")
+            await service.search_books("attic  LIGHT", category="Poetry")
+            await service.search_books("attic light")
+
+        keys = [call.args[0] for call in cache.get_or_load.await_args_list]
+        assert keys[0] == keys[1] != keys[2]
+
+    def test_search_is_not_taken_for_a_book_id(self):
+        from app.main import app
+
+        scope = {"type": "http", "path": "/api/books/search", "method": "GET"}
+        route = next(route for route in app.routes if route.matches(scope)[0] == Match.FULL)
+        assert route.name == "search_books"
@@ -0,0 +1,179 @@
+import asyncio
+import random
+import time
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.crawler.crawler import BookCrawler, create_session
+from app.crawler.throttle import FetchController, HostLimiter, backoff_delay, classify, parse_retry_after
+from app.tests.test_crawler import serve_body
+from app.tests.conftest import MockBookSite
+
+
+def response(status: int, headers: dict | None = None, text: str = "<html></html>"):
+    resp = AsyncMock()
+    resp.status = status
+    resp.headers = headers or {}
+    serve_body(resp, text)
+    return resp
+
+
+def crawler_with(responses, **controller_options):
+    session = MagicMock()
+    session.get.return_value.__aenter__.side_effect = responses
+    controller = FetchController(backoff_base=0.01, **controller_options)
+    return BookCrawler(base_url="http://books.toscrape.com", session=session, controller=controller), session
+
+
+async def settle(limiter: HostLimiter, outcome: str, latency: float = 0.01, times: int = 1, retry_after=None):
+    for _ in range(times):
+        await limiter.acquire()
+        await limiter.release(time.monotonic() - latency, outcome, retry_after)
+
+
+class TestRetryPolicy:
+    def test_statuses(self):
+        assert [classify(code, None) for code in (404, 410, 403, 400)] == ["permanent"] * 4
+        assert [classify(code, None) for code in (408, 500, 502, 503)] == ["error"] * 4
+        assert classify(429, None) == classify(503, 2.0) == "throttled"
+
+    def test_retry_after_seconds_and_http_date(self):
+        assert parse_retry_after("7") == 7.0
+        assert parse_retry_after(None) is None and parse_retry_after("soon") is None
+        later = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+        assert 28 <= parse_retry_after(later) <= 30
+        assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+
+    def test_backoff_is_exponential_with_full_jitter(self):
+        random.seed(7)
+        delays = [backoff_delay(3, base=0.5, cap=30) for _ in range(200)]
+        assert all(0 <= delay <= 4.0 for delay in delays)
+        assert max(delays) > 3.0 and min(delays) < 1.0
+        assert all(backoff_delay(20, base=0.5, cap=30) <= 30 for _ in range(50))
+
+
+class TestHostLimiter:
+    @pytest.mark.asyncio
+    async def test_slow_start_then_multiplicative_decrease_then_additive_increase(self):
+        limiter = HostLimiter("h", initial_limit=4, max_limit=64)
+        await settle(limiter, "ok", times=10)
+        assert limiter.limit == 14
+
+        await settle(limiter, "throttled", times=2)
+        # one decrease per round trip, however many throttled answers arrive together
+        assert limiter.limit == 7 and limiter.stats.decreases == 1
+
+        await settle(limiter, "ok", times=7)
+        assert 7.9 < limiter.limit < 8.1
+
+    @pytest.mark.asyncio
+    async def test_latency_above_tolerance_decreases(self):
+        limiter = HostLimiter("h", initial_limit=8, max_limit=64, latency_tolerance=2.0)
+        await settle(limiter, "ok", latency=0.01, times=5)
+        peak = limiter.limit
+        await settle(limiter, "ok", latency=0.2, times=3)
+        assert limiter.limit < peak and limiter.stats.decreases >= 1
+
+    @pytest.mark.asyncio
+    async def test_limit_caps_requests_in_flight(self):
+        limiter = HostLimiter("h", initial_limit=2, max_limit=2)
+        await limiter.acquire()
+        await limiter.acquire()
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(limiter.acquire(), 0.05)
+
+    @pytest.mark.asyncio
+    async def test_fixed_limit_without_adaptation(self):
+        limiter = HostLimiter("h", initial_limit=2, max_limit=16, adaptive=False)
+        await settle(limiter, "throttled")
+        assert limiter.limit == 16
+
+    @pytest.mark.asyncio
+    async def test_retry_after_pauses_the_host(self):
+        limiter = HostLimiter("h", breaker_failures=100)
+        await settle(limiter, "throttled", retry_after=0.2)
+        started = time.monotonic()
+        await limiter.acquire()
+        assert time.monotonic() - started >= 0.19
+
+    @pytest.mark.asyncio
+    async def test_breaker_opens_then_lets_one_probe_through(self):
+        limiter = HostLimiter("h", initial_limit=8, breaker_failures=3, breaker_cooldown=0.1)
+        await settle(limiter, "error", times=3)
+        assert limiter.stats.breaker_opened == 1
+
+        started = time.monotonic()
+        probe = await limiter.acquire()
+        assert time.monotonic() - started >= 0.09
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(limiter.acquire(), 0.05)
+
+        await limiter.release(probe, "ok")
+        await asyncio.wait_for(limiter.acquire(), 0.05)
+        await asyncio.wait_for(limiter.acquire(), 0.05)
+
+    @pytest.mark.asyncio
+    async def test_failed_probe_reopens_for_longer(self):
+        limiter = HostLimiter("h", breaker_failures=1, breaker_cooldown=0.05)
+        # in flight before the breaker opened, so it does not count as the probe
+        early = await limiter.acquire()
+        await settle(limiter, "error")
+        await limiter.release(early, "error")
+        assert limiter.stats.breaker_opened == 1
+
+        await settle(limiter, "error")
+        assert limiter.stats.breaker_opened == 2
+        started = time.monotonic()
+        await limiter.acquire()
+        assert time.monotonic() - started >= 0.09
+
+
+class TestFetchRetries:
+    @pytest.mark.asyncio
+    async def test_permanent_4xx_is_not_retried(self):
+        crawler, session = crawler_with([response(404)])
+        with patch("app.crawler.crawler.asyncio.sleep", new_callable=AsyncMock) as sleep:
+            assert await crawler.fetch("http://books.toscrape.com/missing.html") is None
+        assert session.get.call_count == 1
+        sleep.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_server_errors_are_retried_with_backoff(self):
+        crawler, session = crawler_with([response(500), response(502), response(200, text="ok")])
+        assert await crawler.fetch("http://books.toscrape.com/flaky.html") == "ok"
+        assert session.get.call_count == 3
+        assert crawler.summary()["fetch"]["books.toscrape.com"]["errors"] == 2
+
+    @pytest.mark.asyncio
+    async def test_retry_after_is_honoured(self):
+        crawler, _ = crawler_with([response(429, {"Retry-After": "0.3"}), response(200, text="ok")])
+        started = time.monotonic()
+        assert await crawler.fetch("http://books.toscrape.com/busy.html") == "ok"
+        assert time.monotonic() - started >= 0.29
+
+
+class TestAdaptiveAgainstOverloadedSite:
+    async def _fetch_all(self, book_site, adaptive: bool, requests: int = 300) -> tuple[MockBookSite, list, float]:
+        site = await book_site(pages=20, latency=0.01, capacity=8, retry_after=0.2)
+        async with create_session(limit_per_host=64) as session:
+            crawler = BookCrawler(
+                base_url=site.base_url, session=session,
+                controller=FetchController(max_limit=64, adaptive=adaptive, backoff_base=0.05, retries=5),
+            )
+            started = time.perf_counter()
+            pages = await asyncio.gather(*(
+                crawler.fetch(f"{site.base_url}catalogue/book-{i}_{i}/index.html") for i in range(requests)
+            ))
+            return site, pages, time.perf_counter() - started
+
+    @pytest.mark.asyncio
+    async def test_adaptive_limit_avoids_overload_and_finishes_sooner(self, book_site):
+        adaptive_site, adaptive_pages, adaptive_seconds = await self._fetch_all(book_site, adaptive=True)
+        fixed_site, _, fixed_seconds = await self._fetch_all(book_site, adaptive=False)
+
+        assert all(adaptive_pages)
+        assert adaptive_site.rejected * 5 < fixed_site.rejected
+        assert adaptive_seconds < fixed_seconds
@@ -0,0 +1,157 @@
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+import httpx
+import pytest
+from fastapi import APIRouter, BackgroundTasks, Depends, FastAPI, HTTPException
+
+from app.config.redis_caching import InstrumentedRedis
+from app.utils.timing import (
+    MongoCommandTimer, TimedRoute, TimingMiddleware, mongo_command_seconds, record_redis_command, request_seconds,
+    span,
+)
+
+
+def mongo_event(request_id: int, command_name: str = "find", collection: str = "books", micros: int = 2000):
+    return SimpleNamespace(connection_id=("localhost", 27017), request_id=request_id, command_name=command_name,
+                           command={command_name: collection}, duration_micros=micros)
+
+
+mongo_timer = MongoCommandTimer()
+
+
+async def authenticate():
+    with span("auth"):
+        record_redis_command("GET", 0.001)
+
+
+def run_command(request_id: int):
+    event = mongo_event(request_id)
+    mongo_timer.started(event)
+    mongo_timer.succeeded(event)
+
+
+router = APIRouter(route_class=TimedRoute, dependencies=[Depends(authenticate)])
+
+
+@router.get("/items/{item_id}")
+async def get_item(item_id: int):
+    # like Motor, to_thread runs the command on a worker with a copy of the request's context
+    await asyncio.to_thread(run_command, item_id)
+    await asyncio.sleep(0.01)
+    return {"id": item_id}
+
+
+@router.get("/missing")
+async def get_missing():
+    raise HTTPException(status_code=404, detail="missing")
+
+
+background_steps = []
+
+
+async def crawl_in_background(item_id: int):
+    # outlives the response, like POST /api/crawler/
+    await asyncio.sleep(0.2)
+    with span("crawl") as step:
+        background_steps.append(step)
+    await asyncio.to_thread(run_command, item_id)
+
+
+@router.post("/crawl/{item_id}", status_code=202)
+async def start_crawl(item_id: int, background_tasks: BackgroundTasks):
+    background_tasks.add_task(crawl_in_background, item_id)
+    return {"started": item_id}
+
+
+def make_client(slow_request_ms: float = 10_000) -> httpx.AsyncClient:
+    app = FastAPI()
+    app.add_middleware(TimingMiddleware, slow_request_ms=slow_request_ms)
+    app.include_router(router, prefix="/api")
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+def server_timing(response) -> dict[str, float]:
+    entries = [entry.strip().split(";") for entry in response.headers["server-timing"].split(",")]
+    return {entry[0]: float(entry[1].removeprefix("dur=")) for entry in entries}
+
+
+class TestTimingMiddleware:
+    @pytest.mark.asyncio
+    async def test_server_timing_breaks_the_request_down(self):
+        async with make_client() as client:
+            response = await client.get("/api/items/7")
+
+        assert response.json() == {"id": 7}
+        timing = server_timing(response)
+        assert set(timing) == {"dependencies", "auth", "redis", "endpoint", "mongo", "serialize", "total"}
+        assert timing["endpoint"] >= 10
+        assert timing["mongo"] == pytest.approx(2.0, abs=0.05)
+        assert timing["total"] >= timing["dependencies"] + timing["endpoint"]
+
+    @pytest.mark.asyncio
+    async def test_latency_is_recorded_per_route_template(self):
+        histogram = request_seconds.labels("GET", "/api/items/{item_id}", 200)
+        before = histogram.count
+        async with make_client() as client:
+            await client.get("/api/items/1")
+            await client.get("/api/items/2")
+            response = await client.get("/api/missing")
+
+        assert histogram.count - before == 2
+        assert response.status_code == 404 and "dependencies" in server_timing(response)
+        assert request_seconds.labels("GET", "/api/missing", 404).count >= 1
+
+    @pytest.mark.asyncio
+    async def test_slow_requests_are_logged_with_their_span_tree(self):
+        with patch("app.utils.timing.logger") as logger:
+            async with make_client(slow_request_ms=0) as client:
+                await client.get("/api/items/3")
+
+        tree = logger.warning.call_args.args[0]
+        lines = tree.splitlines()
+        assert lines[1].startswith("GET /api/items/3")
+        assert [line.split()[0] for line in lines[2:]] == [
+            "dependencies", "auth", "redis", "endpoint", "mongo", "serialize",
+        ]
+        assert "    mongo find books" in tree
+
+    @pytest.mark.asyncio
+    async def test_background_tasks_are_not_part_of_the_request(self):
+        histogram = request_seconds.labels("POST", "/api/crawl/{item_id}", 202)
+        before_count, before_sum = histogram.count, histogram.sum
+        background_steps.clear()
+        with patch("app.utils.timing.logger") as logger:
+            async with make_client(slow_request_ms=0) as client:
+                response = await client.post("/api/crawl/4")
+
+        assert response.status_code == 202 and "mongo" not in server_timing(response)
+        assert background_steps == [None]
+        assert histogram.count - before_count == 1
+        assert histogram.sum - before_sum < 0.2
+        logger.warning.assert_called_once()
+        assert "mongo" not in logger.warning.call_args.args[0]
+
+
+class TestCommandListeners:
+    def test_mongo_commands_outside_a_request_are_still_measured(self):
+        histogram = mongo_command_seconds.labels("aggregate", "change")
+        before = histogram.count
+        timer = MongoCommandTimer()
+        event = mongo_event(1, "aggregate", "change", micros=5000)
+        timer.started(event)
+        timer.failed(event)
+
+        assert histogram.count - before == 1
+        assert not timer._pending
+
+    @pytest.mark.asyncio
+    async def test_redis_client_reports_each_command(self):
+        listener = []
+        with patch("app.config.redis_caching.command_listeners", [lambda *call: listener.append(call)]), \
+                patch("redis.asyncio.Redis.execute_command", AsyncMock(return_value=b"1")):
+            client = InstrumentedRedis()
+            assert await client.execute_command("get", "key") == b"1"
+
+        assert [command for command, _ in listener] == ["GET"]
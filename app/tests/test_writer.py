@@ -0,0 +1,333 @@
+import asyncio
+import gzip
+import threading
+import pytest
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock, patch
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+from app.crawler.changes import content_hash
+from app.crawler.writer import BookWriter
+from app.db import build_snapshot
+from app.schemas import Book
+
+
+def make_book(i: int):
+    return MagicMock(
+        name=f"Book {i}", row_html=None, snapshot_id=None,
+        model_dump=MagicMock(return_value={"name": f"Book {i}"})
+    )
+
+
+@pytest.fixture(autouse=True)
+def mock_snapshots():
+    with patch("app.crawler.writer.SnapshotRepository.save_many", new_callable=AsyncMock) as save_many:
+        yield save_many
+
+
+@pytest.fixture(autouse=True)
+def mock_invalidation():
+    with patch("app.crawler.writer.BookRepository.invalidate", new_callable=AsyncMock) as books, \
+            patch("app.crawler.writer.ChangeBookRepository.invalidate", new_callable=AsyncMock) as changes:
+        yield books, changes
+
+
+@pytest.fixture
+def mock_collection():
+    with patch("app.crawler.writer.books_collection") as collection:
+        collection.bulk_write = AsyncMock(return_value=MagicMock(upserted_count=1, modified_count=0))
+        yield collection
+
+
+class TestBookWriter:
+    @pytest.mark.asyncio
+    async def test_flushes_when_batch_is_full(self, mock_collection):
+        writer = BookWriter(batch_size=3, flush_interval=0)
+        for i in range(7):
+            await writer.add(make_book(i))
+
+        assert mock_collection.bulk_write.call_count == 2
+        assert mock_collection.bulk_write.call_args.kwargs["ordered"] is False
+
+        await writer.close()
+        assert [len(call.args[0]) for call in mock_collection.bulk_write.call_args_list] == [3, 3, 1]
+        assert writer.summary()["books"] == 7
+        assert writer.summary()["batches"] == 3
+
+    @pytest.mark.asyncio
+    async def test_flushes_on_interval(self, mock_collection):
+        writer = BookWriter(batch_size=100, flush_interval=0.01)
+        await writer.start()
+        await writer.add(make_book(1))
+        await asyncio.sleep(0.05)
+
+        mock_collection.bulk_write.assert_called_once()
+        await writer.close()
+
+    @pytest.mark.asyncio
+    async def test_failed_batch_is_kept_for_retry(self, mock_collection):
+        mock_collection.bulk_write.side_effect = [RuntimeError("mongo down"), MagicMock(upserted_count=1, modified_count=0)]
+        writer = BookWriter(batch_size=100, flush_interval=0)
+        await writer.add(make_book(1))
+
+        with pytest.raises(RuntimeError):
+            await writer.flush()
+        await writer.flush()
+
+        assert mock_collection.bulk_write.call_count == 2
+        assert writer.summary()["books"] == 1
+
+    @pytest.mark.asyncio
+    async def test_close_flushes_after_cancellation(self, mock_collection):
+        writer = BookWriter(batch_size=100, flush_interval=0)
+
+        async def crawl():
+            try:
+                await writer.add(make_book(1))
+                await asyncio.sleep(10)
+            finally:
+                await writer.close()
+
+        task = asyncio.create_task(crawl())
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        mock_collection.bulk_write.assert_called_once()
+
+
+def make_real_book(price: float) -> Book:
+    record = {
+        "name": "Book",
+        "description": "A book",
+        "category": "Travel",
+        "price_excl_tax": price,
+        "price_incl_tax": price,
+        "availability": 3,
+        "num_reviews": 0,
+        "image_url": "http://books.toscrape.com/media/book.jpg",
+        "rating": "Three",
+        "source_url": "http://books.toscrape.com/catalogue/book_1/index.html",
+    }
+    return Book(**record, crawl_timestamp=datetime.now(), row_html="<html></html>",
+                content_hash=content_hash(record))
+
+
+class AsyncCursor:
+    def __init__(self, docs):
+        self.docs = iter(docs)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self.docs)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class TestWriterChangeDetection:
+    async def _write(self, stored: list[dict], book: Book):
+        with patch("app.crawler.writer.books_collection") as books, \
+                patch("app.crawler.writer.changes_collection") as changes:
+            books.find = MagicMock(return_value=AsyncCursor(stored))
+            books.bulk_write = AsyncMock(return_value=MagicMock(upserted_count=0, modified_count=1))
+            changes.insert_many = AsyncMock()
+            writer = BookWriter(flush_interval=0)
+            await writer.add(book)
+            await writer.close()
+        return writer, books, changes
+
+    @pytest.mark.asyncio
+    async def test_unchanged_book_only_refreshes_crawl_timestamp(self):
+        book = make_real_book(10.0)
+        stored = {"_id": ObjectId(), "source_url": book.source_url, "category": "Travel",
+                  "content_hash": book.content_hash}
+        writer, books, changes = await self._write([stored], book)
+
+        operation = books.bulk_write.call_args.args[0][0]
+        assert set(operation._doc["$set"]) == {"crawl_timestamp", "snapshot_id"}
+        changes.insert_many.assert_not_called()
+        assert writer.summary()["unchanged"] == 1
+
+    @pytest.mark.asyncio
+    async def test_unchanged_batch_keeps_cache(self, mock_invalidation):
+        book = make_real_book(10.0)
+        stored = {"_id": ObjectId(), "source_url": book.source_url, "category": "Travel",
+                  "content_hash": book.content_hash}
+        await self._write([stored], book)
+
+        for invalidate in mock_invalidation:
+            invalidate.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_unchanged_book_with_a_placeholder_category_is_recategorized(self, mock_invalidation):
+        book = make_real_book(10.0)
+        stored = {"_id": ObjectId(), "source_url": book.source_url, "category": "Unknown",
+                  "content_hash": book.content_hash}
+        writer, books, changes = await self._write([stored], book)
+
+        operation = books.bulk_write.call_args.args[0][0]
+        assert operation._doc["$set"]["category"] == "Travel"
+        changes.insert_many.assert_not_called()
+        mock_invalidation[0].assert_awaited_once_with([stored["_id"]])
+        assert writer.summary()["recategorized"] == 1
+
+    @pytest.mark.asyncio
+    async def test_changed_book_invalidates_its_cache_entries(self, mock_invalidation):
+        old = make_real_book(10.0)
+        stored = {"_id": ObjectId(), **old.model_dump(exclude={"row_html", "crawl_timestamp"})}
+        await self._write([stored], make_real_book(12.5))
+
+        books, changes = mock_invalidation
+        books.assert_awaited_once_with([stored["_id"]])
+        changes.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_changed_book_is_recorded_in_one_insert(self):
+        old = make_real_book(10.0)
+        stored = {"_id": ObjectId(), **old.model_dump(exclude={"row_html", "crawl_timestamp"})}
+        writer, books, changes = await self._write([stored], make_real_book(12.5))
+
+        records = changes.insert_many.call_args.args[0]
+        assert len(records) == 1
+        assert records[0]["book_id"] == stored["_id"]
+        assert records[0]["category"] == "Travel"
+        assert records[0]["price_incl_tax"] == 12.5
+        assert records[0]["changes"] == [
+            {"field": "price_incl_tax", "old": 10.0, "new": 12.5},
+            {"field": "price_excl_tax", "old": 10.0, "new": 12.5},
+        ]
+        assert writer.summary()["updated"] == 1
+        assert writer.summary()["changes"] == 1
+
+    async def _write_with_retry(self, stored: list[dict], book: Book, insert_many: AsyncMock, bulk_write: AsyncMock):
+        with patch("app.crawler.writer.books_collection") as books, \
+                patch("app.crawler.writer.changes_collection") as changes:
+            # the stored hash only moves once bulk_write succeeds
+            books.find = MagicMock(side_effect=lambda *args: AsyncCursor(stored))
+            books.bulk_write = bulk_write
+            changes.insert_many = insert_many
+            writer = BookWriter(flush_interval=0)
+            await writer.add(book)
+            with pytest.raises(Exception, match="lost connection"):
+                await writer.flush()
+            await writer.close()
+        return writer
+
+    @pytest.mark.asyncio
+    async def test_change_survives_a_failed_insert(self):
+        stored = {"_id": ObjectId(), **make_real_book(10.0).model_dump(exclude={"row_html", "crawl_timestamp"})}
+        insert_many = AsyncMock(side_effect=[Exception("lost connection"), None])
+        bulk_write = AsyncMock(return_value=MagicMock(upserted_count=0, modified_count=1))
+        writer = await self._write_with_retry([stored], make_real_book(12.5), insert_many, bulk_write)
+
+        first, retry = (call.args[0] for call in insert_many.await_args_list)
+        assert [record["_id"] for record in first] == [record["_id"] for record in retry]
+        assert retry[0]["changes"][0] == {"field": "price_incl_tax", "old": 10.0, "new": 12.5}
+        # the book is only written once its change record is stored
+        bulk_write.assert_awaited_once()
+        assert writer.summary()["changes"] == 1 and not writer._changes
+
+    @pytest.mark.asyncio
+    async def test_retry_after_a_failed_book_write_keeps_the_stored_change(self):
+        stored = {"_id": ObjectId(), **make_real_book(10.0).model_dump(exclude={"row_html", "crawl_timestamp"})}
+        duplicate = BulkWriteError({"writeErrors": [{"index": 0, "code": 11000, "errmsg": "duplicate key"}]})
+        insert_many = AsyncMock(side_effect=[None, duplicate])
+        bulk_write = AsyncMock(side_effect=[
+            Exception("lost connection"), MagicMock(upserted_count=0, modified_count=1),
+        ])
+        writer = await self._write_with_retry([stored], make_real_book(12.5), insert_many, bulk_write)
+
+        first, retry = (call.args[0] for call in insert_many.await_args_list)
+        assert first[0]["_id"] == retry[0]["_id"]
+        assert bulk_write.await_count == 2
+        assert writer.summary()["changes"] == 1
+
+    @pytest.mark.asyncio
+    async def test_other_insert_errors_are_not_swallowed(self):
+        stored = {"_id": ObjectId(), **make_real_book(10.0).model_dump(exclude={"row_html", "crawl_timestamp"})}
+        invalid = BulkWriteError({"writeErrors": [{"index": 0, "code": 121, "errmsg": "validation failed"}]})
+        with patch("app.crawler.writer.books_collection") as books, \
+                patch("app.crawler.writer.changes_collection") as changes:
+            books.find = MagicMock(return_value=AsyncCursor([stored]))
+            books.bulk_write = AsyncMock()
+            changes.insert_many = AsyncMock(side_effect=invalid)
+            writer = BookWriter(flush_interval=0)
+            await writer.add(make_real_book(12.5))
+            with pytest.raises(BulkWriteError):
+                await writer.flush()
+
+        books.bulk_write.assert_not_called()
+        assert writer.buffered() == 1
+
+    @pytest.mark.asyncio
+    async def test_content_hash_ignores_crawl_metadata(self):
+        first, second = make_real_book(10.0), make_real_book(10.0)
+        second.row_html = "<html>different markup</html>"
+
+        assert first.content_hash == second.content_hash
+        assert first.content_hash != make_real_book(11.0).content_hash
+
+
+class TestWriterSnapshots:
+    @pytest.mark.asyncio
+    async def test_raw_html_goes_to_snapshot_store_not_books(self, mock_snapshots):
+        book = make_real_book(10.0)
+        writer, books, _ = await TestWriterChangeDetection()._write([], book)
+
+        document = books.bulk_write.call_args.args[0][0]._doc["$set"]
+        assert "row_html" not in document
+        snapshots = mock_snapshots.call_args.args[0]
+        assert len(snapshots) == 1
+        assert document["snapshot_id"] == snapshots[0]["_id"]
+        assert snapshots[0]["size"] == len("<html></html>")
+
+    @pytest.mark.asyncio
+    async def test_unchanged_page_does_not_rewrite_snapshot(self, mock_snapshots):
+        book = make_real_book(10.0)
+        snapshot_id = build_snapshot(book.source_url, book.row_html)["_id"]
+        stored = {"_id": ObjectId(), "source_url": book.source_url,
+                  "content_hash": book.content_hash, "snapshot_id": snapshot_id}
+        await TestWriterChangeDetection()._write([stored], book)
+
+        assert mock_snapshots.call_args.args == ([], [snapshot_id])
+
+    @pytest.mark.asyncio
+    async def test_pages_are_compressed_off_the_event_loop_at_flush(self, mock_snapshots):
+        threads = []
+        compress = gzip.compress
+
+        def recording_compress(data):
+            threads.append(threading.current_thread())
+            return compress(data)
+
+        with patch("app.db.repositories.snapshot_repository.gzip.compress", side_effect=recording_compress):
+            writer = BookWriter(batch_size=100, flush_interval=0)
+            await writer.add(make_real_book(10.0))
+            assert threads == []
+
+            with patch("app.crawler.writer.books_collection") as books:
+                books.find = MagicMock(return_value=AsyncCursor([]))
+                books.bulk_write = AsyncMock(return_value=MagicMock(upserted_count=1, modified_count=0))
+                await writer.flush()
+
+        assert len(threads) == 1 and threads[0] is not threading.main_thread()
+        assert len(mock_snapshots.call_args.args[0]) == 1
+
+    @pytest.mark.asyncio
+    async def test_raw_html_is_attached_from_snapshots(self):
+        from app.db.repositories.book_repository import attach_raw_html
+        books = [
+            {"_id": 1, "snapshot_id": "abc"},
+            {"_id": 2, "row_html": "<html>legacy</html>"},
+        ]
+        with patch("app.db.repositories.book_repository.SnapshotRepository.get_html",
+                   new_callable=AsyncMock, return_value={"abc": "<html>snapshot</html>"}):
+            await attach_raw_html(books)
+
+        assert books[0]["raw_html"] == "<html>snapshot</html>"
+        assert books[1]["raw_html"] == "<html>legacy</html>"
+        assert "row_html" not in books[1]
@@ -1,12 +1,24 @@
-from .pagination import paginate
-from .enums import BookSortEnum, UserRoleEnum
+from .pagination import paginate, keyset_paginate
+from .search import search_paginate, normalize_search_query
+from .enums import (
+    BookSortEnum, UserRoleEnum, CrawlModeEnum, ParseExecutorEnum, PaginationEnum, PaginationTotalEnum,
+    JobRunStatusEnum
+)
 from .logger import logger
 from .security import verify_user_api_key, verify_admin_api_key, generate_api_key, user_rate_limit_identifier
 
 __all__ = (
     'paginate',
+    'keyset_paginate',
+    'search_paginate',
+    'normalize_search_query',
     'BookSortEnum',
     'UserRoleEnum',
+    'CrawlModeEnum',
+    'ParseExecutorEnum',
+    'PaginationEnum',
+    'PaginationTotalEnum',
+    'JobRunStatusEnum',
     'logger',
     'verify_user_api_key',
     'verify_admin_api_key',
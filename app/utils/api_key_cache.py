@@ -0,0 +1,103 @@
+import asyncio
+import hashlib
+from datetime import datetime
+from typing import Awaitable, Callable, Optional
+
+from pymongo import UpdateOne
+
+from app.config import settings, LocalCache, RedisCache
+from .logger import logger
+
+# the only user fields the auth path needs; keeps cache entries small
+AUTH_FIELDS = ("username", "role", "is_active", "rate_limit")
+
+
+class ApiKeyCache:
+    """Two-tier cache of API key -> user lookups for ``verify_user_api_key``.
+
+    Lookups hit a per-process ``LocalCache`` first (LRU bounded by entries and
+    bytes, ``local_ttl`` seconds), then Redis (``ttl`` seconds), and only then
+    Mongo. Keys hold a sha256 of the API key rather than the key itself.
+    ``invalidate`` deletes the Redis entry and publishes on the shared
+    invalidation channel, so every process running ``listen_for_invalidations``
+    drops its local copy too.
+    """
+
+    def __init__(
+            self,
+            ttl: int = settings.API_KEY_CACHE_TTL,
+            local_ttl: float = settings.API_KEY_LOCAL_TTL,
+            max_entries: int = settings.API_KEY_LOCAL_MAX_ENTRIES,
+            max_bytes: int = settings.API_KEY_LOCAL_MAX_BYTES,
+    ):
+        self.ttl = ttl
+        self.local = LocalCache(max_entries=max_entries, max_bytes=max_bytes, ttl=local_ttl)
+        self.redis = RedisCache(default_ttl=ttl, local_cache=self.local)
+
+    @staticmethod
+    def redis_key(api_key: str) -> str:
+        return f"api_key:{hashlib.sha256(api_key.encode()).hexdigest()}"
+
+    async def get(self, api_key: str, loader: Callable[[str], Awaitable[Optional[dict]]]) -> Optional[dict]:
+        key = self.redis_key(api_key)
+        user = await self.redis.get(key)
+        if user is None:
+            doc = await loader(api_key)
+            if doc is None:
+                return None
+            user = {"_id": str(doc["_id"]), **{field: doc[field] for field in AUTH_FIELDS if field in doc}}
+            if not await self.redis.set(key, user, self.ttl):
+                # Redis is down; still spare Mongo for the next local_ttl seconds
+                self.local.set(key, self.redis.codec.encode(user), decoded=user)
+        return user
+
+    async def invalidate(self, *api_keys: Optional[str]):
+        await self.redis.invalidate(keys=[self.redis_key(api_key) for api_key in api_keys if api_key])
+
+    async def listen_for_invalidations(self):
+        await self.redis.listen_for_invalidations()
+
+
+class LastUsedTracker:
+    """Coalesces ``last_used`` timestamps in memory and writes them in one ``bulk_write``.
+
+    Each key keeps only its latest timestamp, so a burst of requests costs a
+    single update per key per ``interval``. ``run()`` is the flush loop started
+    with the app; ``flush()`` is also called once more on shutdown.
+    """
+
+    def __init__(self, interval: float = settings.LAST_USED_FLUSH_INTERVAL):
+        self.interval = interval
+        self._pending: dict[str, datetime] = {}
+
+    def touch(self, api_key: str):
+        self._pending[api_key] = datetime.now()
+
+    async def flush(self) -> int:
+        if not self._pending:
+            return 0
+        from app.db import users_collection
+        pending, self._pending = self._pending, {}
+        try:
+            await users_collection.bulk_write(
+                [UpdateOne({"api_key": key}, {"$set": {"last_used": used}}) for key, used in pending.items()],
+                ordered=False,
+            )
+        except Exception:
+            # keep them for the next flush unless a newer timestamp arrived meanwhile
+            for key, used in pending.items():
+                self._pending.setdefault(key, used)
+            raise
+        return len(pending)
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Flushing last_used timestamps failed, will retry: {e}")
+
+
+api_key_cache = ApiKeyCache()
+last_used_tracker = LastUsedTracker()
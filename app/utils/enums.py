@@ -8,4 +8,30 @@ class BookSortEnum(str, Enum):
 
 class UserRoleEnum(str, Enum):
     admin = "admin"
-    user = "user"
\ No newline at end of file
+    user = "user"
+
+class CrawlModeEnum(str, Enum):
+    concurrent = "concurrent"
+    pipeline = "pipeline"
+    distributed = "distributed"
+
+class ParseExecutorEnum(str, Enum):
+    none = "none"
+    thread = "thread"
+    process = "process"
+
+class PaginationEnum(str, Enum):
+    offset = "offset"
+    cursor = "cursor"
+
+class PaginationTotalEnum(str, Enum):
+    exact = "exact"
+    estimated = "estimated"
+    cached = "cached"
+    none = "none"
+
+class JobRunStatusEnum(str, Enum):
+    running = "running"
+    success = "success"
+    failed = "failed"
+    skipped = "skipped"
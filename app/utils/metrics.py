@@ -0,0 +1,278 @@
+import asyncio
+import json
+import os
+import socket
+import time
+from bisect import bisect_left
+from typing import Callable, Iterable, Optional
+
+from app.config import settings, RedisCache
+from .logger import logger
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# per-process snapshots: one key each, plus a sorted set of processes by last publish time
+PROCESSES_KEY = "metrics:processes"
+PROCESS_KEY = "metrics:process:{}"
+
+
+class CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+
+class GaugeChild:
+    __slots__ = ("value", "function")
+
+    def __init__(self):
+        self.value = 0.0
+        self.function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float):
+        self.value = value
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.value -= amount
+
+    def set_function(self, function: Optional[Callable[[], float]]):
+        """Read the value from ``function`` at collection time instead (``None`` to stop)."""
+        self.function = function
+
+    def get(self) -> float:
+        return self.function() if self.function is not None else self.value
+
+
+class HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: tuple[float, ...]):
+        self.bounds = bounds
+        # one slot per bucket plus +Inf; made cumulative only when collected
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metric:
+    """A metric family; ``labels(...)`` returns the child that holds the value for those label values."""
+
+    def __init__(self, kind: str, name: str, documentation: str, labelnames: Iterable[str],
+                 child_factory: Callable[[], object]):
+        self.kind = kind
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._child_factory = child_factory
+        self._children: dict[tuple[str, ...], object] = {}
+        if not self.labelnames:
+            self._children[()] = child_factory()
+
+    def labels(self, *values) -> object:
+        """The child for these label values; bind it once and keep it, so updates cost no lookup."""
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {values}")
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            child = self._children[key] = self._child_factory()
+        return child
+
+    def samples(self) -> list[list]:
+        samples = []
+        for values, child in self._children.items():
+            labels = dict(zip(self.labelnames, values))
+            if self.kind == "histogram":
+                cumulative = 0
+                for bound, count in zip((*child.bounds, float("inf")), child.counts):
+                    cumulative += count
+                    samples.append([f"{self.name}_bucket", {**labels, "le": format_value(bound)}, cumulative])
+                samples.append([f"{self.name}_sum", labels, child.sum])
+                samples.append([f"{self.name}_count", labels, child.count])
+            elif self.kind == "gauge":
+                samples.append([self.name, labels, child.get()])
+            else:
+                samples.append([self.name, labels, child.value])
+        return samples
+
+
+def family(name: str, kind: str, documentation: str, samples: list[list]) -> dict:
+    return {"name": name, "type": kind, "help": documentation, "samples": samples}
+
+
+class MetricsRegistry:
+    """Counters, gauges and histograms of one process, plus named JSON status sections.
+
+    Metrics are registered once (at import) and updated through pre-bound
+    children, so the hot path is an attribute increment or one ``bisect``.
+    Collectors are called at collection time for numbers that already live
+    elsewhere (cache stats, queue sizes).
+    """
+
+    def __init__(self):
+        self._metrics: dict[str, Metric] = {}
+        self._collectors: list[Callable[[], list[dict]]] = []
+        self._status: dict[str, Callable[[], Optional[dict]]] = {}
+
+    def _register(self, kind: str, name: str, documentation: str, labelnames: Iterable[str], factory) -> Metric:
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = self._metrics[name] = Metric(kind, name, documentation, labelnames, factory)
+        elif metric.kind != kind:
+            raise ValueError(f"{name} is already registered as a {metric.kind}")
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Metric:
+        return self._register("counter", name, documentation, labelnames, CounterChild)
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Metric:
+        return self._register("gauge", name, documentation, labelnames, GaugeChild)
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                  buckets: Iterable[float] = DEFAULT_BUCKETS) -> Metric:
+        bounds = tuple(sorted(buckets))
+        return self._register("histogram", name, documentation, labelnames, lambda: HistogramChild(bounds))
+
+    def register_collector(self, collector: Callable[[], list[dict]]):
+        self._collectors.append(collector)
+
+    def register_status(self, section: str, status: Callable[[], Optional[dict]]):
+        self._status[section] = status
+
+    def collect(self) -> list[dict]:
+        families = [
+            family(metric.name, metric.kind, metric.documentation, metric.samples())
+            for metric in self._metrics.values()
+        ]
+        for collector in self._collectors:
+            try:
+                families.extend(collector())
+            except Exception as e:
+                logger.warning(f"Metrics collector {collector.__name__} failed: {e}")
+        return families
+
+    def status(self) -> dict:
+        sections = {section: status() for section, status in self._status.items()}
+        return {section: value for section, value in sections.items() if value is not None}
+
+    def snapshot(self) -> dict:
+        return {"families": self.collect(), "status": self.status(), "published_at": time.time()}
+
+
+def format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if value == float("-inf"):
+        return "-Inf"
+    if value != value:
+        return "NaN"
+    return str(int(value)) if float(value).is_integer() and abs(value) < 2 ** 53 else repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def render(families_by_process: dict[str, list[dict]]) -> str:
+    """Prometheus text exposition of several processes' families, told apart by a ``process`` label."""
+    merged: dict[str, dict] = {}
+    for process, families in families_by_process.items():
+        for item in families:
+            target = merged.setdefault(item["name"], {**item, "samples": []})
+            target["samples"].extend(
+                (name, {"process": process, **labels}, value) for name, labels, value in item["samples"]
+            )
+    lines = []
+    for item in merged.values():
+        lines.append(f"# HELP {item['name']} {item['help']}")
+        lines.append(f"# TYPE {item['name']} {item['type']}")
+        for name, labels, value in item["samples"]:
+            label_text = ",".join(f'{key}="{_escape(str(label))}"' for key, label in labels.items())
+            lines.append(f"{name}{{{label_text}}} {format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsPublisher:
+    """Shares this process's registry through Redis.
+
+    Every ``interval`` seconds the snapshot (families and status) is written to
+    a per-process key, so ``/metrics`` on any API worker also shows the
+    scheduler, standalone crawlers and the other workers. Processes that stop
+    publishing drop out after ``stale_after`` seconds.
+    """
+
+    def __init__(
+            self,
+            registry: MetricsRegistry,
+            role: str = "api",
+            interval: float = settings.METRICS_PUBLISH_INTERVAL,
+            stale_after: float = settings.METRICS_STALE_AFTER,
+            redis: Optional[RedisCache] = None,
+    ):
+        self.registry = registry
+        # set by the entry point (api, scheduler, crawler); part of the ``process`` label
+        self.role = role
+        self.interval = interval
+        self.stale_after = stale_after
+        self.redis = redis or RedisCache(decode_responses=True)
+
+    @property
+    def process(self) -> str:
+        return f"{self.role}@{socket.gethostname()}:{os.getpid()}"
+
+    async def publish(self) -> bool:
+        try:
+            client = await self.redis.get_client()
+            now = time.time()
+            async with client.pipeline(transaction=False) as pipe:
+                pipe.set(PROCESS_KEY.format(self.process), json.dumps(self.registry.snapshot(), default=str),
+                         ex=max(1, int(self.stale_after)))
+                pipe.zadd(PROCESSES_KEY, {self.process: now})
+                pipe.zremrangebyscore(PROCESSES_KEY, "-inf", now - self.stale_after)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Publishing metrics failed: {e}")
+            return False
+        return True
+
+    async def run(self):
+        while True:
+            await self.publish()
+            await asyncio.sleep(self.interval)
+
+    async def snapshots(self) -> dict[str, dict]:
+        """This process's live snapshot plus the latest one every other process published."""
+        snapshots = {self.process: self.registry.snapshot()}
+        try:
+            client = await self.redis.get_client()
+            processes = [
+                process for process in await client.zrangebyscore(PROCESSES_KEY, time.time() - self.stale_after, "+inf")
+                if process != self.process
+            ]
+            if processes:
+                payloads = await client.mget([PROCESS_KEY.format(process) for process in processes])
+                snapshots.update(
+                    (process, json.loads(payload)) for process, payload in zip(processes, payloads) if payload
+                )
+        except Exception as e:
+            logger.warning(f"Reading published metrics failed, serving this process only: {e}")
+        return snapshots
+
+    async def render(self) -> str:
+        snapshots = await self.snapshots()
+        return render({process: snapshot["families"] for process, snapshot in snapshots.items()})
+
+
+metrics = MetricsRegistry()
+metrics_publisher = MetricsPublisher(metrics)
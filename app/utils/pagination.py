@@ -1,13 +1,23 @@
+import base64
+import json
 from math import ceil
+
+from bson import ObjectId, errors as bson_errors
+
 from app.serializers import serialize_book
+from .enums import PaginationTotalEnum
+
+# sorts served highest-first; everything else (and the _id tie-break without a sort) is ascending
+DESCENDING_SORTS = {"rating", "num_reviews", "price_incl_tax"}
 
 
-async def paginate(collection, query: dict, skip: int = 0, limit: int = 10, sort_field: str = None):
+async def paginate(
+        collection, query: dict, skip: int = 0, limit: int = 10, sort_field: str = None, projection: dict = None
+):
     total = await collection.count_documents(query)
-    cursor = collection.find(query)
+    cursor = collection.find(query, projection)
     if sort_field:
-        # membership check with runtime O(1)
-        sort_order = -1 if sort_field in {"rating", "num_reviews", "price_incl_tax"} else 1
+        sort_order = -1 if sort_field in DESCENDING_SORTS else 1
         cursor = cursor.sort(sort_field, sort_order)
 
     items = await cursor.skip(skip).limit(limit).to_list(length=limit)
@@ -34,3 +44,96 @@ async def paginate(collection, query: dict, skip: int = 0, limit: int = 10, sort
         "next": next_skip,
         "previous": prev_skip
     }
+
+
+def encode_cursor(sort_field: str | None, doc: dict) -> str:
+    payload = {"s": sort_field, "id": str(doc["_id"])}
+    if sort_field:
+        payload["v"] = doc.get(sort_field)
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode()
+
+
+def decode_cursor(cursor: str, sort_field: str | None) -> dict:
+    """Turn a ``next_cursor`` back into the filter that resumes after it; ``ValueError`` if it is not valid."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        last_id = ObjectId(payload["id"])
+    except (ValueError, KeyError, TypeError, bson_errors.InvalidId) as e:
+        raise ValueError("Invalid cursor") from e
+    if payload.get("s") != sort_field:
+        raise ValueError("Cursor was issued for a different sort")
+
+    descending = sort_field in DESCENDING_SORTS
+    op = "$lt" if descending else "$gt"
+    if not sort_field:
+        return {"_id": {op: last_id}}
+    value = payload["v"]
+    # null and missing sort below every value: first ascending, last descending
+    if value is None:
+        after = [] if descending else [{sort_field: {"$ne": None}}]
+        return {"$or": [{sort_field: None, "_id": {op: last_id}}, *after]}
+    return {"$or": [
+        {sort_field: {op: value}},
+        {sort_field: value, "_id": {op: last_id}},
+        *([{sort_field: None}] if descending else []),
+    ]}
+
+
+async def count_total(collection, query: dict, mode: PaginationTotalEnum, cache=None, cap: int = 10_000, ttl: int = 60):
+    """Total for a listing; returns ``(total, exact)``.
+
+    ``estimated`` counts at most ``cap`` documents (a lower bound past that),
+    ``cached`` keeps the exact count in Redis for ``ttl`` seconds and ``none``
+    skips counting altogether.
+    """
+    if mode == PaginationTotalEnum.none:
+        return None, False
+    if mode == PaginationTotalEnum.estimated:
+        total = await collection.count_documents(query, limit=cap)
+        return total, total < cap
+    if mode == PaginationTotalEnum.cached and cache is not None:
+        key = await cache.versioned_key(f"count_{collection.name}", collection.name, query=query)
+        total = await cache.get(key)
+        if total is None:
+            total = await collection.count_documents(query)
+            await cache.set(key, total, ttl)
+        return total, True
+    return await collection.count_documents(query), True
+
+
+async def keyset_paginate(
+        collection,
+        query: dict,
+        limit: int = 10,
+        sort_field: str = None,
+        cursor: str = None,
+        projection: dict = None,
+        total_mode: PaginationTotalEnum = PaginationTotalEnum.exact,
+        cache=None,
+        count_cap: int = 10_000,
+        count_ttl: int = 60,
+):
+    """Cursor pagination: each page resumes after the last (sort key, ``_id``) instead of skipping.
+
+    Cost stays flat however deep the client pages, as long as an index covers
+    the filter, the sort field and ``_id``.
+    """
+    total, total_exact = await count_total(collection, query, total_mode, cache, count_cap, count_ttl)
+    page_query = {"$and": [query, decode_cursor(cursor, sort_field)]} if cursor else query
+
+    sort_order = -1 if sort_field in DESCENDING_SORTS else 1
+    sort = [(sort_field, sort_order), ("_id", sort_order)] if sort_field else [("_id", sort_order)]
+    items = await collection.find(page_query, projection).sort(sort).limit(limit + 1).to_list(length=limit + 1)
+
+    has_more = len(items) > limit
+    items = items[:limit]
+    next_cursor = encode_cursor(sort_field, items[-1]) if has_more else None
+
+    return {
+        "total": total,
+        "total_mode": total_mode.value,
+        "total_exact": total_exact,
+        "limit": limit,
+        "results": [serialize_book(book) for book in items],
+        "next_cursor": next_cursor,
+    }
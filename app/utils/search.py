@@ -0,0 +1,63 @@
+from math import ceil
+
+from app.serializers import serialize_book
+from .enums import PaginationTotalEnum
+from .pagination import DESCENDING_SORTS, count_total
+
+TEXT_SCORE = {"$meta": "textScore"}
+
+
+def normalize_search_query(text: str) -> str:
+    """Canonical form of a ``$text`` search, so equivalent queries share one cache entry.
+
+    ``$text`` ignores case and matches terms in any order, so terms are
+    case-folded, deduplicated and sorted. Queries with a quoted phrase keep
+    their order, since moving a term would change the phrase.
+    """
+    terms = text.casefold().split()
+    if '"' not in text:
+        terms = sorted(set(terms))
+    normalized = " ".join(terms)
+    if not normalized.strip('"-'):
+        raise ValueError("Search query is empty")
+    return normalized
+
+
+async def search_paginate(
+        collection,
+        text: str,
+        query: dict,
+        skip: int = 0,
+        limit: int = 10,
+        sort_field: str = None,
+        projection: dict = None,
+        count_cap: int = 10_000,
+):
+    """One page of a ``$text`` search combined with the listing filter, most relevant first.
+
+    With ``sort_field`` the results follow that sort and relevance breaks ties.
+    Common words can match most of the collection, so the total counts at
+    most ``count_cap`` matches and ``total_exact`` says whether it was reached.
+    """
+    search_query = {"$text": {"$search": text}, **query}
+    total, total_exact = await count_total(collection, search_query, PaginationTotalEnum.estimated, cap=count_cap)
+
+    sort = [("score", TEXT_SCORE), ("_id", 1)]
+    if sort_field:
+        sort.insert(0, (sort_field, -1 if sort_field in DESCENDING_SORTS else 1))
+    cursor = collection.find(search_query, {**(projection or {}), "score": TEXT_SCORE}).sort(sort)
+    items = await cursor.skip(skip).limit(limit).to_list(length=limit)
+
+    more = len(items) == limit and (skip + limit < total or not total_exact)
+    return {
+        "query": text,
+        "total": total,
+        "total_exact": total_exact,
+        "limit": limit,
+        "skip": skip,
+        "page": skip // limit + 1,
+        "total_pages": ceil(total / limit) if total else 0,
+        "results": [serialize_book(book) for book in items],
+        "next": skip + limit if more else None,
+        "previous": skip - limit if skip - limit >= 0 else None,
+    }
@@ -1,8 +1,9 @@
 import secrets, asyncio
-from datetime import datetime
 
 from fastapi import Header, HTTPException, status, Request
 from app.config import settings
+from .api_key_cache import api_key_cache, last_used_tracker
+from .timing import span
 
 
 def verify_admin_api_key(x_api_key: str = Header(...)):
@@ -14,20 +15,23 @@ def generate_api_key():
     return secrets.token_hex(16)
 
 
-async def verify_user_api_key(x_api_key: str = Header(...)):
+async def load_user_by_api_key(api_key: str):
     from app.db import users_collection
-    user = await users_collection.find_one({"api_key": x_api_key})
+    return await users_collection.find_one({"api_key": api_key})
+
+
+async def verify_user_api_key(x_api_key: str | None = Header(None)):
+    if not x_api_key:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="API key missing")
+    with span("auth"):
+        user = await api_key_cache.get(x_api_key, load_user_by_api_key)
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid API Key")
 
     if not user.get("is_active", True):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User is inactive")
 
-    await users_collection.update_one(
-        {"api_key": x_api_key},
-        {"$set": {"last_used": datetime.now()}},
-        upsert=True,
-    )
+    last_used_tracker.touch(x_api_key)
     return user
 
 
@@ -0,0 +1,277 @@
+import inspect
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Callable, Optional
+
+from fastapi.routing import APIRoute
+from pymongo import monitoring
+from starlette.datastructures import MutableHeaders
+
+from app.config import settings
+from app.config.redis_caching import command_listeners
+from .logger import logger
+from .metrics import metrics
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COMMAND_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+request_seconds = metrics.histogram(
+    "http_request_seconds", "API latency per route", ("method", "route", "status"), REQUEST_BUCKETS
+)
+mongo_command_seconds = metrics.histogram(
+    "mongo_command_seconds", "MongoDB command latency", ("command", "collection"), COMMAND_BUCKETS
+)
+redis_command_seconds = metrics.histogram(
+    "redis_command_seconds", "Redis command latency", ("command",), COMMAND_BUCKETS
+)
+
+# the innermost open span of the request being handled; tasks and executor threads get a copy
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+_route_phases: ContextVar[Optional["RoutePhases"]] = ContextVar("route_phases", default=None)
+
+
+class Span:
+    """A timed step of a request. ``metric`` groups spans in the ``Server-Timing`` header."""
+
+    __slots__ = ("name", "metric", "start", "end", "children")
+
+    def __init__(self, name: str, metric: str, start: Optional[float] = None, end: Optional[float] = None):
+        self.name = name
+        self.metric = metric
+        self.start = time.perf_counter() if start is None else start
+        self.end = end
+        self.children: list[Span] = []
+
+    def child(self, name: str, metric: Optional[str] = None) -> "Span":
+        span = Span(name, metric or name)
+        self.children.append(span)
+        return span
+
+    def add(self, name: str, metric: str, seconds: float):
+        """A finished child that ended just now, e.g. a command reported by a listener."""
+        end = time.perf_counter()
+        self.children.append(Span(name, metric, end - seconds, end))
+
+    def finish(self):
+        if self.end is None:
+            self.end = time.perf_counter()
+
+    @property
+    def seconds(self) -> float:
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+    def walk(self, depth: int = 0):
+        yield depth, self
+        for child in self.children:
+            yield from child.walk(depth + 1)
+
+    def tree(self) -> str:
+        return "\n".join(
+            f"{'  ' * depth}{span.name} {span.seconds * 1000:.1f} ms (+{(span.start - self.start) * 1000:.1f} ms)"
+            for depth, span in self.walk()
+        )
+
+    def server_timing(self) -> str:
+        """``Server-Timing`` value: time and count per metric (phases, auth, mongo, redis) plus the total."""
+        totals: dict[str, list] = {}
+        for depth, span in self.walk():
+            if depth:
+                total = totals.setdefault(span.metric, [0.0, 0])
+                total[0] += span.seconds
+                total[1] += 1
+        entries = [f'{metric};dur={seconds * 1000:.1f};desc="{count}x"' for metric, (seconds, count) in totals.items()]
+        entries.append(f"total;dur={self.seconds * 1000:.1f}")
+        return ", ".join(entries)
+
+
+def _active_span() -> Optional[Span]:
+    """The open span of the request being handled, if any.
+
+    A request's root span is finished once its response is sent, so work
+    that runs afterwards in the same context (Starlette background tasks) is
+    not attributed to the request.
+    """
+    current = _current_span.get()
+    return current if current is not None and current.end is None else None
+
+
+@contextmanager
+def span(name: str, metric: Optional[str] = None):
+    """Time a step of the current request; does nothing outside a request."""
+    parent = _active_span()
+    if parent is None:
+        yield None
+        return
+    child = parent.child(name, metric)
+    token = _current_span.set(child)
+    try:
+        yield child
+    finally:
+        child.finish()
+        _current_span.reset(token)
+
+
+class RoutePhases:
+    """Splits a route's time into dependencies, the endpoint itself, and serialization."""
+
+    def __init__(self, parent: Span):
+        self.parent = parent
+        self.span: Optional[Span] = None
+        self.advance("dependencies")
+
+    def advance(self, phase: Optional[str]):
+        if self.span is not None:
+            self.span.finish()
+        self.span = self.parent.child(phase) if phase else None
+        _current_span.set(self.span or self.parent)
+
+
+def _timed_endpoint(endpoint: Callable) -> Callable:
+    @wraps(endpoint)
+    async def timed(*args, **kwargs):
+        phases = _route_phases.get()
+        if phases is None:
+            return await endpoint(*args, **kwargs)
+        phases.advance("endpoint")
+        result = await endpoint(*args, **kwargs)
+        phases.advance("serialize")
+        return result
+
+    timed.timed = True
+    return timed
+
+
+class TimedRoute(APIRoute):
+    """``APIRoute`` that records dependency, endpoint and serialization phases in the request's spans."""
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        if inspect.iscoroutinefunction(endpoint) and not getattr(endpoint, "timed", False):
+            endpoint = _timed_endpoint(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def timed_handler(request):
+            parent = _active_span()
+            if parent is None:
+                return await handler(request)
+            phases = RoutePhases(parent)
+            token = _route_phases.set(phases)
+            try:
+                return await handler(request)
+            finally:
+                phases.advance(None)
+                _route_phases.reset(token)
+
+        return timed_handler
+
+
+class TimingMiddleware:
+    """ASGI middleware: per-route latency histogram, ``Server-Timing`` header and a slow request log.
+
+    Every request gets a span tree; routes built with ``TimedRoute`` add their
+    phases, ``span()`` adds explicit steps, and the Mongo and Redis listeners
+    add one span per command. Requests slower than ``slow_request_ms`` are
+    logged with the whole tree. A request ends with its last response body
+    message, so background tasks that run after it are neither timed nor
+    traced as part of it.
+    """
+
+    def __init__(self, app, slow_request_ms: float = settings.SLOW_REQUEST_MS,
+                 server_timing: bool = settings.SERVER_TIMING):
+        self.app = app
+        self.slow_request_ms = slow_request_ms
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        root = Span(f"{scope['method']} {scope['path']}", "total")
+        token = _current_span.set(root)
+        status_code = 500
+        detached = False
+
+        def finish_request():
+            nonlocal detached
+            if root.end is not None:
+                return
+            root.finish()
+            route = scope.get("route")
+            request_seconds.labels(scope["method"], getattr(route, "path", "unmatched"), status_code).observe(
+                root.seconds
+            )
+            if root.seconds * 1000 >= self.slow_request_ms:
+                logger.warning(f"Slow request ({status_code}):\n{root.tree()}")
+            try:
+                _current_span.reset(token)
+                detached = True
+            except ValueError:
+                # sent from a task holding a copy of our context (streamed responses); reset below instead
+                pass
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if self.server_timing:
+                    MutableHeaders(scope=message).append("Server-Timing", root.server_timing())
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                finish_request()
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            # the app failed or the client went away before the last body message
+            finish_request()
+            if not detached:
+                _current_span.reset(token)
+
+
+def _collection(command_name: str, command: dict) -> str:
+    target = command.get("collection") if command_name == "getMore" else command.get(command_name)
+    return target if isinstance(target, str) else ""
+
+
+class MongoCommandTimer(monitoring.CommandListener):
+    """Times every MongoDB command per command and collection, and adds it to the current request's spans.
+
+    Motor runs commands on its executor with a copy of the caller's context,
+    so ``started`` still sees the span that issued the command.
+    """
+
+    def __init__(self):
+        self._pending: dict[tuple, tuple[str, Optional[Span]]] = {}
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        self._pending[(event.connection_id, event.request_id)] = (
+            _collection(event.command_name, event.command), _active_span()
+        )
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        self._finish(event)
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        self._finish(event)
+
+    def _finish(self, event):
+        collection, parent = self._pending.pop((event.connection_id, event.request_id), ("", None))
+        seconds = event.duration_micros / 1_000_000
+        mongo_command_seconds.labels(event.command_name, collection).observe(seconds)
+        if parent is not None:
+            parent.add(f"mongo {event.command_name} {collection}".rstrip(), "mongo", seconds)
+
+
+def record_redis_command(command: str, seconds: float):
+    redis_command_seconds.labels(command).observe(seconds)
+    parent = _active_span()
+    if parent is not None:
+        parent.add(f"redis {command}", "redis", seconds)
+
+
+mongo_command_timer = MongoCommandTimer()
+command_listeners.append(record_redis_command)
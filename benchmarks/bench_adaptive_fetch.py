@@ -0,0 +1,88 @@
+"""Fixed vs adaptive per-host concurrency against a mock site with limited capacity.
+
+Each scenario fetches the same book pages at a client-side ceiling of
+``--ceiling`` requests, once with a fixed limit and once with the AIMD
+controller. ``spike`` halves the site's capacity and raises its latency for
+the middle third of the run; ``errors`` makes 30% of responses fail for the
+middle third.
+
+Usage:
+    python -m benchmarks.bench_adaptive_fetch [--requests 1000] [--capacity 8] [--latency 0.02] [--ceiling 64] [--scenarios steady spike errors]
+"""
+import argparse
+import asyncio
+import logging
+import time
+
+from app.crawler.crawler import BookCrawler, create_session
+from app.crawler.throttle import FetchController
+from app.utils import logger
+from app.tests.conftest import MockBookSite
+
+SCENARIOS = ("steady", "spike", "errors")
+
+
+async def disturb(site: MockBookSite, scenario: str, duration: float):
+    """Degrade the site for the middle third of ``duration``."""
+    await asyncio.sleep(duration / 3)
+    capacity, latency = site.capacity, site.latency
+    if scenario == "spike":
+        site.capacity, site.latency = max(1, capacity // 2), latency * 3
+    elif scenario == "errors":
+        site.error_rate = 0.3
+    await asyncio.sleep(duration / 3)
+    site.capacity, site.latency, site.error_rate = capacity, latency, 0.0
+
+
+async def run_once(scenario: str, adaptive: bool, args) -> dict:
+    # ideal run time at full capacity, used to place the disturbance
+    expected = args.requests * args.latency / args.capacity
+    async with MockBookSite(pages=args.requests // 20 + 1, latency=args.latency,
+                            capacity=args.capacity, retry_after=0.2) as site:
+        async with create_session(limit_per_host=args.ceiling) as session:
+            # a short breaker cooldown, so the table shows throughput rather than the default 30s pause
+            controller = FetchController(max_limit=args.ceiling, adaptive=adaptive, retries=5, backoff_base=0.1,
+                                         breaker_cooldown=1.0)
+            crawler = BookCrawler(base_url=site.base_url, session=session, controller=controller)
+            disturbance = asyncio.create_task(disturb(site, scenario, expected * 2))
+            started = time.perf_counter()
+            pages = await asyncio.gather(*(
+                crawler.fetch(f"{site.base_url}catalogue/book-{i}_{i}/index.html") for i in range(args.requests)
+            ))
+            elapsed = time.perf_counter() - started
+            disturbance.cancel()
+            host = next(iter(controller.summary().values()))
+    return {
+        "ok": sum(page is not None for page in pages),
+        "seconds": elapsed,
+        "rejected": site.rejected,
+        "errors": site.errors,
+        "peak": site.peak_in_flight,
+        "limit": host["limit"],
+        "breaker": host["breaker_opened"],
+    }
+
+
+async def main(args):
+    print(f"{'scenario':>8} {'mode':>8} {'ok':>5} {'seconds':>8} {'pages/sec':>10} "
+          f"{'503s':>5} {'500s':>5} {'peak':>5} {'limit':>6} {'breaker':>7}")
+    for scenario in args.scenarios:
+        for adaptive in (False, True):
+            result = await run_once(scenario, adaptive, args)
+            print(
+                f"{scenario:>8} {'adaptive' if adaptive else 'fixed':>8} {result['ok']:>5} "
+                f"{result['seconds']:>8.2f} {result['ok'] / result['seconds']:>10.1f} {result['rejected']:>5} "
+                f"{result['errors']:>5} {result['peak']:>5} {result['limit']:>6.1f} {result['breaker']:>7}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--capacity", type=int, default=8, help="concurrent requests the site serves at full speed")
+    parser.add_argument("--latency", type=float, default=0.02, help="per-response delay in seconds")
+    parser.add_argument("--ceiling", type=int, default=64, help="client-side connection limit")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    args = parser.parse_args()
+    logger.setLevel(logging.CRITICAL)
+    asyncio.run(main(args))
@@ -0,0 +1,117 @@
+"""Per-request API key authentication overhead, before and after the key cache.
+
+The legacy path does a Mongo ``find_one`` plus an ``update_one`` of
+``last_used`` on every request. The cached path serves lookups from the
+in-process tier, then Redis, and coalesces ``last_used`` into a periodic
+``bulk_write``. Mongo and Redis are simulated in memory with ``--rtt`` seconds
+per round trip, ``--clients`` concurrent clients each reusing one of
+``--keys`` API keys.
+
+Usage:
+    python -m benchmarks.bench_auth [--requests 20000] [--clients 50] [--keys 100] [--rtt 0.001]
+"""
+import argparse
+import asyncio
+import logging
+import statistics
+import time
+from datetime import datetime
+from unittest.mock import AsyncMock, patch
+
+from bson import ObjectId
+
+from app.utils import logger, verify_user_api_key
+from app.utils.api_key_cache import ApiKeyCache, LastUsedTracker
+
+
+class LatencyStore:
+    """Counts round trips and sleeps ``rtt`` for each; stands in for Mongo users and Redis."""
+
+    def __init__(self, rtt: float, docs: dict | None = None):
+        self.rtt = rtt
+        self.docs = docs or {}
+        self.round_trips = 0
+
+    async def _trip(self):
+        self.round_trips += 1
+        await asyncio.sleep(self.rtt)
+
+    async def find_one(self, query: dict, *args, **kwargs):
+        await self._trip()
+        return self.docs.get(query["api_key"])
+
+    async def update_one(self, *args, **kwargs):
+        await self._trip()
+
+    async def bulk_write(self, operations, ordered=True):
+        await self._trip()
+
+    async def get(self, key):
+        await self._trip()
+        return self.docs.get(key)
+
+    async def setex(self, key, ttl, payload):
+        await self._trip()
+        self.docs[key] = payload
+
+
+async def legacy_verify(users: LatencyStore, api_key: str):
+    user = await users.find_one({"api_key": api_key})
+    if user and user.get("is_active", True):
+        await users.update_one({"api_key": api_key}, {"$set": {"last_used": datetime.now()}}, upsert=True)
+    return user
+
+
+async def load(verify, n: int, clients: int, keys: list[str]) -> list[float]:
+    samples: list[float] = []
+
+    async def client(offset: int):
+        for i in range(offset, n, clients):
+            started = time.perf_counter()
+            await verify(keys[i % len(keys)])
+            samples.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(client(offset) for offset in range(clients)))
+    return samples
+
+
+def report(name: str, samples: list[float], round_trips: int, elapsed: float):
+    cuts = statistics.quantiles(samples, n=100)
+    print(f"{name:>8} {cuts[49] * 1000:>8.3f} {cuts[98] * 1000:>8.3f} {round_trips:>11} {len(samples) / elapsed:>10.0f}")
+
+
+async def main(n: int, clients: int, key_count: int, rtt: float):
+    keys = [f"key-{i}" for i in range(key_count)]
+    docs = {key: {"_id": ObjectId(), "username": key, "api_key": key, "role": "user", "is_active": True} for key in keys}
+    print(f"{'path':>8} {'p50 ms':>8} {'p99 ms':>8} {'round trips':>11} {'req/sec':>10}")
+
+    users = LatencyStore(rtt, docs)
+    started = time.perf_counter()
+    samples = await load(lambda key: legacy_verify(users, key), n, clients, keys)
+    report("legacy", samples, users.round_trips, time.perf_counter() - started)
+
+    users, redis = LatencyStore(rtt, docs), LatencyStore(rtt)
+    key_cache, tracker = ApiKeyCache(), LastUsedTracker(interval=1.0)
+    key_cache.redis.get_client = AsyncMock(return_value=redis)
+    with patch("app.utils.security.api_key_cache", key_cache), \
+            patch("app.utils.security.last_used_tracker", tracker), \
+            patch("app.utils.security.load_user_by_api_key", lambda key: users.find_one({"api_key": key})), \
+            patch("app.db.users_collection", users):
+        flusher = asyncio.create_task(tracker.run())
+        started = time.perf_counter()
+        samples = await load(verify_user_api_key, n, clients, keys)
+        elapsed = time.perf_counter() - started
+        flusher.cancel()
+        await tracker.flush()
+    report("cached", samples, users.round_trips + redis.round_trips, elapsed)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--keys", type=int, default=100)
+    parser.add_argument("--rtt", type=float, default=0.001, help="seconds per Mongo/Redis round trip")
+    args = parser.parse_args()
+    logger.setLevel(logging.WARNING)
+    asyncio.run(main(args.requests, args.clients, args.keys, args.rtt))
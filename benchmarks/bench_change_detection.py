@@ -0,0 +1,162 @@
+"""Full-collection rescan vs write-path change detection over synthetic books.
+
+The legacy detector re-reads every full document (raw HTML included), hashes
+``str(dict(book))`` and issues an ``insert_one`` plus an ``update_one`` per
+flagged book. The write path compares canonical content hashes for each batch
+the crawler upserts. Round trips are counted against an in-memory collection
+and converted to wall time at ``--rtt`` seconds each.
+
+Usage:
+    python -m benchmarks.bench_change_detection [--books 100000] [--changed 0.01] [--rtt 0.0005]
+"""
+import argparse
+import asyncio
+import hashlib
+import logging
+import time
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import bson
+
+from app.crawler.changes import TRACKED_FIELDS, content_hash
+from app.crawler.writer import BookWriter
+from app.schemas import Book
+from app.utils import logger
+
+ROW_HTML = "<html>" + "<p>synthetic page body</p>" * 400 + "</html>"
+
+
+class CountingCollection:
+    """In-memory collection that counts round trips and bytes returned."""
+
+    def __init__(self, docs: list[dict] | None = None):
+        self.docs = {doc["source_url"]: doc for doc in docs or []}
+        self.round_trips = 0
+        self.bytes_read = 0
+
+    def find(self, query: dict, projection: dict | None = None):
+        self.round_trips += 1
+        urls = query.get("source_url", {}).get("$in")
+        docs = (self.docs[url] for url in urls if url in self.docs) if urls else iter(self.docs.values())
+        return self._cursor(docs, projection)
+
+    async def _cursor(self, docs, projection):
+        for doc in docs:
+            if projection:
+                doc = {key: doc[key] for key in projection if key in doc}
+            self.bytes_read += len(bson.encode(doc))
+            yield doc
+
+    async def bulk_write(self, operations, ordered=True):
+        self.round_trips += 1
+        return SimpleNamespace(upserted_count=0, modified_count=len(operations))
+
+    async def insert_many(self, docs, ordered=True):
+        self.round_trips += 1
+
+    async def insert_one(self, doc):
+        self.round_trips += 1
+
+    async def update_one(self, query, update, upsert=False):
+        self.round_trips += 1
+
+
+def synthetic_record(i: int, price: float) -> dict:
+    return {
+        "name": f"Book {i}",
+        "description": f"Description of book {i}",
+        "category": "Travel",
+        "price_excl_tax": price,
+        "price_incl_tax": price,
+        "availability": i % 22,
+        "num_reviews": i % 5,
+        "image_url": f"http://books.toscrape.com/media/{i}.jpg",
+        "rating": "Three",
+        "source_url": f"http://books.toscrape.com/catalogue/book_{i}/index.html",
+    }
+
+
+async def legacy_detect(books: CountingCollection, changes: CountingCollection) -> int:
+    flagged = 0
+    async for book in books.find({}):
+        book_copy = dict(book)
+        book_copy.pop("hash", None)
+        new_hash = hashlib.md5(str(book_copy).encode()).hexdigest()
+        if book.get("hash") != new_hash:
+            flagged += 1
+            await changes.insert_one({"book_id": book["_id"], "changes": "Detected modification"})
+            await books.update_one({"_id": book["_id"]}, {"$set": {"hash": new_hash}})
+    return flagged
+
+
+async def write_path_detect(crawled: list[Book], books: CountingCollection, changes: CountingCollection) -> int:
+    with patch("app.crawler.writer.books_collection", books), \
+            patch("app.crawler.writer.changes_collection", changes), \
+            patch("app.db.repositories.snapshot_repository.snapshots_collection", CountingCollection()):
+        writer = BookWriter(batch_size=100, flush_interval=0)
+        for book in crawled:
+            await writer.add(book)
+        await writer.close()
+    return writer.stats.changes
+
+
+def stored_docs(n: int) -> list[dict]:
+    docs = []
+    for i in range(n):
+        record = synthetic_record(i, 10.0)
+        docs.append({
+            "_id": i,
+            **record,
+            "crawl_timestamp": datetime.now().isoformat(),
+            "row_html": ROW_HTML,
+            # the legacy crawler hashed str(Book), which the detector never reproduces
+            "hash": hashlib.md5(f"legacy-{i}".encode()).hexdigest(),
+            "content_hash": content_hash(record),
+        })
+    return docs
+
+
+def crawled_books(n: int, changed: float) -> list[Book]:
+    every = max(1, int(1 / changed)) if changed else n + 1
+    books = []
+    for i in range(n):
+        record = synthetic_record(i, 12.0 if i % every == 0 else 10.0)
+        books.append(Book(**record, crawl_timestamp=datetime.now(), row_html=ROW_HTML,
+                          content_hash=content_hash(record)))
+    return books
+
+
+def report(name: str, seconds: float, books: CountingCollection, changes: CountingCollection, flagged: int, rtt: float):
+    round_trips = books.round_trips + changes.round_trips
+    print(
+        f"{name:>10} {seconds:>8.2f} {round_trips:>11} {round_trips * rtt:>10.2f} "
+        f"{books.bytes_read / 1e6:>9.1f} {flagged:>8}"
+    )
+
+
+async def main(n: int, changed: float, rtt: float):
+    print(f"tracked fields: {', '.join(TRACKED_FIELDS)}")
+    print(f"{'approach':>10} {'cpu s':>8} {'round trips':>11} {'rtt s':>10} {'MB read':>9} {'changes':>8}")
+
+    books, changes = CountingCollection(stored_docs(n)), CountingCollection()
+    started = time.perf_counter()
+    flagged = await legacy_detect(books, changes)
+    report("rescan", time.perf_counter() - started, books, changes, flagged, rtt)
+
+    crawled = crawled_books(n, changed)
+    books, changes = CountingCollection(stored_docs(n)), CountingCollection()
+    started = time.perf_counter()
+    flagged = await write_path_detect(crawled, books, changes)
+    report("write path", time.perf_counter() - started, books, changes, flagged, rtt)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--books", type=int, default=100_000)
+    parser.add_argument("--changed", type=float, default=0.01, help="fraction of books whose price changed")
+    parser.add_argument("--rtt", type=float, default=0.0005, help="seconds per Mongo round trip")
+    args = parser.parse_args()
+    logger.setLevel(logging.WARNING)
+    asyncio.run(main(args.books, args.changed, args.rtt))
@@ -0,0 +1,111 @@
+"""Encode/decode time and stored size of cached list pages per cache codec.
+
+Builds ``paginate`` outputs shaped like real book pages (``--limit`` books each,
+with a description of ``--description`` bytes) and runs every available
+codec/compression pair over them. Entry sizes are the payload length, plus
+Redis ``MEMORY USAGE`` per key when ``--redis-url`` is reachable. msgpack and
+zstd rows are skipped unless those optional packages are installed.
+
+Usage:
+    python -m benchmarks.bench_codecs [--limit 10 50 100] [--description 1000] [--rounds 2000] [--redis-url URL]
+"""
+import argparse
+import asyncio
+import logging
+import random
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from app.config import CacheCodec
+from app.config.codecs import msgpack, zstandard
+from app.serializers import serialize_book
+from app.utils import logger
+
+CODECS = ["json", "orjson"] + (["msgpack"] if msgpack else [])
+COMPRESSIONS = ["none", "zlib"] + (["zstd"] if zstandard else [])
+WORDS = "the of and a to in is you that it he was for on are as with his they at be this from".split()
+
+
+def make_page(limit: int, description: int) -> dict:
+    crawled = datetime(2025, 1, 1)
+    results = []
+    for i in range(limit):
+        text = " ".join(random.choices(WORDS, k=description // 3))[:description]
+        results.append(serialize_book({
+            "_id": ObjectId(),
+            "name": f"A Light in the Attic, volume {i}",
+            "description": text,
+            "category": random.choice(["Poetry", "Travel", "Mystery", "Historical Fiction"]),
+            "price_incl_tax": round(random.uniform(10, 60), 2),
+            "price_excl_tax": round(random.uniform(10, 60), 2),
+            "availability": random.randint(0, 22),
+            "num_reviews": random.randint(0, 500),
+            "rating": random.choice(["One", "Two", "Three", "Four", "Five"]),
+            "image_url": f"https://books.toscrape.com/media/cache/{i:032x}.jpg",
+            "source_url": f"https://books.toscrape.com/catalogue/book_{i}/index.html",
+            "content_hash": f"{random.getrandbits(256):064x}",
+            "crawl_timestamp": (crawled + timedelta(minutes=i)).isoformat(),
+            "status": "success",
+        }))
+    return {"total": 1000, "limit": limit, "skip": 0, "page": 1, "total_pages": 1000 // limit,
+            "results": results, "next": limit, "prev": None}
+
+
+def timed(fn, rounds: int) -> float:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - started) / rounds * 1e6
+
+
+async def redis_memory(client, key: str, payload: bytes) -> int | None:
+    if client is None:
+        return None
+    await client.set(key, payload)
+    try:
+        return await client.memory_usage(key)
+    finally:
+        await client.delete(key)
+
+
+async def main(limits: list[int], description: int, rounds: int, redis_url: str | None):
+    client = None
+    if redis_url:
+        import redis.asyncio as redis
+        client = redis.from_url(redis_url)
+        try:
+            await client.ping()
+        except Exception as e:
+            print(f"Redis not reachable ({e}); reporting payload sizes only")
+            client = None
+
+    print(f"{'limit':>5} {'codec':>8} {'compr':>5} {'encode us':>10} {'decode us':>10} {'to_json us':>10} "
+          f"{'bytes':>8} {'redis bytes':>11}")
+    for limit in limits:
+        page = make_page(limit, description)
+        for name in CODECS:
+            for compression in COMPRESSIONS:
+                codec = CacheCodec(name, compression)
+                payload = codec.encode(page)
+                encode = timed(lambda: codec.encode(page), rounds)
+                decode = timed(lambda: codec.decode(payload), rounds)
+                to_json = timed(lambda: codec.to_json(payload), rounds)
+                memory = await redis_memory(client, f"bench_codecs:{name}:{compression}", payload)
+                print(f"{limit:>5} {name:>8} {compression:>5} {encode:>10.1f} {decode:>10.1f} {to_json:>10.1f} "
+                      f"{len(payload):>8} {memory if memory is not None else '-':>11}")
+    if client is not None:
+        await client.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--limit", type=int, nargs="+", default=[10, 50, 100], help="books per page")
+    parser.add_argument("--description", type=int, default=1000, help="description length in bytes")
+    parser.add_argument("--rounds", type=int, default=2000)
+    parser.add_argument("--redis-url", default=None, help="measure MEMORY USAGE on this Redis")
+    args = parser.parse_args()
+    logger.setLevel(logging.WARNING)
+    random.seed(0)
+    asyncio.run(main(args.limit, args.description, args.rounds, args.redis_url))
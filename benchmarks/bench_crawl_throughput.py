@@ -0,0 +1,48 @@
+"""Crawl throughput at increasing concurrency against a local mock site.
+
+Usage:
+    python -m benchmarks.bench_crawl_throughput [--pages 25] [--latency 0.05]
+"""
+import argparse
+import asyncio
+import logging
+import time
+
+from app.crawler.crawler import BookCrawler, create_session
+from app.crawler.parser import BookParser
+from app.utils import logger
+from app.tests.conftest import MockBookSite, memory_collections
+
+CONCURRENCY_LEVELS = (1, 8, 32, 128)
+
+
+async def run_once(pages: int, latency: float, concurrency: int) -> tuple[int, float]:
+    async with MockBookSite(pages=pages, latency=latency) as site:
+        with memory_collections():
+            async with create_session(limit_per_host=concurrency) as session:
+                crawler = BookCrawler(
+                    base_url=site.base_url,
+                    session=session,
+                    book_parser=BookParser,
+                    concurrency=concurrency,
+                )
+                started = time.perf_counter()
+                await crawler.crawl()
+                elapsed = time.perf_counter() - started
+        return site.requests, elapsed
+
+
+async def main(pages: int, latency: float):
+    print(f"{'concurrency':>11} {'pages':>6} {'seconds':>8} {'pages/sec':>10}")
+    for concurrency in CONCURRENCY_LEVELS:
+        requests, elapsed = await run_once(pages, latency, concurrency)
+        print(f"{concurrency:>11} {requests:>6} {elapsed:>8.2f} {requests / elapsed:>10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=25, help="listing pages (20 books each)")
+    parser.add_argument("--latency", type=float, default=0.05, help="per-response delay in seconds")
+    args = parser.parse_args()
+    logger.setLevel(logging.WARNING)
+    asyncio.run(main(args.pages, args.latency))
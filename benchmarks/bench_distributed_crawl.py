@@ -0,0 +1,87 @@
+"""Distributed crawl throughput with 1..N crawler processes sharing one Mongo work queue.
+
+Needs the configured mongod; each run uses a throwaway ``<DB_NAME>_bench_distributed``
+database, and the crawler processes fetch from a local mock site.
+
+Usage:
+    python -m benchmarks.bench_distributed_crawl [--pages 50] [--latency 0.05] [--processes 1 2 4]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+from pathlib import Path
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.config import settings
+from app.crawler.work_queue import DONE, RUN_ID
+from app.db import ensure_indexes
+from app.utils import logger
+from app.tests.conftest import MockBookSite
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+
+
+async def run_once(database, site: MockBookSite, processes: int, concurrency: int) -> tuple[float, dict]:
+    await database.client.drop_database(database.name)
+    await ensure_indexes(database)
+    env = {
+        **os.environ,
+        "BASE_URL": site.base_url,
+        "DB_NAME": database.name,
+        "CRAWL_MODE": "distributed",
+        "CRAWL_CONCURRENCY": str(concurrency),
+        "CRAWL_LIMIT_PER_HOST": str(concurrency),
+        "CRAWL_QUEUE_POLL_INTERVAL": "0.05",
+        "WRITER_FLUSH_INTERVAL": "0.2",
+        "HTTP_REVALIDATE": "false",
+    }
+    workers = [
+        await asyncio.create_subprocess_exec(
+            sys.executable, "-m", "app.crawler.crawler", cwd=ROOT_DIR, env=env,
+            stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL,
+        )
+        for _ in range(processes)
+    ]
+    await asyncio.gather(*(worker.wait() for worker in workers))
+
+    run = await database.crawl_queue.find_one({"_id": RUN_ID})
+    items = database.crawl_queue.find({"state": {"$exists": True}}, {"state": 1, "attempts": 1})
+    stats = {"items": 0, "done": 0, "redelivered": 0}
+    async for item in items:
+        stats["items"] += 1
+        stats["done"] += item["state"] == DONE
+        stats["redelivered"] += item["attempts"] > 1
+    return (run["finished_at"] - run["started_at"]).total_seconds(), stats
+
+
+async def main(pages: int, latency: float, process_counts: list[int], concurrency: int):
+    client = AsyncIOMotorClient(settings.MONGO_URL)
+    database = client[f"{settings.DB_NAME}_bench_distributed"]
+    print(f"{'processes':>9} {'items':>6} {'done':>6} {'redelivered':>11} {'seconds':>8} {'items/sec':>10} {'speedup':>8}")
+    baseline = None
+    try:
+        async with MockBookSite(pages=pages, latency=latency) as site:
+            for processes in process_counts:
+                elapsed, stats = await run_once(database, site, processes, concurrency)
+                baseline = baseline or elapsed
+                print(
+                    f"{processes:>9} {stats['items']:>6} {stats['done']:>6} {stats['redelivered']:>11} "
+                    f"{elapsed:>8.2f} {stats['items'] / elapsed:>10.1f} {baseline / elapsed:>8.2f}"
+                )
+    finally:
+        await client.drop_database(database.name)
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=50, help="listing pages (20 books each)")
+    parser.add_argument("--latency", type=float, default=0.05, help="per-response delay in seconds")
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--concurrency", type=int, default=8, help="workers per process")
+    args = parser.parse_args()
+    logger.setLevel(logging.WARNING)
+    asyncio.run(main(args.pages, args.latency, args.processes, args.concurrency))
@@ -0,0 +1,113 @@
+"""Memory per 1,000 book pages on the str fetch path and the bytes fetch path.
+
+Each path runs in its own process, so peak RSS is not shared between them: the
+pages are fetched from a local mock site, parsed and turned into the
+compressed snapshot the writer stores, ``--concurrency`` at a time. A second,
+sequential pass under ``tracemalloc`` adds up each page's Python-side
+allocation high-water mark (selectolax's own C allocations only show in RSS).
+
+Usage:
+    python -m benchmarks.bench_fetch_memory [--pages 2000] [--concurrency 32] [--padding 3000]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from app.crawler.crawler import BookCrawler, create_session
+from app.crawler.parser import BookParser
+from app.db.repositories.snapshot_repository import build_snapshot
+from app.utils import logger
+from app.tests.conftest import MockBookSite
+
+TRACED_PAGES = 200
+
+
+async def process_page(crawler: BookCrawler, url: str) -> int:
+    html = await crawler.fetch(url)
+    book = await crawler._parse_book(html, url, "")
+    # what BookWriter.add does with the raw page before buffering the book
+    return build_snapshot(book.source_url, book.row_html)["size"]
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def measure(base_url: str, fetch_bytes: bool, pages: int, concurrency: int) -> dict:
+    urls = [f"{base_url}catalogue/book-{i}_{i}/index.html" for i in range(pages)]
+    semaphore = asyncio.Semaphore(concurrency)
+    async with create_session(limit_per_host=concurrency) as session:
+        crawler = BookCrawler(base_url=base_url, session=session, book_parser=BookParser,
+                              fetch_bytes=fetch_bytes, concurrency=concurrency)
+        page_bytes = await process_page(crawler, urls[0])
+        baseline = peak_rss_mb()
+
+        async def bounded(url: str):
+            async with semaphore:
+                await process_page(crawler, url)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(bounded(url) for url in urls))
+        elapsed = time.perf_counter() - started
+        rss = peak_rss_mb() - baseline
+
+        tracemalloc.start()
+        allocated = 0
+        for url in urls[:TRACED_PAGES]:
+            before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            await process_page(crawler, url)
+            allocated += tracemalloc.get_traced_memory()[1] - before
+        tracemalloc.stop()
+    return {
+        "page_kb": page_bytes / 1024,
+        "seconds": elapsed,
+        "rss_mb": rss,
+        "allocated_mb": allocated / min(pages, TRACED_PAGES) * 1000 / 2 ** 20,
+    }
+
+
+def run_child(base_url: str, path: str, args) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_fetch_memory", "--child", path, "--base-url", base_url,
+         "--pages", str(args.pages), "--concurrency", str(args.concurrency)],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+async def main(args):
+    async with MockBookSite(pages=args.pages // 20 + 1, padding=args.padding) as site:
+        results = [
+            (path, await asyncio.to_thread(run_child, site.base_url, path, args))
+            for path in ("str", "bytes")
+        ]
+    print(f"{'path':>6} {'page KB':>8} {'seconds':>8} {'peak RSS MB':>12} {'allocated MB / 1k pages':>24}")
+    for path, result in results:
+        print(
+            f"{path:>6} {result['page_kb']:>8.1f} {result['seconds']:>8.2f} "
+            f"{result['rss_mb']:>12.1f} {result['allocated_mb']:>24.1f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--padding", type=int, default=3000, help="16-byte comments per page (3000 is ~50 KB)")
+    parser.add_argument("--child", choices=("str", "bytes"), help=argparse.SUPPRESS)
+    parser.add_argument("--base-url", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    logger.setLevel(logging.CRITICAL)
+    if args.child:
+        result = asyncio.run(measure(args.base_url, args.child == "bytes", args.pages, args.concurrency))
+        print(json.dumps(result))
+    else:
+        asyncio.run(main(args))
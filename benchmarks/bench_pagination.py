@@ -0,0 +1,100 @@
+"""Offset vs keyset pagination latency for page 1 and a deep page.
+
+Seeds ``--books`` synthetic books into a scratch database on ``MONGO_URL``
+(indexes from the registry applied), then times the API's listing query at
+page 1 and page ``--page`` with ``skip``/``limit`` and with a keyset cursor,
+each with an exact count and with no count. Needs a reachable mongod.
+
+Usage:
+    MONGO_URL=mongodb://localhost:27017 python -m benchmarks.bench_pagination [--books 120000] [--page 5000]
+"""
+import argparse
+import asyncio
+import logging
+import statistics
+import sys
+import time
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import PyMongoError
+
+from app.config import settings
+from app.db import ensure_indexes
+from app.utils import logger, paginate, keyset_paginate, PaginationTotalEnum
+from app.utils.pagination import encode_cursor
+
+LIMIT = 20
+SORT = "rating"
+QUERY = {"category": "Travel", "price_incl_tax": {"$gte": 0, "$lte": 9999}}
+
+
+async def seed(database, n: int):
+    await database.books.drop()
+    batch = []
+    for i in range(n):
+        batch.append({
+            "source_url": f"http://books.toscrape.com/catalogue/book_{i}/index.html",
+            "name": f"Book {i}",
+            "category": "Travel" if i % 4 else "Poetry",
+            "price_incl_tax": round(10 + (i * 7919) % 5000 / 100, 2),
+            "rating": ("One", "Two", "Three", "Four", "Five")[i % 5],
+            "num_reviews": i % 50,
+        })
+        if len(batch) == 10_000:
+            await database.books.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        await database.books.insert_many(batch, ordered=False)
+    await ensure_indexes(database)
+
+
+async def timed(call, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await call()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000
+
+
+async def main(n: int, page: int, repeat: int):
+    client = AsyncIOMotorClient(settings.MONGO_URL, serverSelectionTimeoutMS=2000)
+    try:
+        await client.admin.command("ping")
+    except PyMongoError as e:
+        sys.exit(f"mongod not reachable at {settings.MONGO_URL}: {e}")
+    database = client[f"{settings.DB_NAME}_bench_pagination"]
+    try:
+        await seed(database, n)
+        books = database.books
+        skip = (page - 1) * LIMIT
+
+        # cursor for the deep page, taken from the last book of the page before it (setup, not timed)
+        previous = await books.find(QUERY).sort([(SORT, -1), ("_id", -1)]).skip(skip - 1).limit(1).to_list(1)
+        if not previous:
+            sys.exit(f"--books {n} is too few for page {page} of {LIMIT}")
+        deep_cursor = encode_cursor(SORT, previous[0])
+
+        print(f"{n} books, {LIMIT} per page, sort={SORT}, median of {repeat} runs (ms)")
+        print(f"{'mode':>8} {'total':>6} {'page 1':>8} {f'page {page}':>10}")
+        for mode in (PaginationTotalEnum.exact, PaginationTotalEnum.none):
+            if mode == PaginationTotalEnum.exact:
+                first = await timed(lambda: paginate(books, QUERY, 0, LIMIT, SORT), repeat)
+                deep = await timed(lambda: paginate(books, QUERY, skip, LIMIT, SORT), repeat)
+                print(f"{'offset':>8} {mode.value:>6} {first:>8.2f} {deep:>10.2f}")
+            first = await timed(lambda: keyset_paginate(books, QUERY, LIMIT, SORT, total_mode=mode), repeat)
+            deep = await timed(lambda: keyset_paginate(books, QUERY, LIMIT, SORT, deep_cursor, total_mode=mode), repeat)
+            print(f"{'keyset':>8} {mode.value:>6} {first:>8.2f} {deep:>10.2f}")
+    finally:
+        await client.drop_database(database.name)
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--books", type=int, default=120_000)
+    parser.add_argument("--page", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    logger.setLevel(logging.WARNING)
+    asyncio.run(main(args.books, args.page, args.repeat))
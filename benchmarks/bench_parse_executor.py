@@ -0,0 +1,77 @@
+"""Event-loop lag during a crawl with parsing inline, in threads and in processes.
+
+A ticker coroutine sleeps for a fixed interval and records how late it wakes
+up; that lateness is what every other coroutine on the loop (including FastAPI
+handlers) would wait while a page is being parsed.
+
+Usage:
+    python -m benchmarks.bench_parse_executor [--pages 25] [--concurrency 32]
+"""
+import argparse
+import asyncio
+import logging
+import statistics
+import time
+
+from app.crawler.crawler import BookCrawler, create_session
+from app.crawler.executor import ParseExecutor
+from app.crawler.parser import BookParser
+from app.utils import logger
+from app.tests.conftest import MockBookSite, memory_collections
+
+TICK = 0.005
+
+
+async def measure_lag(samples: list[float], stop: asyncio.Event):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + TICK
+        await asyncio.sleep(TICK)
+        samples.append(max(0.0, loop.time() - expected))
+
+
+async def run_once(kind: str, pages: int, concurrency: int, workers: int) -> tuple[float, list[float]]:
+    samples: list[float] = []
+    stop = asyncio.Event()
+    async with MockBookSite(pages=pages) as site:
+        with memory_collections(), ParseExecutor(kind=kind, workers=workers) as executor:
+            async with create_session(limit_per_host=concurrency) as session:
+                crawler = BookCrawler(
+                    base_url=site.base_url,
+                    session=session,
+                    book_parser=BookParser,
+                    concurrency=concurrency,
+                    parse_executor=executor,
+                )
+                ticker = asyncio.create_task(measure_lag(samples, stop))
+                started = time.perf_counter()
+                await crawler.crawl()
+                elapsed = time.perf_counter() - started
+                stop.set()
+                await ticker
+    return elapsed, samples
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+async def main(pages: int, concurrency: int, workers: int):
+    print(f"{'executor':>8} {'seconds':>8} {'lag mean ms':>12} {'lag p99 ms':>11} {'lag max ms':>11}")
+    for kind in ("none", "thread", "process"):
+        elapsed, lag = await run_once(kind, pages, concurrency, workers)
+        print(
+            f"{kind:>8} {elapsed:>8.2f} {statistics.mean(lag) * 1000:>12.2f} "
+            f"{percentile(lag, 0.99) * 1000:>11.2f} {max(lag) * 1000:>11.2f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=25, help="listing pages (20 books each)")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=0, help="executor workers (0 = cpu count)")
+    args = parser.parse_args()
+    logger.setLevel(logging.WARNING)
+    asyncio.run(main(args.pages, args.concurrency, args.workers))
@@ -0,0 +1,128 @@
+"""Text search latency over a large synthetic catalogue.
+
+Seeds ``--books`` synthetic books (names and descriptions drawn from a
+skewed vocabulary, so some words are rare and some match most books) into a
+scratch database on ``MONGO_URL`` with the registry's indexes, then times
+the first page of ``/api/books/search`` queries: a rare word, a common word,
+several words, a quoted phrase, and the same with the category/price filter
+and a ``BookSortEnum`` sort. Each is reported with the capped and the exact
+total, next to a case-insensitive ``$regex`` on ``name`` (what clients do
+today, minus the paging), which cannot use an index. Needs a reachable mongod.
+
+Usage:
+    MONGO_URL=mongodb://localhost:27017 python -m benchmarks.bench_search [--books 1000000] [--repeat 5]
+"""
+import argparse
+import asyncio
+import logging
+import random
+import statistics
+import sys
+import time
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import PyMongoError
+
+from app.config import settings
+from app.db import ensure_indexes
+from app.utils import logger, search_paginate, normalize_search_query
+
+LIMIT = 20
+CATEGORIES = ("Travel", "Poetry", "History", "Mystery", "Science", "Fiction", "Music", "Art")
+WORDS = [f"{stem}{suffix}" for stem in ("light", "sea", "night", "garden", "stone", "river", "winter", "glass",
+                                        "crown", "shadow", "letter", "voyage", "orchard", "cipher", "lantern")
+         for suffix in ("", "s", "keeper", "fall", "ward", "born", "song", "bound")]
+FILTER = {"category": "Poetry", "price_incl_tax": {"$gte": 10, "$lte": 40}}
+# (label, search text, listing filter, sort field)
+CASES = (
+    ("rare word", "cipherborn", {}, None),
+    ("common word", "light", {}, None),
+    ("three words", "winter river lantern", {}, None),
+    ("phrase", '"night garden"', {}, None),
+    ("common + filter", "light", FILTER, None),
+    ("common + sort", "light", {}, "rating"),
+    ("filter + sort", "winter river lantern", FILTER, "price_incl_tax"),
+)
+
+
+def synthetic_book(i: int, rng: random.Random) -> dict:
+    # Zipf-like: the first words of the vocabulary are far more frequent than the last
+    words = rng.choices(WORDS, weights=[1 / (rank + 1) for rank in range(len(WORDS))], k=24)
+    return {
+        "source_url": f"http://books.toscrape.com/catalogue/book_{i}/index.html",
+        "name": " ".join(words[:3]).title(),
+        "description": " ".join(words[3:]),
+        "category": CATEGORIES[i % len(CATEGORIES)],
+        "price_incl_tax": round(10 + (i * 7919) % 5000 / 100, 2),
+        "rating": ("One", "Two", "Three", "Four", "Five")[i % 5],
+        "num_reviews": i % 50,
+    }
+
+
+async def seed(database, n: int):
+    await database.books.drop()
+    rng = random.Random(42)
+    batch = []
+    for i in range(n):
+        batch.append(synthetic_book(i, rng))
+        if len(batch) == 10_000:
+            await database.books.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        await database.books.insert_many(batch, ordered=False)
+    started = time.perf_counter()
+    await ensure_indexes(database)
+    print(f"seeded {n} books, indexes built in {time.perf_counter() - started:.1f}s")
+
+
+async def timed(call, repeat: int) -> tuple[float, float]:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await call()
+        samples.append(time.perf_counter() - started)
+    samples.sort()
+    return statistics.median(samples) * 1000, samples[-1] * 1000
+
+
+async def main(n: int, repeat: int, regex: bool):
+    client = AsyncIOMotorClient(settings.MONGO_URL, serverSelectionTimeoutMS=2000)
+    try:
+        await client.admin.command("ping")
+    except PyMongoError as e:
+        sys.exit(f"mongod not reachable at {settings.MONGO_URL}: {e}")
+    database = client[f"{settings.DB_NAME}_bench_search"]
+    try:
+        await seed(database, n)
+        books = database.books
+        projection = {"row_html": 0}
+
+        print(f"page 1 of {LIMIT}, median / max of {repeat} runs (ms)")
+        print(f"{'case':>16} {'matches':>9} {'capped':>14} {'exact':>14}" + (f" {'$regex name':>14}" if regex else ""))
+        for label, text, query, sort in CASES:
+            text = normalize_search_query(text)
+            capped = lambda: search_paginate(books, text, query, 0, LIMIT, sort, projection,
+                                             count_cap=settings.PAGINATION_COUNT_CAP)
+            # a cap above the collection size makes the count exact
+            exact = lambda: search_paginate(books, text, query, 0, LIMIT, sort, projection, count_cap=n + 1)
+            page = await exact()
+            columns = [await timed(capped, repeat), await timed(exact, repeat)]
+            if regex:
+                word = text.strip('"').split()[0]
+                pattern = {"name": {"$regex": word, "$options": "i"}, **query}
+                columns.append(await timed(lambda: books.find(pattern, projection).limit(LIMIT).to_list(LIMIT), repeat))
+            cells = " ".join(f"{f'{median:.1f} / {worst:.1f}':>14}" for median, worst in columns)
+            print(f"{label:>16} {page['total']:>9} {cells}")
+    finally:
+        await client.drop_database(database.name)
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--books", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--no-regex", action="store_true", help="skip the unindexed $regex baseline")
+    args = parser.parse_args()
+    logger.setLevel(logging.WARNING)
+    asyncio.run(main(args.books, args.repeat, not args.no_regex))